@@ -1,42 +1,51 @@
 """Main application module."""
 
-import logging
-import os
-import uuid
 from datetime import timedelta
-from logging.handlers import TimedRotatingFileHandler
 
-from flask import Flask, g, render_template, request
+from flask import Flask, abort, g, render_template, request
 from flask_login import current_user, login_required
+from sqlalchemy import select
+from werkzeug.local import LocalProxy
 
+from app.access_log import init_logging, register_access_log
 from app.api.service import (
     communities_service,
     community_options_service,
     populars_service,
     posts_service,
     stats_service,
-    user_stats_service,
-    users_notices_service,
 )
+from app.cache import cached, init_cache
 from app.constants import (
     AUTH_URL,
     CLIENT_ID,
     CLIENT_SECRET,
     COMMUNITY_OPTION_NUM,
-    G_NOTICE,
-    G_NOTICE_NUM,
+    G_LAYOUT,
     G_POST_STAT,
     G_USER,
+    HOME_POST_FIELDS,
+    POPULAR_CACHE_TTL,
     POPULAR_POST_NUM,
     REDIRECT_URI,
     SCOPES,
+    STATS_CACHE_TTL,
     TOKEN_URL,
     USER_INFO_URL,
+    CacheNamespaceEnum,
     EnvironmentEnum,
     HttpRequestEnum,
 )
-from app.models.user_notice import UserNotice
+from app.coordinator import init_coordinator
+from app.database import init_database
+from app.metrics import init_metrics, observe_scheduler, register_metrics
+from app.models.user_stat import UserStat
+from app.notice.stream import notice_stream_response, unread_notices
+from app.notice.writer import init_notice_writer
+from app.query_stats import register_query_stats
+from app.settings import get_settings
 from app.swagger import get_swagger_config
+from app.view_buffer import init_view_buffer
 
 from .api import api_bp
 from .auth import auth_bp
@@ -64,12 +73,30 @@ def create_app(test_config: dict = None) -> Flask:
     else:
         init_config(app, env)
 
+    # metrics, the pool is metered before the engine is created
+    init_metrics(app)
+
+    # database engine options and read replicas, after the metered pool
+    init_database(app)
+
     # extensions
     init_extensions(app)
 
+    # application cache
+    init_cache(app)
+
+    # post view buffer
+    init_view_buffer(app)
+
+    # notice writer
+    init_notice_writer(app)
+
     # blueprints
     register_blueprints(app)
 
+    # scheduled jobs, run by the elected leader process
+    init_coordinator(app)
+
     # error handlers
     register_error_handlers(app)
 
@@ -93,17 +120,10 @@ def create_app(test_config: dict = None) -> Flask:
         # community
         communities = get_home_communities()
 
-        # post
-        post_result = get_home_posts(community_id)
+        # post, the feed pages by cursor
+        post_result = get_home_posts(community_id, cursor="")
         posts = post_result["posts"]
-
-        # pagination
-        post_pagination = post_result["pagination"]
-        pagination = get_pagination_details(
-            current_page=post_pagination["page"],
-            total_pages=post_pagination["total_pages"],
-            total_items=post_pagination["total_items"],
-        )
+        next_cursor = post_result["pagination"]["next_cursor"]
 
         # popular
         populars = get_home_populars()
@@ -117,11 +137,11 @@ def create_app(test_config: dict = None) -> Flask:
         return render_template(
             "index.html",
             render_id="index-posts",
-            render_url="/index_posts",
+            render_url="/index_posts?cursor=",
             community_id=community_id,
             communities=communities,
             posts=posts,
-            pagination=pagination,
+            next_cursor=next_cursor,
             populars=populars,
             stats=stats,
             community_options=community_options,
@@ -136,12 +156,22 @@ def create_app(test_config: dict = None) -> Flask:
         order_by = request.args.get("order_by")
         page = request.args.get("page", default=1, type=int)
         per_page = request.args.get("per_page", default=10, type=int)
+        cursor = request.args.get("cursor")
 
-        post_result = get_home_posts(community_id, order_by, page, per_page)
+        post_result = get_home_posts(community_id, order_by, page, per_page, cursor)
         posts = post_result["posts"]
 
         # pagination
         post_pagination = post_result["pagination"]
+        if cursor is not None:
+            # infinite paging, the next page is appended after these posts
+            return render_template(
+                "indexPost.html",
+                community_id=community_id,
+                posts=posts,
+                next_cursor=post_pagination["next_cursor"],
+            )
+
         pagination = get_pagination_details(
             current_page=post_pagination["page"],
             total_pages=post_pagination["total_pages"],
@@ -163,16 +193,16 @@ def create_app(test_config: dict = None) -> Flask:
     @app.route("/notifications", methods=["GET"])
     @login_required
     def notification():
-        notices = (
-            users_notices_service(status="unread")
-            .json.get("data")
-            .get("user_notifications")
-        )
-
         return render_template(
-            "components/layout/navNotification.html", notices=notices
+            "components/layout/navNotification.html",
+            notices=unread_notices(current_user.id),
         )
 
+    @app.route("/notifications/stream", methods=["GET"])
+    @login_required
+    def notification_stream():
+        return notice_stream_response(current_user.id)
+
     return app
 
 
@@ -180,8 +210,11 @@ def init_config(app: Flask, env: str) -> None:
     """Initialize application configuration."""
 
     app.config["SECRET_KEY"] = get_config("APP", "SECRET_KEY")
+    # the /metrics route stays closed without a token
+    app.config["METRICS_TOKEN"] = get_settings().metrics_token or None
     app.config["MAX_CONTENT_LENGTH"] = 1024 * 1024
     app.config["SQLALCHEMY_DATABASE_URI"] = get_config("POSTGRESQL", "DATABASE_URL")
+    app.config.update(get_database_config())
     app.config["OAUTH2_PROVIDERS"] = get_oauth2_config()
     app.config["SWAGGER"] = get_swagger_config()
 
@@ -218,6 +251,7 @@ def init_extensions(app: Flask) -> None:
     db.init_app(app)
     login_manager.init_app(app)
     scheduler.init_app(app)
+    observe_scheduler(scheduler)
     jwt.init_app(app)
     swag.init_app(app)
 
@@ -298,143 +332,116 @@ def register_error_handlers(app: Flask) -> None:
 def register_logging(app: Flask) -> None:
     """Register logging for the application."""
 
-    if not os.path.exists("logs"):
-        os.mkdir("logs")
-
-    file_handler = TimedRotatingFileHandler(
-        "logs/askify.log", when="D", interval=1, backupCount=10
-    )
-    file_handler.setFormatter(
-        logging.Formatter(
-            "%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]"
-        )
-    )
-    app.logger.addHandler(file_handler)
-    app.logger.setLevel(logging.INFO)
+    init_logging(app)
 
 
 def register_middleware(app: Flask) -> None:
     """Register middleware for the application."""
 
-    # logging middleware for http request and response
-    @app.before_request
-    def before_request():
-        if request.url.endswith(".css") or request.url.endswith(".js"):
-            return
-
-        g.request_uuid = str(uuid.uuid4())
-        g.request_body = request.get_data(as_text=True) if request.data else None
-        app.logger.info(
-            "[%s] Request [%s]: %s %s",
-            g.request_uuid,
-            request.method,
-            request.url,
-            request.headers,
-        )
-        request_body = g.request_body
-        if request_body:
-            app.logger.info("[%s] Request Body: %s", g.request_uuid, g.request_body)
-
-    @app.after_request
-    def after_request(response):
-        content_type = response.content_type
-        request_uuid = g.request_uuid if hasattr(g, "request_uuid") else ""
-
-        if (
-            "html" in content_type
-            or "css" in content_type
-            or "javascript" in content_type
-        ):
-            app.logger.info(
-                "[%s] Response [%s]: Status %s, Headers %s",
-                request_uuid,
-                request.method,
-                response.status,
-                response.headers,
-            )
-        elif "application/json" in content_type:
-            app.logger.info(
-                "[%s] Response [%s]: Status %s, Headers %s",
-                request_uuid,
-                request.method,
-                response.status,
-                response.headers,
-            )
-            response_body = response.get_data(as_text=True)
-            if response_body:
-                app.logger.info("[%s] Response Body: %s", request_uuid, response_body)
+    # structured, sampled access log for http request and response
+    register_access_log(app)
 
-        return response
+    # per-request SQL statistics, registered after the access log it reports to
+    register_query_stats(app)
+
+    # prometheus metrics, request latency and the /metrics route
+    register_metrics(app)
 
 
 def register_context_processors(app: Flask) -> None:
     """Register context processors for the application."""
 
-    # global context processors, to set global variables for all templates
+    # global context processor, to set global variables for all templates,
+    # layout values are lazy so partial templates that never read them cost nothing
     @app.context_processor
-    def inject_user():
-        return {G_USER: current_user}
+    def inject_layout():
+        return {
+            G_USER: current_user,
+            G_POST_STAT: LocalProxy(lambda: get_layout_context()[G_POST_STAT]),
+        }
 
-    @app.context_processor
-    def inject_post_stat():
-        if current_user.is_authenticated:
-            stats_data = user_stats_service().json
-            post_num = stats_data["data"]["user_stats"]["request_num"]
 
-            return {G_POST_STAT: post_num}
+def get_layout_context() -> dict:
+    """Get the layout data of the current user, memoized for the request."""
 
-        return {G_POST_STAT: 0}
+    layout_context = g.get(G_LAYOUT)
+    if layout_context is not None:
+        return layout_context
 
-    @app.context_processor
-    def inject_notice_num():
-        notice_num = 0
-        if current_user.is_authenticated:
-            notice_num = UserNotice.query.filter_by(
-                user_id=current_user.id, status=False
-            ).count()
+    layout_context = {G_POST_STAT: 0}
+
+    # unread notices come from the notification stream, not from every page
+    if current_user.is_authenticated:
+        layout_context[G_POST_STAT] = (
+            db.session.scalar(
+                select(UserStat.request_num).where(UserStat.user_id == current_user.id)
+            )
+            or 0
+        )
 
-        g.notice_num = notice_num
-        return {G_NOTICE_NUM: g.notice_num}
+    setattr(g, G_LAYOUT, layout_context)
+    return layout_context
 
-    @app.context_processor
-    def inject_notice():
-        notices = []
-        if current_user.is_authenticated:
-            response = users_notices_service(status="unread").json
-            data = response.get("data", {})
-            notices = data.get("user_notifications", [])
 
-        return {G_NOTICE: notices}
+def get_database_config() -> dict:
+    """Get the database engine and read replica configuration."""
+
+    database = get_settings().database
+    config = {}
+
+    for key, value in (
+        ("DB_POOL_SIZE", database.pool_size),
+        ("DB_MAX_OVERFLOW", database.max_overflow),
+        ("DB_POOL_TIMEOUT", database.pool_timeout),
+        ("DB_POOL_RECYCLE", database.pool_recycle),
+        ("DB_STATEMENT_TIMEOUT_MS", database.statement_timeout_ms),
+    ):
+        if value:
+            config[key] = int(value)
+
+    if database.pool_pre_ping:
+        config["DB_POOL_PRE_PING"] = database.pool_pre_ping.lower() in ("1", "true")
+    if database.replica_urls:
+        config["DB_REPLICA_URLS"] = [
+            url.strip() for url in database.replica_urls.split(",") if url.strip()
+        ]
+
+    return config
 
 
 def get_oauth2_config() -> dict:
     """Get OAuth2 configuration."""
+
+    settings = get_settings()
+    google = settings.google
+    github = settings.github
+
     return {
         "google": {
-            "client_id": get_config("GOOGLE", "GOOGLE_OAUTH_CLIENT_ID"),
-            "client_secret": get_config("GOOGLE", "GOOGLE_OAUTH_CLIENT_SECRET"),
-            "redirect_uri": get_config("GOOGLE", "GOOGLE_OAUTH_REDIRECT_URI"),
-            "authorize_url": get_config("GOOGLE", "GOOGLE_OAUTH_AUTH_URL"),
-            "token_url": get_config("GOOGLE", "GOOGLE_OAUTH_TOKEN_URL"),
+            "client_id": google.client_id,
+            "client_secret": google.client_secret,
+            "redirect_uri": google.redirect_uri,
+            "authorize_url": google.authorize_url,
+            "token_url": google.token_url,
             "user_info": {
-                "url": get_config("GOOGLE", "GOOGLE_OAUTH_USER_INFO_URL"),
+                "url": google.user_info_url,
                 "email_key": "email",
                 "name_key": "name",
                 "picture_key": "picture",
             },
             "scopes": [
-                get_config("GOOGLE", "GOOGLE_OAUTH_SCOPE_PROFILE"),
-                get_config("GOOGLE", "GOOGLE_OAUTH_SCOPE_EMAIL"),
+                settings.google_scope_profile,
+                settings.google_scope_email,
             ],
         },
         "github": {
-            "client_id": get_config("GITHUB", "GITHUB_OAUTH_CLIENT_ID"),
-            "client_secret": get_config("GITHUB", "GITHUB_OAUTH_CLIENT_SECRET"),
-            "redirect_uri": get_config("GITHUB", "GITHUB_OAUTH_REDIRECT_URI"),
-            "authorize_url": get_config("GITHUB", "GITHUB_OAUTH_AUTH_URL"),
-            "token_url": get_config("GITHUB", "GITHUB_OAUTH_TOKEN_URL"),
+            "client_id": github.client_id,
+            "client_secret": github.client_secret,
+            "redirect_uri": github.redirect_uri,
+            "authorize_url": github.authorize_url,
+            "token_url": github.token_url,
             "user_info": {
-                "url": get_config("GITHUB", "GITHUB_OAUTH_USER_INFO_URL"),
+                "url": github.user_info_url,
                 "email_key": "email",
                 "name_key": "name",
                 "picture_key": "avatar_url",
@@ -449,12 +456,18 @@ def get_home_posts(
     order_by: str = "create_at_desc",
     page: int = 1,
     per_page: int = 10,
+    cursor: str = None,
 ) -> list:
-    """Get index post data."""
+    """Get index post data, by page number or by cursor."""
+
+    posts_result = posts_service(
+        community_id, order_by, page, per_page, HOME_POST_FIELDS, cursor
+    )
+    if posts_result.code != HttpRequestEnum.SUCCESS_OK.value:
+        abort(posts_result.code)
 
-    posts_response = posts_service(community_id, order_by, page, per_page).json
-    posts = posts_response.get("data").get("posts")
-    pagination = posts_response.get("pagination")
+    posts = posts_result.data.get("posts")
+    pagination = posts_result.page_info
 
     post_items = [
         {
@@ -474,11 +487,11 @@ def get_home_posts(
     return {"posts": post_items, "pagination": pagination}
 
 
+@cached(CacheNamespaceEnum.POPULARS, ttl=POPULAR_CACHE_TTL)
 def get_home_populars() -> list:
     """Get index popular data."""
 
-    populars_response = populars_service(POPULAR_POST_NUM).json
-    populars = populars_response.get("data").get("populars")
+    populars = populars_service(POPULAR_POST_NUM).data.get("populars")
 
     return [
         {
@@ -494,26 +507,27 @@ def get_home_populars() -> list:
     ]
 
 
+@cached(CacheNamespaceEnum.STATS, ttl=STATS_CACHE_TTL)
 def get_home_stats() -> list:
     """Get index stats data."""
 
-    stats_response = stats_service().json
-    return stats_response.get("data").get("stats")
+    return stats_service().data.get("stats")
 
 
+@cached(CacheNamespaceEnum.COMMUNITIES)
 def get_home_communities() -> list:
     """Get index communities data."""
 
-    communities_response = communities_service(per_page=COMMUNITY_OPTION_NUM).json
-    communities = communities_response.get("data").get("communities")
+    communities_result = communities_service(per_page=COMMUNITY_OPTION_NUM)
+    communities = communities_result.data.get("communities")
 
     return [
         {"id": community["id"], "name": community["name"]} for community in communities
     ]
 
 
+@cached(CacheNamespaceEnum.COMMUNITY_OPTIONS)
 def get_home_community_options() -> list:
     """Get index community options data."""
 
-    communities_response = community_options_service().json
-    return communities_response.get("data").get("community_options")
+    return community_options_service().data.get("community_options")
@@ -0,0 +1,181 @@
+"""Structured access log, written to disk by a background thread.
+
+Handlers of the application logger sit behind a QueueHandler, so a request
+thread only enqueues its records and a QueueListener does the file writes.
+Every request gets one JSON access record with its timing. Request and response
+bodies are only logged for a sample of requests, capped in size and redacted.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import time
+import uuid
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+
+from flask import Flask, Response, g, request
+from flask_login import current_user
+
+from app.constants import (
+    ACCESS_LOG_BODY_MAX_BYTES,
+    ACCESS_LOG_BODY_SAMPLE_RATE,
+    ACCESS_LOG_QUEUE_SIZE,
+    ACCESS_LOG_REDACTED_KEYWORDS,
+    ACCESS_LOG_SKIPPED_SUFFIXES,
+)
+
+_REDACTED = "[REDACTED]"
+
+# the listener of the process, shared by every app created in it
+_listener = None  # pylint: disable=invalid-name
+
+
+def _redaction_patterns(keywords) -> list:
+    """Compile the patterns redacting keyword-named fields in JSON and form bodies."""
+
+    names = "|".join(re.escape(keyword) for keyword in keywords)
+    return [
+        (
+            re.compile(
+                rf'("[^"]*(?:{names})[^"]*"\s*:\s*)"(?:[^"\\]|\\.)*"', re.IGNORECASE
+            ),
+            rf'\1"{_REDACTED}"',
+        ),
+        (
+            re.compile(rf"((?:^|&)[^=&]*(?:{names})[^=&]*=)[^&]*", re.IGNORECASE),
+            rf"\1{_REDACTED}",
+        ),
+    ]
+
+
+_REDACTION_PATTERNS = _redaction_patterns(ACCESS_LOG_REDACTED_KEYWORDS)
+
+
+def redact(text: str) -> str:
+    """Mask the values of sensitive fields, e.g. passwords and tokens."""
+
+    for pattern, replacement in _REDACTION_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def capture_body(data: bytes, max_bytes: int) -> str:
+    """Decode at most max_bytes of a body and redact it."""
+
+    text = data[:max_bytes].decode("utf-8", errors="replace")
+    if len(data) > max_bytes:
+        text += "...(truncated)"
+    return redact(text)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full."""
+
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
+
+
+def init_logging(app: Flask) -> None:
+    """Route the application logs through a queue to a rotating log file."""
+
+    global _listener  # pylint: disable=global-statement
+
+    if _listener is None:
+        if not os.path.exists("logs"):
+            os.mkdir("logs")
+
+        file_handler = TimedRotatingFileHandler(
+            "logs/askify.log", when="D", interval=1, backupCount=10
+        )
+        file_handler.setFormatter(
+            logging.Formatter(
+                "%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]"
+            )
+        )
+
+        log_queue = queue.Queue(
+            app.config.get("ACCESS_LOG_QUEUE_SIZE", ACCESS_LOG_QUEUE_SIZE)
+        )
+        _listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+    # the app logger is shared by every app of the process, install it once
+    for handler in list(app.logger.handlers):
+        if isinstance(handler, _DroppingQueueHandler):
+            app.logger.removeHandler(handler)
+
+    app.logger.addHandler(_DroppingQueueHandler(_listener.queue))
+    app.logger.setLevel(logging.INFO)
+
+
+def _is_skipped() -> bool:
+    """Whether the request is for a static asset, which is not logged."""
+
+    return request.path.endswith(ACCESS_LOG_SKIPPED_SUFFIXES)
+
+
+def register_access_log(app: Flask) -> None:
+    """Register the hooks writing one access record per request."""
+
+    sample_rate = app.config.get(
+        "ACCESS_LOG_BODY_SAMPLE_RATE", ACCESS_LOG_BODY_SAMPLE_RATE
+    )
+    max_bytes = app.config.get("ACCESS_LOG_BODY_MAX_BYTES", ACCESS_LOG_BODY_MAX_BYTES)
+
+    @app.before_request
+    def start_access_log():
+        g.request_uuid = str(uuid.uuid4())
+        g.request_start = time.perf_counter()
+        g.log_body = random.random() < sample_rate
+
+        # read before the view parses the stream, the data stays cached for it
+        if g.log_body and request.content_length:
+            g.request_body = capture_body(request.get_data(cache=True), max_bytes)
+
+    @app.after_request
+    def write_access_log(response: Response) -> Response:
+        if _is_skipped() or not hasattr(g, "request_start"):
+            return response
+
+        record = {
+            "request_id": g.request_uuid,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "duration_ms": round((time.perf_counter() - g.request_start) * 1000, 2),
+            "user_id": (
+                current_user.get_id() if current_user.is_authenticated else None
+            ),
+            "remote_addr": request.remote_addr,
+            "request_bytes": request.content_length,
+            "response_bytes": response.content_length,
+            "content_type": response.mimetype,
+        }
+        record.update(getattr(g, "access_log_fields", {}))
+
+        if g.log_body:
+            if getattr(g, "request_body", None):
+                record["request_body"] = g.request_body
+            if not response.is_streamed and response.mimetype == "application/json":
+                record["response_body"] = capture_body(response.get_data(), max_bytes)
+
+        app.logger.info("access %s", json.dumps(record, default=str))
+        return response
+
+
+def add_access_log_fields(**fields) -> None:
+    """Attach extra fields to the access record of the current request."""
+
+    if not hasattr(g, "access_log_fields"):
+        g.access_log_fields = {}
+    g.access_log_fields.update(fields)
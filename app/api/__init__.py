@@ -1,25 +1,47 @@
 # pylint: skip-file
 
 from dataclasses import dataclass
+from typing import Any
 
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, jsonify
 from flask_sqlalchemy.pagination import Pagination
 
 from app.constants import HttpRequestEnum
+from app.pagination import CursorPagination
 
 api_bp = Blueprint("api", __name__)
 
 
 @dataclass
 class ApiResponse:
-    """Api response template data class."""
+    """Api response template data class.
+
+    Services return it as plain data, route handlers call json() at the HTTP edge.
+    """
 
     code: HttpRequestEnum = HttpRequestEnum.SUCCESS_OK.value
-    data: object = None
+    data: Any = None
     message: str = "success"
-    pagination: Pagination = None
+    pagination: Pagination | CursorPagination = None
+
+    @property
+    def page_info(self) -> dict:
+        """Return the pagination details, or None if not paginated."""
+
+        if not self.pagination:
+            return None
+
+        if isinstance(self.pagination, CursorPagination):
+            return self.pagination.page_info
+
+        return {
+            "page": self.pagination.page,
+            "per_page": self.pagination.per_page,
+            "total_items": self.pagination.total,
+            "total_pages": self.pagination.pages,
+        }
 
-    def json(self) -> str:
+    def json(self) -> Response:
         """Convert the response to JSON."""
 
         response_dict = {
@@ -29,12 +51,7 @@ class ApiResponse:
         }
 
         if self.pagination:
-            response_dict["pagination"] = {
-                "page": self.pagination.page,
-                "per_page": self.pagination.per_page,
-                "total_items": self.pagination.total,
-                "total_pages": self.pagination.pages,
-            }
+            response_dict["pagination"] = self.page_info
 
         response = jsonify(response_dict)
         response.status_code = self.code
@@ -54,7 +54,7 @@ from .service import (
 def user_verification(user_name: str) -> ApiResponse:
     """verify the user's identity."""
 
-    return user_verification_service(user_name)
+    return user_verification_service(user_name).json()
 
 
 @api_bp.route("/users/email/<user_email>", methods=["GET"])
@@ -62,7 +62,7 @@ def user_verification(user_name: str) -> ApiResponse:
 def user_verification_email(user_email: str) -> ApiResponse:
     """verify the user's email."""
 
-    return user_email_verify_service(user_email)
+    return user_email_verify_service(user_email).json()
 
 
 @api_bp.route("/users/email/<user_password>", methods=["GET"])
@@ -70,7 +70,7 @@ def user_verification_email(user_email: str) -> ApiResponse:
 def user_verification_password(user_password: str) -> ApiResponse:
     """verify the user's password."""
 
-    return user_password_verify_service(user_password)
+    return user_password_verify_service(user_password).json()
 
 
 # Api for user module.
@@ -85,7 +85,7 @@ def user_communities() -> ApiResponse:
     page = request.args.get("page", default=1, type=int)
     per_page = request.args.get("per_page", default=10, type=int)
 
-    return user_communities_service(page, per_page)
+    return user_communities_service(page, per_page).json()
 
 
 @api_bp.route("/users/posts", methods=["GET"])
@@ -96,8 +96,9 @@ def user_posts() -> ApiResponse:
     # pagination parameters
     page = request.args.get("page", default=1, type=int)
     per_page = request.args.get("per_page", default=10, type=int)
+    cursor = request.args.get("cursor")
 
-    return user_posts_service(page, per_page)
+    return user_posts_service(page, per_page, cursor).json()
 
 
 @api_bp.route("/users/replies", methods=["GET"])
@@ -108,8 +109,9 @@ def user_replies() -> ApiResponse:
     # pagination parameters
     page = request.args.get("page", default=1, type=int)
     per_page = request.args.get("per_page", default=10, type=int)
+    cursor = request.args.get("cursor")
 
-    return user_replies_service(page, per_page)
+    return user_replies_service(page, per_page, cursor).json()
 
 
 @api_bp.route("/users/records", methods=["GET"])
@@ -120,8 +122,9 @@ def user_records() -> ApiResponse:
     # get pagination parameters
     page = request.args.get("page", default=1, type=int)
     per_page = request.args.get("per_page", default=10, type=int)
+    cursor = request.args.get("cursor")
 
-    return users_records_service(page, per_page)
+    return users_records_service(page, per_page, cursor).json()
 
 
 @api_bp.route("/users/records/<int:request_id>", methods=["POST", "DELETE"])
@@ -130,10 +133,10 @@ def users_record(request_id: int) -> ApiResponse:
     """Save or delete a request view record by user id and request id."""
 
     if request.method == "POST":
-        return post_user_record_service(request_id)
+        return post_user_record_service(request_id).json()
 
     if request.method == "DELETE":
-        return delete_user_record_service(request_id)
+        return delete_user_record_service(request_id).json()
 
     abort(HttpRequestEnum.METHOD_NOT_ALLOWED.value)
 
@@ -146,8 +149,9 @@ def user_likes() -> ApiResponse:
     # pagination parameters
     page = request.args.get("page", default=1, type=int)
     per_page = request.args.get("per_page", default=10, type=int)
+    cursor = request.args.get("cursor")
 
-    return user_likes_service(page, per_page)
+    return user_likes_service(page, per_page, cursor).json()
 
 
 @api_bp.route("/users/likes", methods=["POST", "DELETE"])
@@ -158,10 +162,10 @@ def user_like() -> ApiResponse:
     reply_id = request.get_json().get("reply_id")
 
     if request.method == "POST":
-        return post_user_like_service(request_id, reply_id)
+        return post_user_like_service(request_id, reply_id).json()
 
     if request.method == "DELETE":
-        return delete_user_like_service(request_id, reply_id)
+        return delete_user_like_service(request_id, reply_id).json()
 
     abort(HttpRequestEnum.METHOD_NOT_ALLOWED.value)
 
@@ -174,8 +178,9 @@ def user_saves() -> ApiResponse:
     # pagination parameters
     page = request.args.get("page", default=1, type=int)
     per_page = request.args.get("per_page", default=10, type=int)
+    cursor = request.args.get("cursor")
 
-    return user_saves_service(page, per_page)
+    return user_saves_service(page, per_page, cursor).json()
 
 
 @api_bp.route("/users/saves", methods=["POST", "DELETE"])
@@ -186,11 +191,10 @@ def user_save() -> ApiResponse:
     reply_id = request.get_json().get("reply_id")
 
     if request.method == "POST":
-        response = post_user_save_service(request_id, reply_id)
-        return response
+        return post_user_save_service(request_id, reply_id).json()
 
     if request.method == "DELETE":
-        return delete_user_save_service(request_id, reply_id)
+        return delete_user_save_service(request_id, reply_id).json()
 
     abort(HttpRequestEnum.METHOD_NOT_ALLOWED.value)
 
@@ -210,8 +214,11 @@ def user_notifications() -> ApiResponse:
     # get pagination parameters
     page = request.args.get("page", default=1, type=int)
     per_page = request.args.get("per_page", default=10, type=int)
+    cursor = request.args.get("cursor")
 
-    return users_notices_service(notice_type, status, order_by, page, per_page)
+    return users_notices_service(
+        notice_type, status, order_by, page, per_page, cursor
+    ).json()
 
 
 @api_bp.route("/users/notifications/<int:notice_id>", methods=["GET", "PUT"])
@@ -220,10 +227,10 @@ def user_notice(notice_id: int) -> ApiResponse:
     """GET or PUT a notice by id."""
 
     if request.method == "GET":
-        return get_user_notice_service(notice_id)
+        return get_user_notice_service(notice_id).json()
 
     if request.method == "PUT":
-        return put_user_notice_service(notice_id)
+        return put_user_notice_service(notice_id).json()
 
     abort(HttpRequestEnum.METHOD_NOT_ALLOWED.value)
 
@@ -233,7 +240,7 @@ def user_notice(notice_id: int) -> ApiResponse:
 def user_stats():
     """Get the user's statistics."""
 
-    return user_stats_service()
+    return user_stats_service().json()
 
 
 # Api for community module.
@@ -244,7 +251,7 @@ def user_stats():
 def join_community(community_id: int) -> ApiResponse:
     """Join a community by user id and community id."""
 
-    return join_community_service(community_id)
+    return join_community_service(community_id).json()
 
 
 @api_bp.route("/communities/<int:community_id>/leave", methods=["POST"])
@@ -252,7 +259,7 @@ def join_community(community_id: int) -> ApiResponse:
 def leave_community(community_id: int) -> ApiResponse:
     """Leave a community by user id and community id."""
 
-    return leave_community_service(community_id)
+    return leave_community_service(community_id).json()
 
 
 @api_bp.route("/communities/<int:community_id>/delete", methods=["DELETE"])
@@ -260,7 +267,7 @@ def leave_community(community_id: int) -> ApiResponse:
 def delete_community(community_id: int) -> ApiResponse:
     """Delete a community by id."""
 
-    return delete_community_service(community_id)
+    return delete_community_service(community_id).json()
 
 
 # Api for popular module.
@@ -280,11 +287,16 @@ def posts() -> ApiResponse:
     # get sort parameters
     order_by = request.args.get("order_by")
 
+    # get projection parameters, e.g. fields=id,title,author.username
+    fields = request.args.get("fields")
+    fields = tuple(field.strip() for field in fields.split(",")) if fields else None
+
     # get pagination parameters
     page = request.args.get("page", default=1, type=int)
     per_page = request.args.get("per_page", default=10, type=int)
+    cursor = request.args.get("cursor")
 
-    return posts_service(community_id, order_by, page, per_page)
+    return posts_service(community_id, order_by, page, per_page, fields, cursor).json()
 
 
 @api_bp.route("/posts/create/comment", methods=["POST", "PUT", "DELETE"])
@@ -310,13 +322,13 @@ def post_comment() -> ApiResponse:
     if request.method == "POST":
         if not post_id or not content:
             return ApiResponse(400, "Wrong parameters for post comment").json()
-        return post_user_comments_service(post_id, reply_id, content)
+        return post_user_comments_service(post_id, reply_id, content).json()
 
     if request.method == "PUT":
-        return update_user_comments_service(reply_id, content)
+        return update_user_comments_service(reply_id, content).json()
 
     if request.method == "DELETE":
-        return delete_user_comments_service(request_post_id, request_reply_id)
+        return delete_user_comments_service(request_post_id, request_reply_id).json()
 
     return ApiResponse(400, "Invalid request method").json()
 
@@ -344,19 +356,19 @@ def post_related() -> ApiResponse:
     if request.method == "POST":
         if not title or not community or not content:
             return ApiResponse(400, "Wrong parameters for post").json()
-        return user_post_service(title, community, content, tag_id)
+        return user_post_service(title, community, content, tag_id).json()
 
     if request.method == "PUT":
         if not referer_post_id:
             return ApiResponse(400, "Post ID missing for update").json()
         return update_user_post_service(
             referer_post_id, title, community, content, tag_id
-        )
+        ).json()
 
     if request.method == "DELETE":
         if not request_post_id:
             return ApiResponse(400, "Post ID missing for deletion").json()
-        return delete_post_service(request_post_id)
+        return delete_post_service(request_post_id).json()
 
     return ApiResponse(400, "Invalid request method").json()
 
@@ -369,7 +381,7 @@ def post_related() -> ApiResponse:
 def categories() -> ApiResponse:
     """Get all categories."""
 
-    return categories_service()
+    return categories_service().json()
 
 
 @api_bp.route("/categories/<category_id>", methods=["GET"])
@@ -377,7 +389,7 @@ def categories() -> ApiResponse:
 def category(category_id: int) -> ApiResponse:
     """Get a category by id."""
 
-    return category_service(category_id)
+    return category_service(category_id).json()
 
 
 @api_bp.route("/tags", methods=["GET"])
@@ -385,7 +397,7 @@ def category(category_id: int) -> ApiResponse:
 def tags() -> ApiResponse:
     """Get all tags."""
 
-    return tags_service()
+    return tags_service().json()
 
 
 @api_bp.route("/tags/<tag_id>", methods=["GET"])
@@ -393,7 +405,7 @@ def tags() -> ApiResponse:
 def tag(tag_id: int) -> ApiResponse:
     """Get a tag by id."""
 
-    return tag_service(tag_id)
+    return tag_service(tag_id).json()
 
 
 @api_bp.route("/stats", methods=["GET"])
@@ -401,11 +413,11 @@ def tag(tag_id: int) -> ApiResponse:
 def stats() -> ApiResponse:
     """Get all stats."""
 
-    return stats_service()
+    return stats_service().json()
 
 
 @api_bp.route("/upload/image", methods=["POST"])
 @jwt_required()
 def upload_image() -> ApiResponse:
     """Upload image to R2."""
-    return upload_image_service(request.files.get("image"))
+    return upload_image_service(request.files.get("image")).json()
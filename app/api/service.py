@@ -1,28 +1,69 @@
 """Services for api."""
 
-from flask import current_app, g
+from flask import current_app
 from flask_login import current_user
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import selectinload
 from werkzeug.datastructures import FileStorage
 
-from app.constants import HttpRequestEnum
+from app.cache import invalidate_cache
+from app.constants import (
+    PURGE_BACKGROUND_THRESHOLD,
+    TRENDING_DEFAULT_PERIOD,
+    TRENDING_PERIODS,
+    CacheNamespaceEnum,
+    HttpRequestEnum,
+)
+from app.counter import get_global_stats, get_user_stats
+from app.database import read_only
+from app.engagement import EngagementResultEnum, add_engagement, remove_engagement
 from app.extensions import db
+from app.images import ImageProcessingError, process_upload
 from app.models.category import Category
 from app.models.community import Community
+from app.models.community_member import CommunityMember
 from app.models.reply import Reply
-from app.models.request import Request
+from app.models.request import Request, validate_request_fields
 from app.models.tag import Tag
 from app.models.trending import Trending
 from app.models.user import User
 from app.models.user_like import UserLike
 from app.models.user_notice import UserNotice
-from app.models.user_preference import UserPreference
 from app.models.user_record import UserRecord
 from app.models.user_save import UserSave
+from app.notice.broker import notice_broker
 from app.notice.events import NoticeTypeEnum, notice_event
-from app.services.r2_service import R2Service
+from app.pagination import InvalidCursorError, cursor_paginate, order_by_keys
+from app.purge import (
+    count_post_rows,
+    purge_post,
+    purge_reply_thread,
+    schedule_post_purge,
+)
+from app.services.r2_service import R2Service, get_r2_service
+from app.utils import dialect_insert
 
 from . import ApiResponse
 
+
+def paginate(query, keys: list, page: int, per_page: int, cursor: str = None):
+    """Paginate a query by page number, or by cursor when one is given.
+
+    The cursor mode only counts the total items on its first page, cursor "".
+    """
+
+    if cursor is not None:
+        return cursor_paginate(query, keys, cursor, per_page, count=not cursor)
+
+    return db.paginate(order_by_keys(query, keys), page=page, per_page=per_page)
+
+
+def created_keys(model: db.Model) -> list:
+    """Return the sort keys of a list of rows, newest first."""
+
+    return [(model.create_at, True), (model.id, True)]
+
+
 # Api service for auth module.
 
 
@@ -32,9 +73,9 @@ def user_verification_service(user_name: str) -> ApiResponse:
     result_count = User.query.filter_by(username=user_name).count()
 
     return (
-        ApiResponse(data={"result": False}).json()
+        ApiResponse(data={"result": False})
         if result_count
-        else ApiResponse(data={"result": True}).json()
+        else ApiResponse(data={"result": True})
     )
 
 
@@ -44,9 +85,9 @@ def user_email_verify_service(user_email: str) -> ApiResponse:
     result_count = User.query.filter_by(email=user_email).count()
 
     return (
-        ApiResponse(data={"result": False}).json()
+        ApiResponse(data={"result": False})
         if result_count
-        else ApiResponse(data={"result": True}).json()
+        else ApiResponse(data={"result": True})
     )
 
 
@@ -56,9 +97,9 @@ def user_password_verify_service(user_password: str) -> ApiResponse:
     result_count = User.query.filter_by(password_hash=user_password).count()
 
     return (
-        ApiResponse(data={"result": False}).json()
+        ApiResponse(data={"result": False})
         if result_count
-        else ApiResponse(data={"result": True}).json()
+        else ApiResponse(data={"result": True})
     )
 
 
@@ -70,14 +111,13 @@ def user_communities_service(page: int = 1, per_page: int = 10) -> ApiResponse:
 
     user_id: str = current_user.id
 
-    # basic query
-    user_communities = (
-        db.session.query(UserPreference).filter_by(user_id=user_id).first()
-    )
-    community_ids = _get_user_community_ids(user_communities)
-
     # retrieve communities
-    query = db.session.query(Community).filter(Community.id.in_(community_ids))
+    query = (
+        select(Community)
+        .join(CommunityMember, CommunityMember.community_id == Community.id)
+        .where(CommunityMember.user_id == user_id)
+        .order_by(Community.id)
+    )
 
     # pagination
     pagination = db.paginate(query, page=page, per_page=per_page)
@@ -87,79 +127,79 @@ def user_communities_service(page: int = 1, per_page: int = 10) -> ApiResponse:
 
     return ApiResponse(
         data={"user_communities": community_collection}, pagination=pagination
-    ).json()
+    )
 
 
-def user_posts_service(page: int = 1, per_page: int = 10) -> ApiResponse:
+def user_posts_service(
+    page: int = 1, per_page: int = 10, cursor: str = None
+) -> ApiResponse:
     """Service for getting all user posts."""
 
     user_id: str = current_user.id
 
     # basic query
     query = (
-        db.session.query(Request)
-        .filter_by(author_id=user_id)
-        .order_by(Request.create_at.desc())
+        select(Request).options(*Request.feed_options()).filter_by(author_id=user_id)
     )
 
     # pagination
-    pagination = db.paginate(query, page=page, per_page=per_page)
+    try:
+        pagination = paginate(query, created_keys(Request), page, per_page, cursor)
+    except InvalidCursorError:
+        return ApiResponse(HttpRequestEnum.BAD_REQUEST.value, message="invalid cursor")
 
     # convert to JSON data
     post_collection = [post.to_dict() for post in pagination.items]
 
-    return ApiResponse(
-        data={"user_posts": post_collection}, pagination=pagination
-    ).json()
+    return ApiResponse(data={"user_posts": post_collection}, pagination=pagination)
 
 
-def user_replies_service(page: int = 1, per_page: int = 10) -> ApiResponse:
+def user_replies_service(
+    page: int = 1, per_page: int = 10, cursor: str = None
+) -> ApiResponse:
     """Service for getting all user replies."""
 
     user_id: str = current_user.id
 
     # basic query
-    query = (
-        db.session.query(Reply)
-        .filter_by(replier_id=user_id)
-        .order_by(Reply.create_at.desc())
-    )
+    query = select(Reply).filter_by(replier_id=user_id)
 
     # pagination
-    pagination = db.paginate(query, page=page, per_page=per_page)
+    try:
+        pagination = paginate(query, created_keys(Reply), page, per_page, cursor)
+    except InvalidCursorError:
+        return ApiResponse(HttpRequestEnum.BAD_REQUEST.value, message="invalid cursor")
 
     # convert to JSON data
     reply_collection = [reply.to_dict() for reply in pagination.items]
 
-    return ApiResponse(
-        data={"user_replies": reply_collection}, pagination=pagination
-    ).json()
+    return ApiResponse(data={"user_replies": reply_collection}, pagination=pagination)
 
 
 def users_records_service(
     page: int = 1,
     per_page: int = 10,
+    cursor: str = None,
 ) -> ApiResponse:
     """Service for getting all users records."""
 
     user_id: str = current_user.id
 
     # basic query
-    query = (
-        db.session.query(UserRecord)
-        .filter_by(user_id=user_id)
-        .order_by(UserRecord.create_at.desc())
-    )
+    query = select(UserRecord).filter_by(user_id=user_id)
 
     # pagination
-    pagination = db.paginate(query, page=page, per_page=per_page)
+    try:
+        pagination = paginate(query, created_keys(UserRecord), page, per_page, cursor)
+    except InvalidCursorError:
+        return ApiResponse(HttpRequestEnum.BAD_REQUEST.value, message="invalid cursor")
 
     # convert to JSON data
     user_record_collection = [record.to_dict() for record in pagination.items]
 
     return ApiResponse(
         data={"user_records": user_record_collection}, pagination=pagination
-    ).json()
+    )
 
 
 def post_user_record_service(request_id: int) -> ApiResponse:
@@ -168,9 +208,7 @@ def post_user_record_service(request_id: int) -> ApiResponse:
     # validate request_id
     request_entity = db.session.query(Request).get(request_id)
     if request_entity is None:
-        return ApiResponse(
-            HttpRequestEnum.NOT_FOUND.value, message="request not found"
-        ).json()
+        return ApiResponse(HttpRequestEnum.NOT_FOUND.value, message="request not found")
 
     user_id: str = current_user.id
 
@@ -184,7 +222,7 @@ def post_user_record_service(request_id: int) -> ApiResponse:
     if user_record_entity is not None:
         return ApiResponse(
             HttpRequestEnum.BAD_REQUEST.value, message="user record already exists"
-        ).json()
+        )
 
     # add user record
     user_record_entity = UserRecord(user_id=user_id, request_id=request_id)
@@ -194,9 +232,7 @@ def post_user_record_service(request_id: int) -> ApiResponse:
         f"User {user_id} added Record for Request {request_id} successfully"
     )
 
-    return ApiResponse(
-        HttpRequestEnum.CREATED.value, message="add user record success"
-    ).json()
+    return ApiResponse(HttpRequestEnum.CREATED.value, message="add user record success")
 
 
 def delete_user_record_service(request_id: int) -> ApiResponse:
@@ -205,9 +241,7 @@ def delete_user_record_service(request_id: int) -> ApiResponse:
     # validate request_id
     request_entity = db.session.query(Request).get(request_id)
     if request_entity is None:
-        return ApiResponse(
-            HttpRequestEnum.NOT_FOUND.value, message="request not found"
-        ).json()
+        return ApiResponse(HttpRequestEnum.NOT_FOUND.value, message="request not found")
 
     user_id: str = current_user.id
 
@@ -221,7 +255,7 @@ def delete_user_record_service(request_id: int) -> ApiResponse:
     if user_record_entity is None:
         return ApiResponse(
             HttpRequestEnum.NOT_FOUND.value, message="user record not found"
-        ).json()
+        )
 
     # delete request record
     db.session.delete(user_record_entity)
@@ -233,143 +267,94 @@ def delete_user_record_service(request_id: int) -> ApiResponse:
 
     return ApiResponse(
         HttpRequestEnum.NO_CONTENT.value, message="delete user record success"
-    ).json()
+    )
 
 
-def user_likes_service(page: int = 1, per_page: int = 10) -> ApiResponse:
+def user_likes_service(
+    page: int = 1, per_page: int = 10, cursor: str = None
+) -> ApiResponse:
     """Service for getting all user likes."""
 
     user_id: str = current_user.id
 
     # basic query
-    query = (
-        db.session.query(UserLike)
-        .filter_by(user_id=user_id)
-        .order_by(UserLike.create_at.desc())
-    )
+    query = select(UserLike).filter_by(user_id=user_id)
 
     # pagination
-    pagination = db.paginate(query, page=page, per_page=per_page)
+    try:
+        pagination = paginate(query, created_keys(UserLike), page, per_page, cursor)
+    except InvalidCursorError:
+        return ApiResponse(HttpRequestEnum.BAD_REQUEST.value, message="invalid cursor")
 
     # convert to JSON data
     like_collection = [like.to_dict() for like in pagination.items]
 
-    return ApiResponse(
-        data={"user_likes": like_collection}, pagination=pagination
-    ).json()
+    return ApiResponse(data={"user_likes": like_collection}, pagination=pagination)
+
+
+def engagement_error(
+    result: EngagementResultEnum, code: int, message: str
+) -> ApiResponse:
+    """Return the response of a like or save toggle that changed nothing."""
+
+    if result is EngagementResultEnum.REQUEST_NOT_FOUND:
+        return ApiResponse(HttpRequestEnum.NOT_FOUND.value, message="request not found")
+    if result is EngagementResultEnum.REPLY_NOT_FOUND:
+        return ApiResponse(HttpRequestEnum.NOT_FOUND.value, message="reply not found")
+    return ApiResponse(code, message=message)
 
 
 def post_user_like_service(request_id: int, reply_id: int) -> ApiResponse:
     """Service for liking a request of a reply."""
 
-    # Validate request_id
-    request_entity = db.session.query(Request).filter_by(id=request_id).first()
-    if request_entity is None:
-        return ApiResponse(
-            HttpRequestEnum.NOT_FOUND.value, message="request not found"
-        ).json()
-
     user_id: str = current_user.id
 
-    # Check if user like already exists
-    user_like_entity = (
-        db.session.query(UserLike)
-        .filter_by(user_id=user_id, request_id=request_id, reply_id=reply_id)
-        .first()
-    )
-
-    if user_like_entity is not None:
-        return ApiResponse(
-            HttpRequestEnum.BAD_REQUEST.value, message="like already exists"
-        ).json()
+    result = add_engagement(UserLike, user_id, request_id, reply_id)
+    if result is not EngagementResultEnum.DONE:
+        return engagement_error(
+            result, HttpRequestEnum.BAD_REQUEST.value, "like already exists"
+        )
 
-    # Add user like
-    user_like_entity = UserLike(
-        user_id=user_id, request_id=request_id, reply_id=reply_id
+    current_app.logger.info(
+        f"User {user_id} liked Request {request_id} Reply {reply_id} successfully"
     )
-    db.session.add(user_like_entity)
 
-    if reply_id is None:
-        request_entity.like_num += 1
-        db.session.commit()
-        current_app.logger.info(
-            f"User {user_id} liked Request {request_id} successfully"
-        )
-    else:
-        reply_entity = db.session.query(Reply).get(reply_id)
-        if reply_entity is None:
-            return ApiResponse(
-                HttpRequestEnum.NOT_FOUND.value, message="reply not found"
-            ).json()
-        reply_entity.like_num += 1
-        db.session.commit()
-        current_app.logger.info(f"User {user_id} liked Reply {reply_id} successfully")
-
-    return ApiResponse(HttpRequestEnum.CREATED.value, message="like success").json()
+    return ApiResponse(HttpRequestEnum.CREATED.value, message="like success")
 
 
 def delete_user_like_service(request_id: int, reply_id: int) -> ApiResponse:
     """Service for unliking a request or a reply."""
 
-    # Validate request_id
-    request_entity = db.session.query(Request).get(request_id)
-    if request_entity is None:
-        return ApiResponse(
-            HttpRequestEnum.NOT_FOUND.value, message="request not found"
-        ).json()
-
     user_id: str = current_user.id
 
-    # Check if user like exists
-    user_like_entity = (
-        db.session.query(UserLike)
-        .filter_by(user_id=user_id, request_id=request_id, reply_id=reply_id)
-        .first()
-    )
-
-    if user_like_entity is None:
-        return ApiResponse(
-            HttpRequestEnum.NOT_FOUND.value, message="like not found"
-        ).json()
-
-    # Unlike request or reply
-    if reply_id is None:
-        request_entity.like_num -= 1
-        db.session.delete(user_like_entity)
-        db.session.commit()
-        current_app.logger.info(
-            f"User {user_id} unliked Request {request_id} successfully"
+    result = remove_engagement(UserLike, user_id, request_id, reply_id)
+    if result is not EngagementResultEnum.DONE:
+        return engagement_error(
+            result, HttpRequestEnum.NOT_FOUND.value, "like not found"
         )
-    else:
-        reply_entity = db.session.query(Reply).get(reply_id)
-        if reply_entity is None:
-            return ApiResponse(
-                HttpRequestEnum.NOT_FOUND.value, message="reply not found"
-            ).json()
-        reply_entity.like_num -= 1
-        db.session.delete(user_like_entity)
-        db.session.commit()
-        current_app.logger.info(f"User {user_id} unliked Reply {reply_id} successfully")
 
-    return ApiResponse(
-        HttpRequestEnum.NO_CONTENT.value, message="unlike success"
-    ).json()
+    current_app.logger.info(
+        f"User {user_id} unliked Request {request_id} Reply {reply_id} successfully"
+    )
 
+    return ApiResponse(HttpRequestEnum.NO_CONTENT.value, message="unlike success")
 
-def user_saves_service(page: int = 1, per_page: int = 10) -> ApiResponse:
+
+def user_saves_service(
+    page: int = 1, per_page: int = 10, cursor: str = None
+) -> ApiResponse:
     """Service for getting all user saves."""
 
     user_id: str = current_user.id
 
     # basic query
-    query = (
-        db.session.query(UserSave)
-        .filter_by(user_id=user_id)
-        .order_by(UserSave.create_at.desc())
-    )
+    query = select(UserSave).filter_by(user_id=user_id)
 
     # pagination
-    pagination = db.paginate(query, page=page, per_page=per_page)
+    try:
+        pagination = paginate(query, created_keys(UserSave), page, per_page, cursor)
+    except InvalidCursorError:
+        return ApiResponse(HttpRequestEnum.BAD_REQUEST.value, message="invalid cursor")
 
     # convert to JSON data
     save_collection = [save.to_dict() for save in pagination.items]
@@ -378,124 +363,60 @@ def user_saves_service(page: int = 1, per_page: int = 10) -> ApiResponse:
         HttpRequestEnum.SUCCESS_OK.value,
         data={"user_saves": save_collection},
         pagination=pagination,
-    ).json()
+    )
 
 
 def post_user_save_service(request_id: int, reply_id: int) -> ApiResponse:
     """Service for saving a request or a reply."""
 
-    # Validate request_id
-    request_entity = db.session.query(Request).get(request_id)
-    if request_entity is None:
-        return ApiResponse(
-            HttpRequestEnum.NOT_FOUND.value, message="request not found"
-        ).json()
-
     user_id: str = current_user.id
 
-    # Check if user save already exists
-    user_save_entity = (
-        db.session.query(UserSave)
-        .filter_by(user_id=user_id, request_id=request_id, reply_id=reply_id)
-        .first()
-    )
-
-    if user_save_entity is not None:
-        return ApiResponse(
-            HttpRequestEnum.BAD_REQUEST.value, message="save already exists"
-        ).json()
+    result = add_engagement(UserSave, user_id, request_id, reply_id)
+    if result is not EngagementResultEnum.DONE:
+        return engagement_error(
+            result, HttpRequestEnum.BAD_REQUEST.value, "save already exists"
+        )
 
-    # Add user save
-    user_save_entity = UserSave(
-        user_id=user_id, request_id=request_id, reply_id=reply_id
+    current_app.logger.info(
+        f"User {user_id} saved Request {request_id} Reply {reply_id} successfully"
     )
-    db.session.add(user_save_entity)
 
-    if reply_id is None:
-        request_entity.save_num += 1
-        db.session.commit()
-        current_app.logger.info(
-            f"User {user_id} saved Request {request_id} successfully"
-        )
-    else:
-        reply_entity = db.session.query(Reply).get(reply_id)
-        if reply_entity is None:
-            return ApiResponse(
-                HttpRequestEnum.NOT_FOUND.value, message="reply not found"
-            ).json()
-        reply_entity.save_num += 1
-        db.session.commit()
-        current_app.logger.info(f"User {user_id} saved Reply {reply_id} successfully")
-
-    return ApiResponse(HttpRequestEnum.CREATED.value, message="save success").json()
+    return ApiResponse(HttpRequestEnum.CREATED.value, message="save success")
 
 
 def delete_user_save_service(request_id: int, reply_id: int) -> ApiResponse:
     """Service for deleting a user save of a request or a reply."""
 
-    # Validate request_id
-    request_entity = db.session.query(Request).get(request_id)
-    if request_entity is None:
-        return ApiResponse(
-            HttpRequestEnum.NOT_FOUND.value, message="request not found"
-        ).json()
-
     user_id: str = current_user.id
 
-    # Check if user save exists
-    user_save_entity = (
-        db.session.query(UserSave)
-        .filter_by(user_id=user_id, request_id=request_id, reply_id=reply_id)
-        .first()
-    )
-
-    if user_save_entity is None:
-        return ApiResponse(
-            HttpRequestEnum.NOT_FOUND.value, message="save not found"
-        ).json()
-
-    # Unsave request or reply
-    if reply_id is None:
-        request_entity.save_num -= 1
-        db.session.delete(user_save_entity)
-        db.session.commit()
-        current_app.logger.info(
-            f"User {user_id} unsaved Request {request_id} successfully"
+    result = remove_engagement(UserSave, user_id, request_id, reply_id)
+    if result is not EngagementResultEnum.DONE:
+        return engagement_error(
+            result, HttpRequestEnum.NOT_FOUND.value, "save not found"
         )
-    else:
-        reply_entity = db.session.query(Reply).get(reply_id)
-        if reply_entity is None:
-            return ApiResponse(
-                HttpRequestEnum.NOT_FOUND.value, message="reply not found"
-            ).json()
-        reply_entity.save_num -= 1
-        db.session.delete(user_save_entity)
-        db.session.commit()
-        current_app.logger.info(f"User {user_id} unsaved Reply {reply_id} successfully")
 
-    return ApiResponse(
-        HttpRequestEnum.NO_CONTENT.value, message="unsave success"
-    ).json()
+    current_app.logger.info(
+        f"User {user_id} unsaved Request {request_id} Reply {reply_id} successfully"
+    )
+
+    return ApiResponse(HttpRequestEnum.NO_CONTENT.value, message="unsave success")
 
 
+# pylint: disable=too-many-arguments
 def users_notices_service(
     notice_type: str = None,
     status: str = None,
     order_by: str = "create_at_desc",
     page: int = 1,
     per_page: int = 5,
+    cursor: str = None,
 ) -> ApiResponse:
     """Service for getting all users notices."""
 
     user_id: str = current_user.id
 
     # basic query
-    query = (
-        db.session.query(UserNotice)
-        .filter_by(user_id=user_id)
-        .order_by(UserNotice.status)
-        .order_by(UserNotice.create_at.desc())
-    )
+    query = select(UserNotice).filter_by(user_id=user_id)
 
     # apply filters
     if notice_type:
@@ -505,23 +426,26 @@ def users_notices_service(
         status_bool = status.lower() == "read"
         query = query.filter(UserNotice.status == status_bool)
 
-    # apply sort
-    if order_by == "create_at":
-        query = query.order_by(UserNotice.create_at)
-    elif order_by == "create_at_desc":
-        query = query.order_by(UserNotice.create_at.desc())
-    elif order_by == "status":
-        query = query.order_by(UserNotice.status)
+    # apply sort, unread notices first
+    descending = order_by != "create_at"
+    keys = [
+        (UserNotice.status, False),
+        (UserNotice.create_at, descending),
+        (UserNotice.id, descending),
+    ]
 
     # pagination
-    pagination = db.paginate(query, page=page, per_page=per_page)
+    try:
+        pagination = paginate(query, keys, page, per_page, cursor)
+    except InvalidCursorError:
+        return ApiResponse(HttpRequestEnum.BAD_REQUEST.value, message="invalid cursor")
 
     # convert to JSON data
     notice_collection = [notice.to_dict() for notice in pagination.items]
 
     return ApiResponse(
         data={"user_notifications": notice_collection}, pagination=pagination
-    ).json()
+    )
 
 
 def get_user_notice_service(notice_id: int) -> ApiResponse:
@@ -532,9 +456,9 @@ def get_user_notice_service(notice_id: int) -> ApiResponse:
     if notice_entity is None:
         return ApiResponse(
             HttpRequestEnum.NOT_FOUND.value, message="user notice not found"
-        ).json()
+        )
 
-    return ApiResponse(data={"user_notification": notice_entity.to_dict()}).json()
+    return ApiResponse(data={"user_notification": notice_entity.to_dict()})
 
 
 def put_user_notice_service(notice_id: int) -> ApiResponse:
@@ -545,73 +469,41 @@ def put_user_notice_service(notice_id: int) -> ApiResponse:
     if notice_entity is None:
         return ApiResponse(
             HttpRequestEnum.NOT_FOUND.value, message="user notice not found"
-        ).json()
+        )
 
     # update notice status
     notice_entity.status = not notice_entity.status
     db.session.commit()
 
-    # update global notice number
-    g.notice_num = db.session.query(UserNotice).filter_by(status=False).count()
+    # push the new unread count to the open notification streams
+    notice_broker.publish(
+        notice_entity.user_id,
+        "read",
+        {"id": notice_id, "delta": -1 if notice_entity.status else 1},
+    )
 
     return ApiResponse(
         HttpRequestEnum.NO_CONTENT.value,
         message="update success",
-    ).json()
+    )
 
 
 def user_stats_service() -> ApiResponse:
     """Service for getting user stats."""
 
     if current_user.is_anonymous:
-        return ApiResponse(data={"user_stats": None}).json()
+        return ApiResponse(data={"user_stats": None})
 
     user_id = current_user.id
 
-    user_preference = (
-        db.session.query(UserPreference).filter_by(user_id=user_id).first()
+    # pylint: disable=not-callable
+    community_num = db.session.scalar(
+        select(func.count()).where(CommunityMember.user_id == user_id)
     )
-    community_ids = _get_user_community_ids(user_preference)
-
-    community_num = len(community_ids)
-    request_num = db.session.query(Request).filter_by(author_id=user_id).count()
-    reply_num = db.session.query(Reply).filter_by(replier_id=user_id).count()
-    view_num = db.session.query(UserRecord).filter_by(user_id=user_id).count()
-    like_num = db.session.query(UserLike).filter_by(user_id=user_id).count()
-    save_num = db.session.query(UserSave).filter_by(user_id=user_id).count()
-
-    stats = {
-        "community_num": community_num,
-        "request_num": request_num,
-        "view_num": view_num,
-        "reply_num": reply_num,
-        "like_num": like_num,
-        "save_num": save_num,
-    }
-
-    return ApiResponse(data={"user_stats": stats}).json()
 
+    stats = {"community_num": community_num, **get_user_stats(user_id)}
 
-def _get_user_community_ids(user_preference: UserPreference) -> list:
-    """Get user community ids from user preference."""
-
-    if user_preference is None:
-        return []
-
-    if user_preference.communities is None or user_preference.communities == "":
-        return []
-
-    try:
-        # Try to parse as a list string
-        communities_str = user_preference.communities.strip()
-        if communities_str.startswith("[") and communities_str.endswith("]"):
-            communities_str = communities_str[1:-1]
-            if not communities_str:
-                return []
-            return [int(id.strip()) for id in communities_str.split(",") if id.strip()]
-        return []
-    except (ValueError, AttributeError):
-        return []
+    return ApiResponse(data={"user_stats": stats})
 
 
 # Api service for community module.
@@ -634,44 +526,44 @@ def communities_service(
 
     # convert to JSON data
     community_collection = [community.to_dict() for community in pagination.items]
-
-    # community posts number
-    for community in community_collection:
-        community["posts"] = (
-            db.session.query(Request).filter_by(community_id=community["id"]).count()
-        )
-
-    # if user joined community
-    user_communities = (
-        db.session.query(UserPreference).filter_by(user_id=current_user.id).first()
+    page_ids = [community["id"] for community in community_collection]
+
+    # posts and members number of the page, by indexed grouped counts
+    # pylint: disable=not-callable
+    post_counts = dict(
+        db.session.execute(
+            select(Request.community_id, func.count())
+            .where(Request.community_id.in_(page_ids))
+            .group_by(Request.community_id)
+        ).all()
+    )
+    member_counts = dict(
+        db.session.execute(
+            select(CommunityMember.community_id, func.count())
+            .where(CommunityMember.community_id.in_(page_ids))
+            .group_by(CommunityMember.community_id)
+        ).all()
     )
-    community_ids = _get_user_community_ids(user_communities)
 
-    for community in community_collection:
-        community["joined"] = community["id"] in community_ids
-
-    # community members number
-    user_preferences = UserPreference.query.all()
-    community_counts = {}
-    for user_preference in user_preferences:
-        if user_preference.communities:
-            communities = (
-                user_preference.communities
-                if isinstance(user_preference.communities, list)
-                else _get_user_community_ids(user_preference)
+    # if user joined community
+    joined_ids = set()
+    if current_user.is_authenticated:
+        joined_ids = set(
+            db.session.scalars(
+                select(CommunityMember.community_id)
+                .where(CommunityMember.user_id == current_user.id)
+                .where(CommunityMember.community_id.in_(page_ids))
             )
-            for comm_id in communities:
-                if comm_id in community_counts:
-                    community_counts[comm_id] += 1
-                else:
-                    community_counts[comm_id] = 1
+        )
 
     for community in community_collection:
-        community["members"] = community_counts.get(community["id"], 0)
+        community["posts"] = post_counts.get(community["id"], 0)
+        community["members"] = member_counts.get(community["id"], 0)
+        community["joined"] = community["id"] in joined_ids
 
     return ApiResponse(
         data={"communities": community_collection}, pagination=pagination
-    ).json()
+    )
 
 
 def join_community_service(community_id: int) -> ApiResponse:
@@ -684,39 +576,32 @@ def join_community_service(community_id: int) -> ApiResponse:
     if community is None:
         return ApiResponse(
             HttpRequestEnum.NOT_FOUND.value, message="community not found"
-        ).json()
-
-    user_preference = (
-        db.session.query(UserPreference).filter_by(user_id=user_id).first()
-    )
-
-    if user_preference is None:
-        user_preference = UserPreference(
-            user_id=user_id, communities=str([community_id]), interests=str([])
         )
-        db.session.add(user_preference)
-
-    else:
-        community_ids = _get_user_community_ids(user_preference)
-        if community in community_ids:
-            return ApiResponse(
-                HttpRequestEnum.BAD_REQUEST.value,
-                message="user already joined community",
-            ).json()
-
-        user_preference.communities = str(
-            list(set(_get_user_community_ids(user_preference) + [community_id]))
+
+    connection = db.session.connection()
+    statement = dialect_insert(connection, CommunityMember.__table__)
+    joined = connection.execute(
+        statement.on_conflict_do_nothing(),
+        {"user_id": user_id, "community_id": community_id},
+    ).rowcount
+    if not joined:
+        return ApiResponse(
+            HttpRequestEnum.BAD_REQUEST.value,
+            message="user already joined community",
         )
 
     db.session.commit()
     current_app.logger.info(
         f"User: {user_id} joined Community {community_id} successfully"
     )
+    # invalidate cached widgets
+    invalidate_cache(CacheNamespaceEnum.COMMUNITIES)
+
     notice_event(notice_type=NoticeTypeEnum.COMMUNITY_JOIN)
 
     return ApiResponse(
         HttpRequestEnum.SUCCESS_OK.value, message="join community success"
-    ).json()
+    )
 
 
 def leave_community_service(community_id: int) -> ApiResponse:
@@ -729,34 +614,31 @@ def leave_community_service(community_id: int) -> ApiResponse:
     if community is None:
         return ApiResponse(
             HttpRequestEnum.NOT_FOUND.value, message="community not found"
-        ).json()
-
-    user_preference = (
-        db.session.query(UserPreference).filter_by(user_id=user_id).first()
-    )
-
-    if user_preference is None:
-        return ApiResponse(
-            HttpRequestEnum.BAD_REQUEST.value, message="user not joined community"
-        ).json()
+        )
 
-    community_ids = _get_user_community_ids(user_preference)
-    if community_id not in community_ids:
+    left = db.session.execute(
+        delete(CommunityMember).where(
+            CommunityMember.user_id == user_id,
+            CommunityMember.community_id == community_id,
+        )
+    ).rowcount
+    if not left:
         return ApiResponse(
             HttpRequestEnum.BAD_REQUEST.value, message="user not joined community"
-        ).json()
+        )
 
-    community_ids.remove(community_id)
-    user_preference.communities = str(community_ids)
     db.session.commit()
     current_app.logger.info(
         f"User: {user_id} left Community {community_id} successfully"
     )
+    # invalidate cached widgets
+    invalidate_cache(CacheNamespaceEnum.COMMUNITIES)
+
     notice_event(notice_type=NoticeTypeEnum.COMMUNITY_LEAVE)
 
     return ApiResponse(
         HttpRequestEnum.SUCCESS_OK.value, message="leave community success"
-    ).json()
+    )
 
 
 def delete_community_service(community_id: int) -> ApiResponse:
@@ -769,22 +651,33 @@ def delete_community_service(community_id: int) -> ApiResponse:
     if community is None:
         return ApiResponse(
             HttpRequestEnum.NOT_FOUND.value, message="community not found"
-        ).json()
+        )
 
     if community.creator_id != user_id:
         return ApiResponse(
             HttpRequestEnum.FORBIDDEN.value, message="user is not creator of community"
-        ).json()
+        )
 
     # delete community
+    db.session.execute(
+        delete(CommunityMember).where(CommunityMember.community_id == community_id)
+    )
     db.session.delete(community)
     db.session.commit()
     current_app.logger.info(f"User: {user_id} deleted Community {community_id}")
+    # invalidate cached widgets
+    invalidate_cache(
+        CacheNamespaceEnum.STATS,
+        CacheNamespaceEnum.COMMUNITIES,
+        CacheNamespaceEnum.COMMUNITY_OPTIONS,
+        CacheNamespaceEnum.LEADERBOARDS,
+    )
+
     notice_event(notice_type=NoticeTypeEnum.COMMUNITY_DELETED)
 
     return ApiResponse(
         HttpRequestEnum.NO_CONTENT.value, message="delete community success"
-    ).json()
+    )
 
 
 def community_options_service() -> ApiResponse:
@@ -795,65 +688,92 @@ def community_options_service() -> ApiResponse:
         {"value": community.id, "label": community.name} for community in communities
     ]
 
-    return ApiResponse(data={"community_options": community_options}).json()
+    return ApiResponse(data={"community_options": community_options})
 
 
 # Api service for popular module.
 
 
-def populars_service(limit: int = 10) -> ApiResponse:
-    """Get all popular requests by limit."""
+@read_only
+def populars_service(
+    limit: int = 10, period: str = TRENDING_DEFAULT_PERIOD
+) -> ApiResponse:
+    """Get the popular requests of a trending period by limit."""
+
+    if period not in TRENDING_PERIODS:
+        return ApiResponse(
+            HttpRequestEnum.BAD_REQUEST.value, message="invalid trending period"
+        )
 
     # query
     trendings = (
-        db.session.query(Trending).order_by(Trending.view_num.desc()).limit(limit)
+        db.session.query(Trending)
+        .filter(Trending.period == period)
+        .options(
+            selectinload(Trending.request).options(*Request.feed_options()),
+            selectinload(Trending.author),
+        )
+        .order_by(Trending.score.desc(), Trending.view_num.desc())
+        .limit(limit)
     )
 
     # convert to JSON data
     popular_collection = [trending.to_dict() for trending in trendings]
 
-    return ApiResponse(data={"populars": popular_collection}).json()
+    return ApiResponse(data={"populars": popular_collection})
 
 
 # Api service for post module.
 
+# sort keys of the posts feed, counters may be NULL on older rows
+POST_SORT_KEYS = {
+    "create_at_desc": Request.create_at,
+    "update_at_desc": Request.update_at,
+    "reply_num_desc": func.coalesce(Request.reply_num, 0),
+    "view_num_desc": func.coalesce(Request.view_num, 0),
+    "like_num_desc": func.coalesce(Request.like_num, 0),
+    "save_num_desc": func.coalesce(Request.save_num, 0),
+}
+
 
+# pylint: disable=too-many-arguments
+@read_only
 def posts_service(
     community_id: int,
     order_by: str = "create_at_desc",
     page: int = 1,
     per_page: int = 10,
+    fields: tuple = None,
+    cursor: str = None,
 ) -> ApiResponse:
-    """Service for getting all posts."""
+    """Service for getting all posts, optionally projected to the given fields."""
 
-    # basic query
-    query = db.session.query(Request)
+    if fields is not None and not validate_request_fields(fields):
+        return ApiResponse(
+            HttpRequestEnum.BAD_REQUEST.value, message="invalid post fields"
+        )
+
+    # basic query, relationships are loaded once per page
+    query = select(Request).options(*Request.feed_options(fields))
 
     # apply filters
     if community_id:
         query = query.filter(Request.community_id == community_id)
 
-    # apply sort
-    if order_by == "create_at_desc":
-        query = query.order_by(Request.create_at.desc())
-    elif order_by == "update_at_desc":
-        query = query.order_by(Request.update_at.desc())
-    elif order_by == "reply_num_desc":
-        query = query.order_by(Request.reply_num.desc())
-    elif order_by == "view_num_desc":
-        query = query.order_by(Request.view_num.desc())
-    elif order_by == "like_num_desc":
-        query = query.order_by(Request.like_num.desc())
-    elif order_by == "save_num_desc":
-        query = query.order_by(Request.save_num.desc())
+    # apply sort, newest first by default
+    sort_key = POST_SORT_KEYS.get(order_by, Request.create_at)
+    keys = [(sort_key, True), (Request.id, True)]
 
     # pagination
-    pagination = db.paginate(query, page=page, per_page=per_page)
+    try:
+        pagination = paginate(query, keys, page, per_page, cursor)
+    except InvalidCursorError:
+        return ApiResponse(HttpRequestEnum.BAD_REQUEST.value, message="invalid cursor")
 
     # convert to JSON data
-    post_collection = [post.to_dict() for post in pagination.items]
+    post_collection = [post.to_dict(fields) for post in pagination.items]
 
-    return ApiResponse(data={"posts": post_collection}, pagination=pagination).json()
+    return ApiResponse(data={"posts": post_collection}, pagination=pagination)
 
 
 def update_user_comments_service(reply_id1, content):
@@ -865,7 +785,7 @@ def update_user_comments_service(reply_id1, content):
             404,
             "Comment not found or not authorized",
             {"comment_id": reply_id1, "message": reply_id1},
-        ).json()  # pylint: disable=C0301
+        )  # pylint: disable=C0301
 
     comment_query.content = content
     db.session.commit()
@@ -877,7 +797,7 @@ def update_user_comments_service(reply_id1, content):
         200,
         "Comment updated successfully",
         {"comment_id": comment_query.id, "post_id": comment_query.request_id},
-    ).json()  # pylint: disable=C0301
+    )  # pylint: disable=C0301
 
 
 def post_user_comments_service(post_id, reply_id, content):
@@ -904,6 +824,9 @@ def post_user_comments_service(post_id, reply_id, content):
 
     db.session.commit()
 
+    # invalidate cached widgets
+    invalidate_cache(CacheNamespaceEnum.STATS)
+
     # notice event
     notice_event(notice_type=NoticeTypeEnum.REPLY_CREATED)
 
@@ -911,7 +834,7 @@ def post_user_comments_service(post_id, reply_id, content):
         201,
         "Comment posted successfully",
         {"id": new_comment.id, "post_id": new_comment.request_id},
-    ).json()  # pylint: disable=C0301
+    )  # pylint: disable=C0301
 
 
 def user_post_service(title_name, community_name, content, tag_name):
@@ -920,13 +843,11 @@ def user_post_service(title_name, community_name, content, tag_name):
     user_id: str = current_user.id
     community_query = db.session.query(Community).filter_by(name=community_name).first()
     if not community_query:
-        return ApiResponse(
-            404, "Community not found", {"community": community_name}
-        ).json()
+        return ApiResponse(404, "Community not found", {"community": community_name})
     community_id = community_query.id
     tag_query = db.session.query(Tag).filter_by(name=tag_name).first()
     if not tag_query:
-        return ApiResponse(404, "Tag not found").json()
+        return ApiResponse(404, "Tag not found")
     tag_id = tag_query.id
     new_post = Request(
         author_id=user_id,
@@ -943,12 +864,13 @@ def user_post_service(title_name, community_name, content, tag_name):
     db.session.add(new_post)
     db.session.commit()
 
+    # invalidate cached widgets
+    invalidate_cache(CacheNamespaceEnum.STATS)
+
     # notice event
     notice_event(notice_type=NoticeTypeEnum.POST_CREATED)
 
-    return ApiResponse(
-        201, "Comment posted successfully", {"post_id": new_post.id}
-    ).json()
+    return ApiResponse(201, "Comment posted successfully", {"post_id": new_post.id})
 
 
 def update_user_post_service(post_id, title_name, community_name, content, tag_name):
@@ -958,18 +880,16 @@ def update_user_post_service(post_id, title_name, community_name, content, tag_n
     if not post_query:
         return ApiResponse(
             404, "Post not found or not authorized", {"post_id": post_id}
-        ).json()
+        )
 
     community_query = db.session.query(Community).filter_by(name=community_name).first()
     if not community_query:
-        return ApiResponse(
-            404, "Community not found", {"community": community_name}
-        ).json()
+        return ApiResponse(404, "Community not found", {"community": community_name})
     community_id = community_query.id
 
     tag_query = db.session.query(Tag).filter_by(name=tag_name).first()
     if not tag_query:
-        return ApiResponse(404, "Tag not found", {"tag": tag_name}).json()
+        return ApiResponse(404, "Tag not found", {"tag": tag_name})
     tag_id = tag_query.id
     post_query.title = title_name
     post_query.content = content
@@ -980,87 +900,73 @@ def update_user_post_service(post_id, title_name, community_name, content, tag_n
     # notice event
     notice_event(notice_type=NoticeTypeEnum.POST_UPDATED)
 
-    return ApiResponse(
-        200, "Post updated successfully", {"post_id": post_query.id}
-    ).json()
+    return ApiResponse(200, "Post updated successfully", {"post_id": post_query.id})
 
 
 def delete_post_service(post_id):
-    """Service to delete a post and its replies."""
-
-    # Delete all replies related to the post
-    replies = db.session.query(Reply).filter_by(request_id=post_id).all()
-    for reply in replies:
-        db.session.delete(reply)
-
-    # Delete all user records related to the post
-    user_records = db.session.query(UserRecord).filter_by(request_id=post_id).all()
-    for record in user_records:
-        db.session.delete(record)
-
-    # Delete all user saves related to the post
-    user_saves = db.session.query(UserSave).filter_by(request_id=post_id).all()
-    for save in user_saves:
-        db.session.delete(save)
-
-    # Delete all user likes related to the post
-    user_likes = db.session.query(UserLike).filter_by(request_id=post_id).all()
-    for like in user_likes:
-        db.session.delete(like)
-
-    # remove trending post
-    trendings = db.session.query(Trending).filter_by(request_id=post_id).all()
-    if trendings:
-        for trending in trendings:
-            db.session.delete(trending)
-
-    # Delete the post
-    post = db.session.query(Request).get(post_id)
+    """Service to delete a post and its replies, in the background when large."""
+
+    post = db.session.get(Request, post_id)
     if not post:
-        return ApiResponse(404, "Post not found", {"post_id": post_id}).json()
-    db.session.delete(post)
-    db.session.commit()
+        return ApiResponse(
+            HttpRequestEnum.NOT_FOUND.value,
+            message="Post not found",
+            data={"post_id": post_id},
+        )
 
-    # notice event
-    notice_event(notice_type=NoticeTypeEnum.POST_DELETED)
+    # very large posts are purged in batches by a background worker
+    threshold = current_app.config.get(
+        "PURGE_BACKGROUND_THRESHOLD", PURGE_BACKGROUND_THRESHOLD
+    )
+    if count_post_rows(post) > threshold:
+        # pylint: disable=protected-access
+        schedule_post_purge(current_app._get_current_object(), post_id)
+        notice_event(notice_type=NoticeTypeEnum.POST_DELETED)
 
-    return ApiResponse(200, "Post deleted successfully", {"post_id": post_id}).json()
+        return ApiResponse(
+            HttpRequestEnum.ACCEPTED.value,
+            message="Post deletion scheduled",
+            data={"post_id": post_id},
+        )
 
+    purge_post(post_id)
 
-def delete_user_comments_service(post_id, reply_id):
-    """Service to delete a comment and its child comments."""
+    # invalidate cached widgets
+    invalidate_cache(
+        CacheNamespaceEnum.STATS,
+        CacheNamespaceEnum.POPULARS,
+        CacheNamespaceEnum.LEADERBOARDS,
+    )
 
-    child_replies = db.session.query(Reply).filter_by(reply_id=reply_id).all()
-    child_count = len(child_replies)
+    # notice event
+    notice_event(notice_type=NoticeTypeEnum.POST_DELETED)
 
-    for child_reply in child_replies:
-        db.session.delete(child_reply)
+    return ApiResponse(
+        HttpRequestEnum.SUCCESS_OK.value,
+        message="Post deleted successfully",
+        data={"post_id": post_id},
+    )
 
-    # Delete all user saves and user like related to the reply
-    user_saves = db.session.query(UserSave).filter_by(reply_id=reply_id).all()
-    for save in user_saves:
-        db.session.delete(save)
 
-    user_likes = db.session.query(UserLike).filter_by(reply_id=reply_id).all()
-    for like in user_likes:
-        db.session.delete(like)
+def delete_user_comments_service(post_id, reply_id):
+    """Service to delete a comment and its whole thread of child comments."""
 
-    reply = db.session.query(Reply).filter_by(id=reply_id).first()
-    request = db.session.query(Request).filter_by(id=post_id).first()
+    reply = db.session.get(Reply, reply_id)
+    if reply is None or str(reply.request_id) != str(post_id):
+        return ApiResponse(HttpRequestEnum.NOT_FOUND.value, message="Comment not found")
 
-    if reply:
-        db.session.delete(reply)
-        request.reply_num -= child_count + 1
+    purge_reply_thread(reply.id)
 
-        db.session.commit()
+    # invalidate cached widgets
+    invalidate_cache(CacheNamespaceEnum.STATS)
 
-        # notice event
-        notice_event(notice_type=NoticeTypeEnum.REPLY_DELETED)
+    # notice event
+    notice_event(notice_type=NoticeTypeEnum.REPLY_DELETED)
 
-        return ApiResponse(
-            200, "Comment and its child comments deleted successfully"
-        ).json()
-    return ApiResponse(404, "Comment not found").json()
+    return ApiResponse(
+        HttpRequestEnum.SUCCESS_OK.value,
+        message="Comment and its child comments deleted successfully",
+    )
 
 
 # Api service for notice module.
@@ -1079,9 +985,7 @@ def categories_service() -> ApiResponse:
     # convert to JSON data
     category_collection = [category.to_dict() for category in pagination.items]
 
-    return ApiResponse(
-        data={"categories": category_collection}, pagination=pagination
-    ).json()
+    return ApiResponse(data={"categories": category_collection}, pagination=pagination)
 
 
 def category_service(category_id: int) -> ApiResponse:
@@ -1092,9 +996,9 @@ def category_service(category_id: int) -> ApiResponse:
     if category is None:
         return ApiResponse(
             HttpRequestEnum.NOT_FOUND.value, message="category not found"
-        ).json()
+        )
 
-    return ApiResponse(data={"category": category.to_dict()}).json()
+    return ApiResponse(data={"category": category.to_dict()})
 
 
 def tags_service() -> ApiResponse:
@@ -1107,7 +1011,7 @@ def tags_service() -> ApiResponse:
     # convert to JSON data
     tags_collection = [tag.to_dict() for tag in pagination.items]
 
-    return ApiResponse(data={"tags": tags_collection}, pagination=pagination).json()
+    return ApiResponse(data={"tags": tags_collection}, pagination=pagination)
 
 
 def tag_service(tag_id: int) -> ApiResponse:
@@ -1116,56 +1020,70 @@ def tag_service(tag_id: int) -> ApiResponse:
     tag = Tag.query.get(tag_id)
 
     if tag is None:
-        return ApiResponse(
-            HttpRequestEnum.NOT_FOUND.value, message="tag not found"
-        ).json()
+        return ApiResponse(HttpRequestEnum.NOT_FOUND.value, message="tag not found")
 
-    return ApiResponse(data={"tag": tag.to_dict()}).json()
+    return ApiResponse(data={"tag": tag.to_dict()})
 
 
+@read_only
 def stats_service() -> ApiResponse:
     """Service for getting stats."""
 
-    user_num = db.session.query(User).count()
-    community_num = db.session.query(Community).count()
-    request_num = db.session.query(Request).count()
-    reply_num = db.session.query(Reply).count()
-    view_num = db.session.query(UserRecord).count()
-    like_num = db.session.query(UserLike).count()
-    save_num = db.session.query(UserSave).count()
+    global_stat = get_global_stats()
 
     stats = {
-        "user_num": user_num,
-        "community_num": community_num,
-        "request_num": request_num,
-        "view_num": view_num,
-        "reply_num": reply_num,
-        "like_num": like_num,
-        "save_num": save_num,
+        "user_num": global_stat.user_num,
+        "community_num": global_stat.community_num,
+        "request_num": global_stat.request_num,
+        "view_num": global_stat.view_num,
+        "reply_num": global_stat.reply_num,
+        "like_num": global_stat.like_num,
+        "save_num": global_stat.save_num,
     }
 
-    return ApiResponse(data={"stats": stats}).json()
+    return ApiResponse(data={"stats": stats})
 
 
-def upload_image_service(image_file: FileStorage) -> ApiResponse:
-    """Service for uploading image."""
+def upload_image_service(
+    image_file: FileStorage, variants: tuple = ("full",)
+) -> ApiResponse:
+    """Service for uploading image, stored as the variants of IMAGE_VARIANTS."""
 
     if image_file is None:
         return ApiResponse(
             code=HttpRequestEnum.BAD_REQUEST.value,
             message="Image file is required",
-        ).json()
-
-    r2_service = R2Service()
+        )
 
-    image_url = r2_service.upload_file(image_file)
+    data = image_file.read(R2Service.MAX_FILE_SIZE + 1)
+    if len(data) > R2Service.MAX_FILE_SIZE:
+        return ApiResponse(
+            code=HttpRequestEnum.BAD_REQUEST.value,
+            message="Image file is too large",
+        )
 
-    if image_url is None:
+    try:
+        images = process_upload(data, variants)
+    except ImageProcessingError:
+        return ApiResponse(
+            code=HttpRequestEnum.BAD_REQUEST.value,
+            message="Invalid image",
+        )
+    except TimeoutError:
         return ApiResponse(
             code=HttpRequestEnum.INTERNAL_SERVER_ERROR.value,
-            message="Image upload failed",
-        ).json()
+            message="Image processing timed out",
+        )
+
+    r2_service = get_r2_service()
+    image_urls = {
+        image.variant: r2_service.upload_bytes(
+            image.data, image.object_key("images"), image.content_type
+        )
+        for image in images
+    }
 
     return ApiResponse(
-        data={"image_url": image_url}, message="Image uploaded successfully"
-    ).json()
+        data={"image_url": image_urls[variants[0]], "variants": image_urls},
+        message="Image uploaded successfully",
+    )
@@ -0,0 +1,229 @@
+"""Application cache for data shared by every user, e.g. the home page widgets.
+
+Values live in a backend: the in-process LRU+TTL store by default, or a shared
+store such as Redis when CACHE_REDIS_URL is configured. Keys are grouped in
+namespaces, and invalidating a namespace bumps its version, so stale keys are
+never read again and simply age out of the backend. The local store only sees
+the invalidations of its own process, other workers catch up at expiry.
+"""
+
+import functools
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Flask
+
+try:
+    import redis
+except ImportError:  # optional, the local cache is used without it
+    redis = None
+
+from app.constants import CACHE_DEFAULT_TTL, CACHE_MAX_SIZE, CacheNamespaceEnum
+from app.metrics import CACHE_REQUESTS
+
+MISSING = object()
+
+
+class CacheBackend:
+    """Interface of a cache backend, shared backends implement the same methods."""
+
+    def get(self, key: str):
+        """Get a value, MISSING when absent or expired."""
+
+        raise NotImplementedError
+
+    def set(self, key: str, value, ttl: int) -> None:
+        """Store a value for ttl seconds."""
+
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        """Remove a value."""
+
+        raise NotImplementedError
+
+    def incr(self, key: str) -> int:
+        """Atomically increase a counter that never expires, returns the new value."""
+
+        raise NotImplementedError
+
+    def get_counter(self, key: str) -> int:
+        """Get a counter, 0 when it was never increased."""
+
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """Remove every value."""
+
+        raise NotImplementedError
+
+
+class LocalCacheBackend(CacheBackend):
+    """In-process LRU store with per-key expiry, safe across threads."""
+
+    def __init__(self, max_size: int = CACHE_MAX_SIZE) -> None:
+        self.max_size = max_size
+        self._store = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._store.get(key)
+            if entry is None:
+                return MISSING
+
+            value, expire_at = entry
+            if expire_at is not None and expire_at <= time.monotonic():
+                del self._store[key]
+                return MISSING
+
+            self._store.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl: int = None) -> None:
+        expire_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._store[key] = (value, expire_at)
+            self._store.move_to_end(key)
+            while len(self._store) > self.max_size:
+                self._store.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._store.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        # counters are kept apart from the LRU, an evicted namespace version
+        # would bring back the values it invalidated
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def get_counter(self, key: str) -> int:
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._store.clear()
+            self._counters.clear()
+
+
+class SharedCacheBackend(CacheBackend):
+    """Backend over a shared store client with the Redis get/set/delete/incr API.
+
+    Values are pickled, so they must be plain data.
+    """
+
+    def __init__(self, client, prefix: str = "askify:") -> None:
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str):
+        payload = self.client.get(self.prefix + key)
+        return MISSING if payload is None else pickle.loads(payload)
+
+    def set(self, key: str, value, ttl: int = None) -> None:
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl)
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+    def incr(self, key: str) -> int:
+        return int(self.client.incr(self.prefix + key))
+
+    def get_counter(self, key: str) -> int:
+        return int(self.client.get(self.prefix + key) or 0)
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(f"{self.prefix}*"):
+            self.client.delete(key)
+
+
+class Cache:
+    """Namespaced cache over a backend."""
+
+    def __init__(self, backend: CacheBackend, default_ttl: int = CACHE_DEFAULT_TTL):
+        self.backend = backend
+        self.default_ttl = default_ttl
+
+    def _key(self, namespace: CacheNamespaceEnum, key: str) -> str:
+        """Build a backend key under the current version of its namespace."""
+
+        version = self.backend.get_counter(f"version:{namespace.value}")
+        return f"{namespace.value}:{version}:{key}"
+
+    def get(self, namespace: CacheNamespaceEnum, key: str):
+        """Get a cached value, MISSING on a miss."""
+
+        value = self.backend.get(self._key(namespace, key))
+        CACHE_REQUESTS.labels(
+            namespace.value, "miss" if value is MISSING else "hit"
+        ).inc()
+        return value
+
+    def set(
+        self, namespace: CacheNamespaceEnum, key: str, value, ttl: int = None
+    ) -> None:
+        """Cache a value, for the default ttl unless given."""
+
+        self.backend.set(self._key(namespace, key), value, ttl or self.default_ttl)
+
+    def invalidate(self, *namespaces: CacheNamespaceEnum) -> None:
+        """Invalidate every key of the namespaces."""
+
+        for namespace in namespaces:
+            self.backend.incr(f"version:{namespace.value}")
+
+    def cached(self, namespace: CacheNamespaceEnum, ttl: int = None):
+        """Decorate a function of plain arguments to cache its results."""
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                key = f"{func.__module__}.{func.__qualname__}:{args!r}:{kwargs!r}"
+                value = self.get(namespace, key)
+                if value is MISSING:
+                    value = func(*args, **kwargs)
+                    self.set(namespace, key, value, ttl)
+                return value
+
+            return wrapper
+
+        return decorator
+
+
+cache = Cache(LocalCacheBackend())
+
+
+def cached(namespace: CacheNamespaceEnum, ttl: int = None):
+    """Decorate a function to cache its results in the application cache."""
+
+    return cache.cached(namespace, ttl)
+
+
+def invalidate_cache(*namespaces: CacheNamespaceEnum) -> None:
+    """Invalidate namespaces of the application cache after a write."""
+
+    cache.invalidate(*namespaces)
+
+
+def init_cache(app: Flask) -> None:
+    """Set up the application cache backend from the app config."""
+
+    max_size = app.config.get("CACHE_MAX_SIZE", CACHE_MAX_SIZE)
+    cache.backend = LocalCacheBackend(max_size)
+    cache.default_ttl = app.config.get("CACHE_DEFAULT_TTL", CACHE_DEFAULT_TTL)
+
+    redis_url = app.config.get("CACHE_REDIS_URL")
+    if not redis_url:
+        return
+
+    if redis is None:
+        app.logger.warning("redis is not installed, using the local cache")
+        return
+
+    cache.backend = SharedCacheBackend(redis.Redis.from_url(redis_url))
@@ -1,14 +1,16 @@
 """This module contains the routes for the community blueprint."""
 
+import click
 from flask import (current_app, flash, redirect, render_template, request,
                    url_for)
 from flask_login import current_user, login_required
 
 from app.api.service import (categories_service, communities_service,
                              user_communities_service)
+from app.cache import invalidate_cache
 from app.community import community_bp, forms, service
-from app.constants import (DISPLAY_COMMUNITY_NUM, FlashAlertTypeEnum,
-                           HttpRequestEnum)
+from app.constants import (DISPLAY_COMMUNITY_NUM, CacheNamespaceEnum,
+                           FlashAlertTypeEnum, HttpRequestEnum)
 from app.extensions import db
 from app.models.community import Community
 from app.notice.events import NoticeTypeEnum, notice_event
@@ -24,11 +26,11 @@ def community(community_id: int = None):
     # communities
     communities_result = communities_service(
         community_id=community_id, per_page=DISPLAY_COMMUNITY_NUM
-    ).get_json()
-    communities = communities_result.get("data").get("communities")
+    )
+    communities = communities_result.data.get("communities")
 
     # pagination
-    community_pagination = communities_result.get("pagination")
+    community_pagination = communities_result.page_info
     pagination = get_pagination_details(
         current_page=community_pagination["page"],
         total_pages=community_pagination["total_pages"],
@@ -54,11 +56,11 @@ def community_list():
     per_page = request.args.get("per_page", default=DISPLAY_COMMUNITY_NUM, type=int)
 
     # communities
-    communities_result = communities_service(page=page, per_page=per_page).get_json()
-    communities = communities_result.get("data").get("communities")
+    communities_result = communities_service(page=page, per_page=per_page)
+    communities = communities_result.data.get("communities")
 
     # pagination
-    community_pagination = communities_result.get("pagination")
+    community_pagination = communities_result.page_info
     pagination = get_pagination_details(
         current_page=community_pagination["page"],
         total_pages=community_pagination["total_pages"],
@@ -82,16 +84,14 @@ def user_community():
     per_page = request.args.get("per_page", default=6, type=int)
 
     # user communities
-    user_communities_response = user_communities_service(
-        page=page, per_page=per_page
-    ).get_json()
-    user_communities = user_communities_response.get("data").get("user_communities")
+    user_communities_result = user_communities_service(page=page, per_page=per_page)
+    user_communities = user_communities_result.data.get("user_communities")
 
     # pagination
     pagination = get_pagination_details(
-        user_communities_response.get("pagination")["page"],
-        user_communities_response.get("pagination")["total_pages"],
-        user_communities_response.get("pagination")["total_items"],
+        user_communities_result.page_info["page"],
+        user_communities_result.page_info["total_pages"],
+        user_communities_result.page_info["total_items"],
     )
 
     return render_template(
@@ -113,16 +113,14 @@ def user_community_list():
     per_page = request.args.get("per_page", default=6, type=int)
 
     # user communities
-    user_communities_response = user_communities_service(
-        page=page, per_page=per_page
-    ).get_json()
-    user_communities = user_communities_response.get("data").get("user_communities")
+    user_communities_result = user_communities_service(page=page, per_page=per_page)
+    user_communities = user_communities_result.data.get("user_communities")
 
     # pagination
     pagination = get_pagination_details(
-        user_communities_response.get("pagination")["page"],
-        user_communities_response.get("pagination")["total_pages"],
-        user_communities_response.get("pagination")["total_items"],
+        user_communities_result.page_info["page"],
+        user_communities_result.page_info["total_pages"],
+        user_communities_result.page_info["total_items"],
     )
 
     return render_template(
@@ -147,7 +145,7 @@ def community_management(community_id: int = None):
         community_entity = db.session.query(Community).get(community_id)
 
     # categories
-    categories = categories_service().get_json().get("data").get("categories")
+    categories = categories_service().data.get("categories")
     form.category_select.choices = [
         (category.get("id"), category.get("name")) for category in categories
     ]
@@ -159,10 +157,16 @@ def community_management(community_id: int = None):
                 community_entity = create_response.get("data")
                 # add community to the database
                 db.session.add(community_entity)
+                db.session.commit()
                 current_app.logger.info(
                     "Community %s create successfully.", {community_entity.name}
                 )
                 notice_event(notice_type=NoticeTypeEnum.COMMUNITY_CREATED)
+                invalidate_cache(
+                    CacheNamespaceEnum.STATS,
+                    CacheNamespaceEnum.COMMUNITIES,
+                    CacheNamespaceEnum.COMMUNITY_OPTIONS,
+                )
                 flash(
                     "Community create successfully.", FlashAlertTypeEnum.SUCCESS.value
                 )
@@ -201,6 +205,9 @@ def community_management(community_id: int = None):
                 "Community %s update successfully.", {community_entity.name}
             )
             notice_event(notice_type=NoticeTypeEnum.COMMUNITY_UPDATED)
+            invalidate_cache(
+                CacheNamespaceEnum.COMMUNITIES, CacheNamespaceEnum.COMMUNITY_OPTIONS
+            )
             flash("Community update successfully.", FlashAlertTypeEnum.SUCCESS.value)
         else:
             message = update_response.get("message")
@@ -229,3 +236,11 @@ def community_management(community_id: int = None):
         form=form,
         community=community_entity,
     )
+
+
+@community_bp.cli.command("migrate-members")
+def migrate_members():
+    """Move the legacy user preference memberships to the community member table."""
+
+    migrated = service.migrate_community_members()
+    click.echo(f"Migrated {migrated} community memberships.")
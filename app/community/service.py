@@ -1,10 +1,16 @@
 """This module contains the service layer for the community app."""
 
+from flask import current_app
+from sqlalchemy import bindparam, select
 from werkzeug.datastructures import FileStorage
 
 from app.api.service import upload_image_service
 from app.constants import HttpRequestEnum
+from app.extensions import db
 from app.models.community import Community
+from app.models.community_member import CommunityMember
+from app.models.user_preference import UserPreference
+from app.utils import dialect_insert
 
 from .forms import CommunityForm
 
@@ -93,7 +99,101 @@ def update_community_service(community: Community, form: CommunityForm) -> dict:
 def get_upload_avatar_url(avatar_file: FileStorage):
     """Get upload avatar url."""
 
-    upload_avatar_response = upload_image_service(avatar_file).get_json()
-    if upload_avatar_response.get("code") != HttpRequestEnum.SUCCESS_OK.value:
+    upload_avatar_result = upload_image_service(avatar_file, variants=("avatar",))
+    if upload_avatar_result.code != HttpRequestEnum.SUCCESS_OK.value:
         return None
-    return upload_avatar_response.get("data").get("image_url")
+    return upload_avatar_result.data.get("image_url")
+
+
+def parse_community_ids(communities: str):
+    """Parse the legacy membership string of a user preference.
+
+    Both the listed form, e.g. "[1, 2]", and the bare form, e.g. "1,3,5", are
+    read. Returns None when the string is neither.
+    """
+
+    if not communities:
+        return []
+
+    communities = communities.strip()
+    if communities.startswith("[") and communities.endswith("]"):
+        communities = communities[1:-1]
+
+    try:
+        return [
+            int(community_id.strip())
+            for community_id in communities.split(",")
+            if community_id.strip()
+        ]
+    except ValueError:
+        return None
+
+
+def migrate_community_members() -> int:
+    """Move the legacy membership strings of user preferences to community members.
+
+    Memberships are inserted in one statement, existing ones are kept, and the
+    migrated ids are removed from the strings in the same transaction, so a
+    second run does not bring back a community the user has left since. The ids
+    of communities that do not exist stay in the string, and a string that does
+    not parse is left as it is. Returns the number of memberships found.
+    """
+
+    community_ids = set(db.session.scalars(select(Community.id)))
+    preferences = db.session.execute(
+        select(UserPreference.id, UserPreference.user_id, UserPreference.communities)
+        .where(UserPreference.communities.is_not(None))
+        .where(UserPreference.communities != "")
+    ).all()
+
+    members = set()
+    # preference id -> the membership string left once migrated
+    remaining = {}
+    for preference in preferences:
+        parsed_ids = parse_community_ids(preference.communities)
+        if parsed_ids is None:
+            current_app.logger.warning(
+                f"Membership string of preference {preference.id} not migrated: "
+                f"{preference.communities!r}."
+            )
+            continue
+
+        members.update(
+            (preference.user_id, community_id)
+            for community_id in parsed_ids
+            if community_id in community_ids
+        )
+        left_ids = [
+            community_id
+            for community_id in dict.fromkeys(parsed_ids)
+            if community_id not in community_ids
+        ]
+        left = str(left_ids) if left_ids else ""
+        if left != preference.communities:
+            remaining[preference.id] = left
+
+    connection = db.session.connection()
+    if members:
+        statement = dialect_insert(connection, CommunityMember.__table__)
+        connection.execute(
+            statement.on_conflict_do_nothing(),
+            [
+                {"user_id": user_id, "community_id": community_id}
+                for user_id, community_id in members
+            ],
+        )
+
+    if remaining:
+        table = UserPreference.__table__
+        connection.execute(
+            table.update()
+            .where(table.c.id == bindparam("preference_id"))
+            .values(communities=bindparam("left")),
+            [
+                {"preference_id": preference_id, "left": left}
+                for preference_id, left in remaining.items()
+            ],
+        )
+    db.session.commit()
+
+    return len(members)
@@ -89,15 +89,46 @@ DICEBEAR_AVATAR_URL = "https://api.dicebear.com/8.x/pixel-art/jpg?seed="
 # Flask Global Variable
 G_USER = "user"
 G_POST_STAT = "post_stat"
-G_NOTICE_NUM = "notice_num"
-G_NOTICE = "notices"
+G_LAYOUT = "layout_context"
 
-# Max notice number
-MAX_NOTICE_NUM = 99
+# Layout unread notice number
+LAYOUT_NOTICE_NUM = 5
 
 # Home page popular post number
 POPULAR_POST_NUM = 5
 
+# Home page post fields
+HOME_POST_FIELDS = (
+    "id",
+    "title",
+    "author.username",
+    "tag.name",
+    "reply_num",
+    "view_num",
+    "like_num",
+    "save_num",
+    "create_at",
+)
+
+# Search result number per entity type and page
+SEARCH_PER_PAGE = 10
+
+# Search snippet length in characters
+SEARCH_SNIPPET_LENGTH = 160
+
+# Search query term limit
+SEARCH_MAX_TERMS = 8
+
+# Search term weight per document field
+SEARCH_FIELD_WEIGHT = {
+    "title": 4,
+    "author": 2,
+    "content": 1,
+}
+
+# Search index rebuild rows per batch
+SEARCH_REINDEX_BATCH_SIZE = 1000
+
 # Home page community option number
 COMMUNITY_OPTION_NUM = 20
 
@@ -110,7 +141,142 @@ JOB_INTERVAL = {
     "create_user_like": 300,  # 5 minutes
     "create_user_save": 300,  # 5 minutes
     "update_trending": 600,  # 10 minutes
+    "reconcile_counter": 3600,  # 1 hour
+    "purge_post": 300,  # 5 minutes
+}
+
+# Trending periods, name -> (window, half-life of a view's weight) in seconds
+TRENDING_PERIODS = {
+    "1h": (3600, 1800),
+    "24h": (86400, 21600),
+    "7d": (604800, 172800),
+}
+TRENDING_DEFAULT_PERIOD = "24h"
+
+# Trending view bucket size in seconds
+TRENDING_BUCKET_SECONDS = 300
+
+# Trending request number per period
+TRENDING_TOP_NUM = 100
+
+# Popular cache lifetime, refreshed at the trending job cadence
+POPULAR_CACHE_TTL = JOB_INTERVAL["update_trending"]
+
+# Home page stats cache lifetime
+STATS_CACHE_TTL = 60  # 1 minute
+
+# Application cache
+CACHE_MAX_SIZE = 1024
+CACHE_DEFAULT_TTL = 300  # 5 minutes
+
+
+class CacheNamespaceEnum(enum.Enum):
+    """Enum for application cache namespace."""
+
+    STATS = "stats"
+    POPULARS = "populars"
+    LEADERBOARDS = "leaderboards"
+    COMMUNITIES = "communities"
+    COMMUNITY_OPTIONS = "community_options"
+
+
+# Access log
+ACCESS_LOG_QUEUE_SIZE = 10000
+ACCESS_LOG_BODY_SAMPLE_RATE = 0.01
+ACCESS_LOG_BODY_MAX_BYTES = 2048
+# a field is redacted when its name contains one of these, e.g. rpassword or sanswer
+ACCESS_LOG_REDACTED_KEYWORDS = (
+    "password",
+    "answer",
+    "token",
+    "secret",
+    "authorization",
+    "api_key",
+)
+ACCESS_LOG_SKIPPED_SUFFIXES = (".css", ".js", ".ico", ".png", ".jpg", ".svg", ".map")
+
+# Per-request SQL statistics, repeated statements are likely N+1 queries
+QUERY_STATS_REPEAT_THRESHOLD = 5
+QUERY_STATS_REPEAT_LOG_NUM = 3
+QUERY_STATS_FINGERPRINT_MAX_LENGTH = 200
+
+# Metrics, latency histogram buckets in seconds
+METRICS_LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+)
+
+# Scheduler leader election, one process of the deployment runs the jobs
+SCHEDULER_LOCK_ID = 5505  # PostgreSQL advisory lock key
+SCHEDULER_LOCK_FILE = "scheduler.lock"  # in the instance folder, other databases
+SCHEDULER_ELECTION_SECONDS = 15
+JOB_RUN_ERROR_MAX_LENGTH = 2000
+
+# Post view write-behind buffer, flushed every few seconds or once it fills up
+VIEW_BUFFER_FLUSH_SECONDS = 5
+VIEW_BUFFER_FLUSH_SIZE = 500
+VIEW_BUFFER_MAX_SIZE = 50000
+
+# Notice writer, notices are queued by requests and inserted in batches
+NOTICE_WRITER_FLUSH_SECONDS = 2
+NOTICE_WRITER_BATCH_SIZE = 200
+NOTICE_WRITER_QUEUE_SIZE = 10000
+NOTICE_WRITER_ENQUEUE_TIMEOUT = 0.05
+
+# Notification stream, server-sent events of new notices and unread counts
+NOTICE_STREAM_MAX_CONNECTIONS = 200
+NOTICE_STREAM_MAX_USER_CONNECTIONS = 5
+NOTICE_STREAM_QUEUE_SIZE = 100
+NOTICE_STREAM_HEARTBEAT_SECONDS = 15
+NOTICE_STREAM_MAX_SECONDS = 300
+NOTICE_STREAM_RETRY_MILLISECONDS = 5000
+NOTICE_STREAM_POLL_MILLISECONDS = 60000  # a server without threads polls instead
+
+# Cloudflare R2 client, pooled connections and bounded retries with jitter
+R2_API_URL = "https://api.cloudflare.com/client/v4"
+R2_POOL_SIZE = 10
+R2_TIMEOUT = (5, 30)
+R2_MAX_RETRIES = 3
+R2_RETRY_BACKOFF_SECONDS = 0.2
+R2_RETRY_BACKOFF_MAX_SECONDS = 2
+R2_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Image pipeline, variant -> ((width, height), cropped to fill the size)
+IMAGE_VARIANTS = {
+    "thumbnail": ((320, 320), True),
+    "avatar": ((256, 256), True),
+    "full": ((1600, 1600), False),
 }
+IMAGE_WORKERS = 4
+IMAGE_PROCESS_TIMEOUT = 30
+IMAGE_MAX_PIXELS = 40_000_000
+IMAGE_WEBP_QUALITY = 80
+IMAGE_JPEG_QUALITY = 85
+IMAGE_UPLOADED_KEYS_SIZE = 4096
+
+# Synthetic dataset, bulk generated for benchmarks, see flask job generate-dataset
+DATASET_SEED = 5505
+DATASET_WORKERS = 4
+DATASET_CHUNK_SIZE = 10000
+DATASET_SKEW = 3
+DATASET_DAYS = 90
+DATASET_PASSWORD = "Password@123"
+
+# Set-based deletes, larger posts are purged in background batches
+PURGE_BACKGROUND_THRESHOLD = 10000
+PURGE_BATCH_SIZE = 5000
+# a background purge idle for longer, e.g. lost in a restart, is run again
+PURGE_RETRY_SECONDS = 600
 
 # Max limitation
 USER_MAX_NUM = 999
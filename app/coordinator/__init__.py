@@ -0,0 +1,347 @@
+"""Single-leader scheduling of the jobs.
+
+Every process of the deployment that may run the jobs campaigns for a leader
+lock, and only the process holding it starts the scheduler. On PostgreSQL the
+lock is a session advisory lock, elsewhere an exclusive lock on a file of the
+instance folder, so a single host. The lock goes with the process: a leader that
+exits or loses its database session frees it, and a standby takes over at its
+next election round. A leader that finds its lock lost pauses the jobs.
+
+Each run of a job is recorded in the job_run table with its duration, and with
+its error when it raised.
+"""
+
+import abc
+import fcntl
+import os
+import socket
+import threading
+
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_EXECUTED
+from flask import Flask
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.constants import (
+    JOB_RUN_ERROR_MAX_LENGTH,
+    SCHEDULER_ELECTION_SECONDS,
+    SCHEDULER_LOCK_FILE,
+    SCHEDULER_LOCK_ID,
+)
+from app.extensions import db, scheduler
+from app.models.job_run import JobRun, JobRunStatusEnum
+from app.utils import generate_time
+
+
+def runner_name() -> str:
+    """Name of this process in the job runs, host and pid."""
+
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LeaderLock(abc.ABC):
+    """Interface of a lock held by at most one process of the deployment."""
+
+    @abc.abstractmethod
+    def acquire(self) -> bool:
+        """Try to take the lock without waiting, True when it is held."""
+
+    @abc.abstractmethod
+    def held(self) -> bool:
+        """Whether the lock taken is still held."""
+
+    @abc.abstractmethod
+    def release(self) -> None:
+        """Give the lock up, releasing it twice is harmless."""
+
+
+class FileLeaderLock(LeaderLock):
+    """Exclusive lock on a file, the processes of one host."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = None
+
+    def acquire(self) -> bool:
+        if self._file is not None:
+            return True
+
+        # the file stays open for as long as the lock is held
+        # pylint: disable=consider-using-with
+        lock_file = open(self.path, "a+", encoding="utf-8")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+
+        # who leads, for whoever looks at the file
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(runner_name())
+        lock_file.flush()
+
+        self._file = lock_file
+        return True
+
+    def held(self) -> bool:
+        return self._file is not None
+
+    def release(self) -> None:
+        if self._file is None:
+            return
+
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
+
+
+class AdvisoryLeaderLock(LeaderLock):
+    """PostgreSQL session advisory lock, held on a connection of its own."""
+
+    def __init__(self, engine, lock_id: int = SCHEDULER_LOCK_ID) -> None:
+        self.engine = engine
+        self.lock_id = lock_id
+        self._connection = None
+
+    def acquire(self) -> bool:
+        if self._connection is not None:
+            return True
+
+        try:
+            # autocommit, the connection is held for as long as the lead lasts
+            connection = self.engine.connect().execution_options(
+                isolation_level="AUTOCOMMIT"
+            )
+        except SQLAlchemyError:
+            return False
+
+        try:
+            acquired = connection.scalar(
+                text("SELECT pg_try_advisory_lock(:lock_id)"), {"lock_id": self.lock_id}
+            )
+        except SQLAlchemyError:
+            acquired = False
+
+        if not acquired:
+            connection.close()
+            return False
+
+        self._connection = connection
+        return True
+
+    def held(self) -> bool:
+        if self._connection is None:
+            return False
+
+        try:
+            self._connection.scalar(text("SELECT 1"))
+        except SQLAlchemyError:
+            # the session is gone and the lock with it
+            self._discard()
+            return False
+
+        return True
+
+    def release(self) -> None:
+        if self._connection is None:
+            return
+
+        try:
+            self._connection.execute(
+                text("SELECT pg_advisory_unlock(:lock_id)"), {"lock_id": self.lock_id}
+            )
+        except SQLAlchemyError:
+            pass
+        self._discard()
+
+    def _discard(self) -> None:
+        # never pooled again, a closed session cannot keep the lock by mistake
+        self._connection.invalidate()
+        self._connection.close()
+        self._connection = None
+
+
+def leader_lock(app: Flask) -> LeaderLock:
+    """The leader lock of the app's database."""
+
+    with app.app_context():
+        engine = db.engine
+
+    if engine.dialect.name == "postgresql":
+        return AdvisoryLeaderLock(
+            engine, app.config.get("SCHEDULER_LOCK_ID", SCHEDULER_LOCK_ID)
+        )
+
+    os.makedirs(app.instance_path, exist_ok=True)
+    return FileLeaderLock(
+        os.path.join(
+            app.instance_path,
+            app.config.get("SCHEDULER_LOCK_FILE", SCHEDULER_LOCK_FILE),
+        )
+    )
+
+
+# pylint: disable=too-many-instance-attributes
+class SchedulerCoordinator:
+    """Run the scheduler of this process only while it holds the leader lock."""
+
+    def __init__(
+        self,
+        app: Flask,
+        job_scheduler,
+        lock: LeaderLock,
+        interval: float = SCHEDULER_ELECTION_SECONDS,
+    ) -> None:
+        self.app = app
+        self.scheduler = job_scheduler
+        self.lock = lock
+        self.interval = interval
+        self.leader = False
+        self._started = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def elect(self) -> bool:
+        """Run one election round, returns whether this process leads."""
+
+        if self.leader and not self.lock.held():
+            self.leader = False
+            if self._started:
+                self.scheduler.pause()
+            self.app.logger.warning("Scheduler leader lock lost, jobs paused.")
+
+        if not self.leader and self.lock.acquire():
+            self.leader = True
+            if self._started:
+                self.scheduler.resume()
+            else:
+                self.scheduler.start()
+                # the Flask debug reloader parent never starts it
+                self._started = self.scheduler.running
+            self.app.logger.info("Scheduler leader elected: %s.", runner_name())
+
+        return self.leader
+
+    def start(self) -> None:
+        """Campaign in a background thread, once."""
+
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._campaign, name="scheduler-coordinator", daemon=True
+        )
+        self._thread.start()
+
+    def wait(self) -> None:
+        """Block until the campaign is stopped."""
+
+        if self._thread is not None:
+            self._thread.join()
+
+    def stop(self) -> None:
+        """Stop campaigning, wait for the running jobs and give the lead up."""
+
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+        if self._started:
+            self.scheduler.shutdown()
+            self._started = False
+        self.leader = False
+        self.lock.release()
+
+    def _campaign(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.elect()
+            except Exception as e:  # pylint: disable=broad-except
+                # a failed round is retried at the next, the campaign goes on
+                self.app.logger.error(f"Error electing the scheduler leader: {e}")
+            self._stop.wait(self.interval)
+
+
+def write_job_run(
+    job_id: str, start_at, end_at, exception: BaseException = None
+) -> None:
+    """Record a run of a job."""
+
+    error = None
+    if exception is not None:
+        error = f"{type(exception).__name__}: {exception}"[:JOB_RUN_ERROR_MAX_LENGTH]
+
+    db.session.add(
+        JobRun(
+            job_id=job_id,
+            runner=runner_name(),
+            status=(
+                JobRunStatusEnum.SUCCESS.value
+                if exception is None
+                else JobRunStatusEnum.FAILURE.value
+            ),
+            start_at=start_at,
+            end_at=end_at,
+            duration_ms=round(max((end_at - start_at).total_seconds(), 0) * 1000, 3),
+            error=error,
+        )
+    )
+    db.session.commit()
+
+
+def record_job_runs(job_scheduler) -> None:
+    """Record every run of the jobs of a scheduler, in its app."""
+
+    # every app created in the process shares the scheduler, listen once
+    if getattr(job_scheduler, "job_runs_recorded", False):
+        return
+    job_scheduler.job_runs_recorded = True
+
+    # the executor may run a job before its submission event is sent, so a run
+    # starts at its scheduled time, the wait for a busy executor included
+    def finished(event) -> None:
+        app = job_scheduler.app
+        with app.app_context():
+            try:
+                write_job_run(
+                    event.job_id,
+                    event.scheduled_run_time,
+                    generate_time(),
+                    event.exception,
+                )
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                app.logger.error(f"Error recording the run of [{event.job_id}]: {e}")
+
+    job_scheduler.add_listener(finished, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
+
+
+def scheduler_coordinator(app: Flask) -> SchedulerCoordinator:
+    """The coordinator of the app's scheduler, created once per app."""
+
+    coordinator = app.extensions.get("scheduler_coordinator")
+    if coordinator is None:
+        coordinator = SchedulerCoordinator(
+            app,
+            scheduler,
+            leader_lock(app),
+            app.config.get("SCHEDULER_ELECTION_SECONDS", SCHEDULER_ELECTION_SECONDS),
+        )
+        app.extensions["scheduler_coordinator"] = coordinator
+    return coordinator
+
+
+def init_coordinator(app: Flask) -> None:
+    """Record the job runs, and campaign in this process when embedded.
+
+    The jobs run in the processes of `flask job run-scheduler`, or with
+    SCHEDULER_EMBEDDED in the web workers too, where one of them leads.
+    """
+
+    record_job_runs(scheduler)
+
+    if app.config.get("SCHEDULER_EMBEDDED"):
+        scheduler_coordinator(app).start()
@@ -0,0 +1,297 @@
+"""Denormalized counters, kept in step with inserts and deletes of counted rows."""
+
+from sqlalchemy import bindparam, event, exists, func, insert, select, update
+from sqlalchemy.engine import Connection
+
+from app.database import use_primary
+from app.extensions import db
+from app.models.community import Community
+from app.models.global_stat import GLOBAL_STAT_ID, GlobalStat
+from app.models.reply import Reply
+from app.models.request import Request
+from app.models.user import User
+from app.models.user_like import UserLike
+from app.models.user_record import UserRecord
+from app.models.user_save import UserSave
+from app.models.user_stat import UserStat
+from app.utils import dialect_insert
+
+# counted model -> (counter column, owner user id attribute or None if global only)
+COUNTED_MODELS = {
+    User: ("user_num", None),
+    Community: ("community_num", None),
+    Request: ("request_num", "author_id"),
+    Reply: ("reply_num", "replier_id"),
+    UserRecord: ("view_num", "user_id"),
+    UserLike: ("like_num", "user_id"),
+    UserSave: ("save_num", "user_id"),
+}
+
+USER_COUNTER_FIELDS = ["request_num", "reply_num", "view_num", "like_num", "save_num"]
+
+
+def adjust_counter(
+    connection: Connection, field: str, delta: int, user_id: str = None
+) -> None:
+    """Adjust a global counter, and the user counter if given, in the current transaction."""
+
+    if not delta:
+        return
+
+    _upsert_counter(
+        connection, GlobalStat.__table__, {"id": GLOBAL_STAT_ID}, field, delta
+    )
+
+    if user_id is None or field not in USER_COUNTER_FIELDS:
+        return
+
+    _upsert_counter(connection, UserStat.__table__, {"user_id": user_id}, field, delta)
+
+
+def _upsert_counter(
+    connection: Connection, table, key: dict, field: str, delta: int
+) -> None:
+    """Adjust the counter of the row of a key, creating the row in the same statement.
+
+    One statement, so concurrent first adjustments of a row cannot both insert.
+    """
+
+    statement = dialect_insert(connection, table).values({**key, field: max(delta, 0)})
+    connection.execute(
+        statement.on_conflict_do_update(
+            index_elements=[table.c[column] for column in key],
+            set_={field: table.c[field] + delta},
+        )
+    )
+
+
+def adjust_user_counters(connection: Connection, field: str, deltas: dict) -> None:
+    """Adjust a counter of many users, user id -> delta, and the global counter.
+
+    Rows written in bulk skip the mapper events, this counts them instead with
+    one statement for the global counter and one upsert batch for the user
+    counters.
+    """
+
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    adjust_counter(connection, field, sum(deltas.values()))
+
+    # one upsert batch, so a concurrent first count of a user cannot insert twice,
+    # in user order, so concurrent batches lock the rows in the same order
+    user_table = UserStat.__table__
+    statement = dialect_insert(connection, user_table).values(
+        {"user_id": bindparam("b_user_id"), field: bindparam("b_initial")}
+    )
+    connection.execute(
+        statement.on_conflict_do_update(
+            index_elements=[user_table.c.user_id],
+            set_={field: user_table.c[field] + bindparam("b_delta")},
+        ),
+        [
+            {
+                "b_user_id": user_id,
+                "b_initial": max(deltas[user_id], 0),
+                "b_delta": deltas[user_id],
+            }
+            for user_id in sorted(deltas)
+        ],
+    )
+
+
+def discount_rows(connection: Connection, model: db.Model, condition) -> int:
+    """Decrease the counters of the rows a bulk delete is about to remove.
+
+    Bulk deletes skip the mapper events, so this takes their place, with one
+    statement for the global counter and one for every affected user counter.
+    Returns the number of rows matching the condition.
+    """
+
+    field, user_attr = COUNTED_MODELS[model]
+    table = model.__table__
+    total = connection.scalar(select(func.count()).select_from(table).where(condition))
+    if not total:
+        return 0
+
+    adjust_counter(connection, field, -total)
+    if user_attr is None or field not in USER_COUNTER_FIELDS:
+        return total
+
+    user_table = UserStat.__table__
+    owner = table.c[user_attr]
+    user_rows = (
+        select(func.count())
+        .select_from(table)
+        .where(condition, owner == user_table.c.user_id)
+        .scalar_subquery()
+    )
+    connection.execute(
+        update(user_table)
+        .where(user_table.c.user_id.in_(select(owner).where(condition)))
+        .values({field: user_table.c[field] - user_rows})
+    )
+
+    return total
+
+
+def _after_insert_listener(mapper, connection, target) -> None:
+    """Increase the counters of an inserted row."""
+
+    field, user_attr = COUNTED_MODELS[mapper.class_]
+    user_id = getattr(target, user_attr) if user_attr else None
+    adjust_counter(connection, field, 1, user_id)
+
+
+def _after_delete_listener(mapper, connection, target) -> None:
+    """Decrease the counters of a deleted row."""
+
+    field, user_attr = COUNTED_MODELS[mapper.class_]
+    user_id = getattr(target, user_attr) if user_attr else None
+    adjust_counter(connection, field, -1, user_id)
+
+
+def _after_user_insert_listener(_, connection, target) -> None:
+    """Create the counter row of a new user up front."""
+
+    connection.execute(insert(UserStat.__table__).values(user_id=target.id))
+
+
+def _before_user_delete_listener(_, connection, target) -> None:
+    """Remove the counter row of a user before the user row goes."""
+
+    user_table = UserStat.__table__
+    connection.execute(user_table.delete().where(user_table.c.user_id == target.id))
+
+
+for counted_model in COUNTED_MODELS:
+    event.listen(counted_model, "after_insert", _after_insert_listener)
+    event.listen(counted_model, "after_delete", _after_delete_listener)
+
+event.listen(User, "after_insert", _after_user_insert_listener)
+event.listen(User, "before_delete", _before_user_delete_listener)
+
+
+def get_global_stats() -> GlobalStat:
+    """Get the global counters, rebuilding them if they were never computed."""
+
+    global_stat = db.session.get(GlobalStat, GLOBAL_STAT_ID)
+    if global_stat is None:
+        # counted on the primary, a replica may not have the latest rows
+        with use_primary():
+            reconcile_counters()
+            global_stat = db.session.get(GlobalStat, GLOBAL_STAT_ID)
+
+    return global_stat
+
+
+def get_user_stats(user_id: str) -> dict:
+    """Get the counters of a user, all zero if the user has no counted rows yet."""
+
+    user_stat = db.session.get(UserStat, user_id)
+    if user_stat is None:
+        return {field: 0 for field in USER_COUNTER_FIELDS}
+
+    return {field: getattr(user_stat, field) for field in USER_COUNTER_FIELDS}
+
+
+def _lock_counter_rows() -> tuple:
+    """Lock the global and every user counter row, creating the missing ones.
+
+    They are locked in the order the counter adjustments take them, the global
+    row first. Returns the global stat and the user stats by user id.
+    """
+
+    connection = db.session.connection()
+    global_table = GlobalStat.__table__
+    user_table = UserStat.__table__
+    user_ids = User.__table__.c.id
+
+    # the missing counter rows exist before they are locked
+    connection.execute(
+        dialect_insert(connection, global_table)
+        .values(id=GLOBAL_STAT_ID)
+        .on_conflict_do_nothing()
+    )
+    connection.execute(
+        dialect_insert(connection, user_table)
+        .from_select(
+            ["user_id"],
+            select(user_ids).where(~exists().where(user_table.c.user_id == user_ids)),
+        )
+        .on_conflict_do_nothing()
+    )
+
+    global_stat = db.session.scalars(
+        select(GlobalStat)
+        .where(GlobalStat.id == GLOBAL_STAT_ID)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    ).one()
+    user_stats = {
+        user_stat.user_id: user_stat
+        for user_stat in db.session.scalars(
+            select(UserStat)
+            .order_by(UserStat.user_id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+    }
+
+    return global_stat, user_stats
+
+
+def reconcile_counters() -> int:
+    """Recount every counter from the source tables and repair any drift.
+
+    The counter rows are locked before the rows are counted, so an increment of
+    a concurrent transaction either is counted or waits for the repair and
+    lands on it, never overwritten by it. Returns the number of counter rows
+    that were changed.
+    """
+
+    # pylint: disable=not-callable
+    global_stat, user_stats = _lock_counter_rows()
+
+    # global counters
+    global_counts = {
+        field: db.session.query(func.count()).select_from(model).scalar()
+        for model, (field, _) in COUNTED_MODELS.items()
+    }
+    repaired = _apply_counts(global_stat, global_counts)
+
+    # user counters, one grouped count per counted table
+    user_counts = {user_id: {} for user_id in user_stats}
+    for model, (field, user_attr) in COUNTED_MODELS.items():
+        if user_attr is None:
+            continue
+
+        user_column = getattr(model, user_attr)
+        rows = db.session.execute(
+            select(user_column, func.count()).group_by(user_column)
+        ).all()
+        for user_id, count in rows:
+            if user_id in user_counts:
+                user_counts[user_id][field] = count
+
+    for user_id, counts in user_counts.items():
+        repaired += _apply_counts(
+            user_stats[user_id],
+            {field: counts.get(field, 0) for field in USER_COUNTER_FIELDS},
+        )
+
+    db.session.commit()
+    return repaired
+
+
+def _apply_counts(stat: db.Model, counts: dict) -> int:
+    """Set the counts on a counter row, returns 1 if anything changed."""
+
+    changed = 0
+    for field, count in counts.items():
+        if getattr(stat, field) != count:
+            setattr(stat, field, count)
+            changed = 1
+
+    return changed
@@ -0,0 +1,160 @@
+"""Database engines, pool options from the config and read replica routing.
+
+The pool of the primary is sized from the DB_* config, and each URL of
+DB_REPLICA_URLS becomes a replica bind with the same options. Services marked
+read-only send their selects to a replica, one picked per session, while every
+other statement and service stays on the primary. A session that has written
+reads from the primary from then on, so a request sees its own writes even when
+a replica lags behind.
+"""
+
+import contextvars
+import functools
+import random
+from contextlib import contextmanager
+
+from flask import Flask
+from flask_sqlalchemy.session import Session
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+# config key -> engine option, the pool options of every pool class
+_POOL_OPTIONS = {
+    "DB_POOL_PRE_PING": "pool_pre_ping",
+    "DB_POOL_RECYCLE": "pool_recycle",
+}
+
+# config key -> engine option, the queue pool sizing
+_QUEUE_POOL_OPTIONS = {
+    "DB_POOL_SIZE": "pool_size",
+    "DB_MAX_OVERFLOW": "max_overflow",
+    "DB_POOL_TIMEOUT": "pool_timeout",
+}
+
+REPLICA_BIND_PREFIX = "replica_"
+
+# session info key, set once the session has written
+_WROTE = "wrote"
+
+# session info key, the replica bind of the session
+_REPLICA = "replica"
+
+# whether the current call runs in a read-only service
+_read_only = contextvars.ContextVar("read_only", default=False)
+
+
+def engine_options(app: Flask, uri: str) -> dict:
+    """The engine options configured for a database URI."""
+
+    url = make_url(uri)
+    options = {
+        option: app.config[key]
+        for key, option in _POOL_OPTIONS.items()
+        if app.config.get(key) is not None
+    }
+
+    # in-memory SQLite keeps its single connection pool, that is not sized
+    if url.get_dialect().get_pool_class(url) is QueuePool:
+        options.update(
+            {
+                option: app.config[key]
+                for key, option in _QUEUE_POOL_OPTIONS.items()
+                if app.config.get(key) is not None
+            }
+        )
+
+    statement_timeout = app.config.get("DB_STATEMENT_TIMEOUT_MS")
+    if statement_timeout and url.get_backend_name() == "postgresql":
+        options["connect_args"] = {
+            "options": f"-c statement_timeout={int(statement_timeout)}"
+        }
+
+    return options
+
+
+def init_database(app: Flask) -> None:
+    """Set the engine options and the replica binds, before the engines exist.
+
+    The replicas get the options of the primary, the metered pool included, so
+    this has to run after the metrics are initialized.
+    """
+
+    uri = app.config.get("SQLALCHEMY_DATABASE_URI")
+    if not uri:
+        return
+
+    options = app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", {})
+    for option, value in engine_options(app, uri).items():
+        options.setdefault(option, value)
+
+    binds = app.config.setdefault("SQLALCHEMY_BINDS", {})
+    for index, replica_url in enumerate(app.config.get("DB_REPLICA_URLS") or []):
+        binds.setdefault(
+            f"{REPLICA_BIND_PREFIX}{index}", {**options, "url": replica_url}
+        )
+
+
+# pylint: disable=too-few-public-methods
+class RoutingSession(Session):
+    """Session sending the selects of read-only services to a replica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if getattr(clause, "is_select", False):
+                if _read_only.get() and not self.info.get(_WROTE):
+                    replica = self._replica_engine()
+                    if replica is not None:
+                        return replica
+            elif self._flushing or clause is not None or not _read_only.get():
+                # a write, or a statement or connection that may write
+                self.info[_WROTE] = True
+
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica_engine(self):
+        """The replica of the session, None without replicas."""
+
+        engines = self._db.engines
+        key = self.info.get(_REPLICA)
+        if key is None:
+            replicas = [
+                bind_key
+                for bind_key in engines
+                if bind_key and bind_key.startswith(REPLICA_BIND_PREFIX)
+            ]
+            if not replicas:
+                return None
+
+            # one replica per session, its reads never go back in time
+            key = self.info[_REPLICA] = random.choice(replicas)
+
+        return engines[key]
+
+
+def read_only(func):
+    """Decorate a service that only reads, to read from a replica.
+
+    The reads may lag the primary by the replication delay, unless the session
+    already wrote.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _read_only.set(True)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _read_only.reset(token)
+
+    return wrapper
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary in the block, e.g. before writing what was read."""
+
+    token = _read_only.set(False)
+    try:
+        yield
+    finally:
+        _read_only.reset(token)
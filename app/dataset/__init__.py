@@ -0,0 +1,536 @@
+"""Synthetic dataset generator, for benchmarks at production scale.
+
+The generator fills an empty database with users, communities, posts, replies,
+views, likes and saves at a chosen scale. Activity is skewed like real traffic:
+a few users write, view and like most of the content and a few posts get most
+of the views, likes and replies. Rows are built in chunks, each with its own
+random generator seeded from the dataset seed, the table and the chunk, so the
+same seed, scale, chunk size and end date always give the same dataset, however
+many workers build it, only the salt of the shared password hash differs.
+Chunks are written with COPY on PostgreSQL and multi-row inserts elsewhere, in
+parallel worker processes when the database allows concurrent writers.
+
+Bulk writes skip the mapper events, the post counters, the user and global
+counters and the id sequences are set once every table is written. The search
+index and the trending buckets are rebuilt by their own commands and jobs.
+"""
+
+import csv
+import enum
+import io
+import multiprocessing
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from faker.providers.lorem.en_US import Provider as LoremProvider
+from sqlalchemy import create_engine, func, insert, select, text, update
+from sqlalchemy.engine import Connection, Engine
+
+from app.constants import (
+    DATASET_CHUNK_SIZE,
+    DATASET_DAYS,
+    DATASET_PASSWORD,
+    DATASET_SEED,
+    DATASET_SKEW,
+    DATASET_WORKERS,
+)
+from app.counter import reconcile_counters
+from app.extensions import bcrypt, db
+from app.models.category import Category
+from app.models.community import Community
+from app.models.community_member import CommunityMember
+from app.models.reply import Reply, ReplySourceEnum
+from app.models.request import Request
+from app.models.tag import Tag
+from app.models.user import User, UserStatusEnum
+from app.models.user_like import UserLike
+from app.models.user_record import UserRecord
+from app.models.user_save import UserSave
+from app.utils import generate_time
+
+WORDS = LoremProvider.word_list
+
+# odd prime, spreads the popular posts over the whole timeline
+_SHUFFLE = 2654435761
+
+# tables with ids set by the generator, their sequences are moved past them
+_SEQUENCE_MODELS = (Category, Tag, Community, Request, Reply)
+
+# engine of a worker process
+_engine = None  # pylint: disable=invalid-name
+
+
+# pylint: disable=too-many-instance-attributes
+@dataclass
+class DatasetScale:
+    """Number of rows of each kind, memberships, likes and saves are totals."""
+
+    users: int = 1000
+    communities: int = 50
+    requests: int = 10000
+    replies: int = 30000
+    views: int = 100000
+    likes: int = 20000
+    saves: int = 5000
+    memberships: int = 3000
+    categories: int = 10
+    tags: int = 50
+
+
+@dataclass
+class DatasetPlan:
+    """Everything a worker needs to build any chunk of the dataset."""
+
+    scale: DatasetScale
+    seed: int = DATASET_SEED
+    skew: float = DATASET_SKEW
+    days: int = DATASET_DAYS
+    end: datetime = None
+    password_hash: str = ""
+    chunk_size: int = DATASET_CHUNK_SIZE
+    workers: int = DATASET_WORKERS
+    start: datetime = field(init=False)
+
+    def __post_init__(self) -> None:
+        if self.end is None:
+            self.end = generate_time().replace(
+                hour=0, minute=0, second=0, microsecond=0
+            )
+        self.start = self.end - timedelta(days=self.days)
+
+    def moment(self, index: int, total: int) -> datetime:
+        """Creation time of the row at an index, rows are spread over the days."""
+
+        return self.start + (self.end - self.start) * (index / max(total, 1))
+
+    def after(self, rng: random.Random, moment: datetime) -> datetime:
+        """A random time between a moment and the end of the dataset."""
+
+        return moment + (self.end - moment) * rng.random()
+
+    def skewed(self, rng: random.Random, total: int) -> int:
+        """A skewed index in [0, total), low indexes are picked the most.
+
+        The indexes follow a power law, with the default skew of 3 the top 1%
+        get about a fifth of the picks and the top 10% almost half of them.
+        """
+
+        return int(total * rng.random() ** self.skew)
+
+    def popular(self, rng: random.Random, total: int) -> int:
+        """A skewed index in [0, total), the popular ones spread over the range."""
+
+        return self.skewed(rng, total) * _SHUFFLE % total
+
+    def share(self, start: int, stop: int, total: int, rows: int) -> int:
+        """Rows of the users [start, stop) when users are picked by skewed()."""
+
+        exponent = 1 / self.skew
+        return round(rows * ((stop / total) ** exponent - (start / total) ** exponent))
+
+    def skewed_between(
+        self, rng: random.Random, start: int, stop: int, total: int
+    ) -> int:
+        """An index of [start, stop), picked as skewed() would pick it."""
+
+        exponent = 1 / self.skew
+        low, high = (start / total) ** exponent, (stop / total) ** exponent
+        return min(int(total * rng.uniform(low, high) ** self.skew), stop - 1)
+
+
+def user_id(seed: int, index: int) -> str:
+    """Id of the generated user at an index, a UUID made of the seed and index."""
+
+    return f"{seed % 16**8:08x}-0000-4000-8000-{index:012x}"
+
+
+def _words(rng: random.Random, low: int, high: int, limit: int) -> str:
+    return " ".join(rng.choices(WORDS, k=rng.randint(low, high)))[:limit]
+
+
+def _category_rows(plan: DatasetPlan, _rng: random.Random, start: int, stop: int):
+    return [
+        {
+            "id": index + 1,
+            "name": f"Category {index + 1}",
+            "create_at": plan.start,
+        }
+        for index in range(start, stop)
+    ]
+
+
+def _tag_rows(plan: DatasetPlan, _rng: random.Random, start: int, stop: int):
+    return [
+        {"id": index + 1, "name": f"tag{index + 1}", "create_at": plan.start}
+        for index in range(start, stop)
+    ]
+
+
+def _user_rows(plan: DatasetPlan, _rng: random.Random, start: int, stop: int):
+    rows = []
+    for index in range(start, stop):
+        create_at = plan.moment(index, plan.scale.users)
+        rows.append(
+            {
+                "id": user_id(plan.seed, index),
+                "username": f"user{index}",
+                "email": f"user{index}@example.com",
+                "password_hash": plan.password_hash,
+                "avatar_url": None,
+                "use_google": False,
+                "use_github": False,
+                "status": UserStatusEnum.ACTIVE.value,
+                "create_at": create_at,
+                "update_at": create_at,
+            }
+        )
+    return rows
+
+
+def _community_rows(plan: DatasetPlan, rng: random.Random, start: int, stop: int):
+    scale = plan.scale
+    rows = []
+    for index in range(start, stop):
+        create_at = plan.moment(index, scale.communities)
+        rows.append(
+            {
+                "id": index + 1,
+                "name": f"Community {index + 1}",
+                "category_id": rng.randint(1, scale.categories),
+                "description": _words(rng, 5, 20, 500),
+                "avatar_url": None,
+                "creator_id": user_id(plan.seed, plan.skewed(rng, scale.users)),
+                "create_at": create_at,
+                "update_at": create_at,
+            }
+        )
+    return rows
+
+
+def _member_rows(plan: DatasetPlan, rng: random.Random, start: int, stop: int):
+    scale = plan.scale
+    members = set()
+    wanted = min(
+        plan.share(start, stop, scale.users, scale.memberships),
+        (stop - start) * scale.communities,
+    )
+    for _ in range(wanted * 10):
+        if len(members) >= wanted:
+            break
+        members.add(
+            (
+                plan.skewed_between(rng, start, stop, scale.users),
+                plan.popular(rng, scale.communities) + 1,
+            )
+        )
+
+    return [
+        {
+            "user_id": user_id(plan.seed, index),
+            "community_id": community_id,
+            "create_at": plan.after(rng, plan.moment(index, scale.users)),
+        }
+        for index, community_id in sorted(members)
+    ]
+
+
+def _request_rows(plan: DatasetPlan, rng: random.Random, start: int, stop: int):
+    scale = plan.scale
+    rows = []
+    for index in range(start, stop):
+        create_at = plan.moment(index, scale.requests)
+        rows.append(
+            {
+                "id": index + 1,
+                "author_id": user_id(plan.seed, plan.skewed(rng, scale.users)),
+                "title": _words(rng, 2, 6, 40).capitalize(),
+                "content": _words(rng, 10, 120, 1000),
+                "community_id": plan.popular(rng, scale.communities) + 1,
+                "tag_id": rng.randint(1, scale.tags),
+                "view_num": 0,
+                "like_num": 0,
+                "reply_num": 0,
+                "save_num": 0,
+                "create_at": create_at,
+                "update_at": create_at,
+            }
+        )
+    return rows
+
+
+def _reply_rows(plan: DatasetPlan, rng: random.Random, start: int, stop: int):
+    scale = plan.scale
+    rows = []
+    for index in range(start, stop):
+        request_index = plan.popular(rng, scale.requests)
+        create_at = plan.after(rng, plan.moment(request_index, scale.requests))
+        rows.append(
+            {
+                "id": index + 1,
+                "request_id": request_index + 1,
+                "replier_id": user_id(plan.seed, plan.skewed(rng, scale.users)),
+                "reply_id": None,
+                "content": _words(rng, 5, 80, 1000),
+                "source": ReplySourceEnum.HUMAN,
+                "like_num": 0,
+                "save_num": 0,
+                "create_at": create_at,
+                "update_at": create_at,
+            }
+        )
+    return rows
+
+
+def _view_rows(plan: DatasetPlan, rng: random.Random, start: int, stop: int):
+    scale = plan.scale
+    rows = []
+    for _ in range(start, stop):
+        request_index = plan.popular(rng, scale.requests)
+        rows.append(
+            {
+                "user_id": user_id(plan.seed, plan.skewed(rng, scale.users)),
+                "request_id": request_index + 1,
+                "create_at": plan.after(
+                    rng, plan.moment(request_index, scale.requests)
+                ),
+            }
+        )
+    return rows
+
+
+def _engagement_rows(
+    plan: DatasetPlan, rng: random.Random, start: int, stop: int, total: int
+):
+    """Likes or saves of the users [start, stop), one per user and post."""
+
+    scale = plan.scale
+    pairs = set()
+    wanted = min(
+        plan.share(start, stop, scale.users, total), (stop - start) * scale.requests
+    )
+    for _ in range(wanted * 10):
+        if len(pairs) >= wanted:
+            break
+        pairs.add(
+            (
+                plan.skewed_between(rng, start, stop, scale.users),
+                plan.popular(rng, scale.requests),
+            )
+        )
+
+    return [
+        {
+            "user_id": user_id(plan.seed, index),
+            "request_id": request_index + 1,
+            "reply_id": None,
+            "create_at": plan.after(
+                rng,
+                max(
+                    plan.moment(index, scale.users),
+                    plan.moment(request_index, scale.requests),
+                ),
+            ),
+        }
+        for index, request_index in sorted(pairs)
+    ]
+
+
+def _like_rows(plan: DatasetPlan, rng: random.Random, start: int, stop: int):
+    return _engagement_rows(plan, rng, start, stop, plan.scale.likes)
+
+
+def _save_rows(plan: DatasetPlan, rng: random.Random, start: int, stop: int):
+    return _engagement_rows(plan, rng, start, stop, plan.scale.saves)
+
+
+# table -> (model, row builder, rows the chunks are cut from), in write order
+TABLES = {
+    "category": (Category, _category_rows, lambda scale: scale.categories),
+    "tag": (Tag, _tag_rows, lambda scale: scale.tags),
+    "user": (User, _user_rows, lambda scale: scale.users),
+    "community": (Community, _community_rows, lambda scale: scale.communities),
+    "community_member": (CommunityMember, _member_rows, lambda scale: scale.users),
+    "request": (Request, _request_rows, lambda scale: scale.requests),
+    "reply": (Reply, _reply_rows, lambda scale: scale.replies),
+    "user_record": (UserRecord, _view_rows, lambda scale: scale.views),
+    "user_like": (UserLike, _like_rows, lambda scale: scale.users),
+    "user_save": (UserSave, _save_rows, lambda scale: scale.users),
+}
+
+
+def build_chunk(plan: DatasetPlan, table: str, start: int, stop: int) -> list:
+    """Build the rows of a chunk, the same chunk of a plan always gets the same rows."""
+
+    _, build, _ = TABLES[table]
+    rng = random.Random(f"{plan.seed}:{table}:{start}")
+    return build(plan, rng, start, stop)
+
+
+def _copy_value(value):
+    """A value in the CSV format of COPY, an unquoted empty field is NULL."""
+
+    if value is None:
+        return ""
+    if isinstance(value, enum.Enum):
+        return value.name
+    return value
+
+
+def _copy_rows(connection: Connection, model: db.Model, rows: list) -> None:
+    """Write rows with COPY FROM STDIN."""
+
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_copy_value(row[column]) for column in columns])
+    buffer.seek(0)
+
+    preparer = connection.dialect.identifier_preparer
+    statement = (
+        f"COPY {preparer.format_table(model.__table__)} "
+        f"({', '.join(preparer.quote(column) for column in columns)}) "
+        "FROM STDIN WITH (FORMAT csv)"
+    )
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(statement, buffer)
+    finally:
+        cursor.close()
+
+
+def write_rows(connection: Connection, model: db.Model, rows: list) -> int:
+    """Write rows in bulk, COPY on PostgreSQL with psycopg2, one insert elsewhere."""
+
+    if not rows:
+        return 0
+
+    dialect = connection.dialect
+    if dialect.name == "postgresql" and dialect.driver == "psycopg2":
+        _copy_rows(connection, model, rows)
+    else:
+        connection.execute(insert(model.__table__), rows)
+
+    return len(rows)
+
+
+def write_chunk(engine: Engine, plan: DatasetPlan, table: str, start: int, stop: int):
+    """Build and write a chunk in its own transaction."""
+
+    model, _, _ = TABLES[table]
+    rows = build_chunk(plan, table, start, stop)
+    with engine.begin() as connection:
+        return write_rows(connection, model, rows)
+
+
+def _init_worker(url: str) -> None:
+    global _engine  # pylint: disable=global-statement
+    _engine = create_engine(url)
+
+
+def _write_worker_chunk(plan: DatasetPlan, table: str, start: int, stop: int):
+    return write_chunk(_engine, plan, table, start, stop)
+
+
+def _finish(connection: Connection) -> None:
+    """Set the post counters and move the id sequences past the generated ids."""
+
+    # pylint: disable=not-callable
+    request_table = Request.__table__
+    counts = {
+        "view_num": (UserRecord, None),
+        "reply_num": (Reply, None),
+        "like_num": (UserLike, UserLike.reply_id.is_(None)),
+        "save_num": (UserSave, UserSave.reply_id.is_(None)),
+    }
+    for counter, (model, condition) in counts.items():
+        rows = select(model.request_id, func.count().label("num"))
+        if condition is not None:
+            rows = rows.where(condition)
+        rows = rows.group_by(model.request_id).subquery()
+        connection.execute(
+            update(request_table).where(request_table.c.id == rows.c.request_id)
+            # keeps update_at, its onupdate default would apply otherwise
+            .values({counter: rows.c.num, "update_at": request_table.c.update_at})
+        )
+
+    if connection.dialect.name != "postgresql":
+        return
+
+    preparer = connection.dialect.identifier_preparer
+    for model in _SEQUENCE_MODELS:
+        table = model.__table__
+        connection.execute(
+            text(
+                "SELECT setval(pg_get_serial_sequence(:table, 'id'), "
+                f"(SELECT coalesce(max(id), 1) FROM {preparer.format_table(table)}))"
+            ),
+            {"table": preparer.format_table(table)},
+        )
+
+
+def generate_dataset(plan: DatasetPlan) -> dict:
+    """Fill an empty database with the dataset of a plan.
+
+    Returns the number of rows written to each table.
+    """
+
+    for table, (model, _, _) in TABLES.items():
+        if db.session.scalar(select(model.__table__).limit(1)) is not None:
+            raise ValueError(
+                f"Table {table} is not empty, generate into an empty database."
+            )
+
+    if not plan.password_hash:
+        plan.password_hash = bcrypt.generate_password_hash(DATASET_PASSWORD).decode(
+            "utf-8"
+        )
+
+    # sqlite has a single writer, its chunks are written one by one
+    engine = db.engine
+    workers = plan.workers if engine.dialect.name != "sqlite" else 1
+    db.session.close()
+
+    written = {}
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(engine.url.render_as_string(hide_password=False),),
+        )
+
+    try:
+        for table, (_, _, rows_of) in TABLES.items():
+            total = rows_of(plan.scale)
+            chunks = [
+                (start, min(start + plan.chunk_size, total))
+                for start in range(0, total, plan.chunk_size)
+            ]
+
+            # the chunks of a table are written before the tables referring to it
+            if executor is None:
+                written[table] = sum(
+                    write_chunk(engine, plan, table, start, stop)
+                    for start, stop in chunks
+                )
+            else:
+                futures = [
+                    executor.submit(_write_worker_chunk, plan, table, start, stop)
+                    for start, stop in chunks
+                ]
+                written[table] = sum(future.result() for future in futures)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    _finish(db.session.connection())
+    db.session.commit()
+
+    # the user and global counters, from the written rows
+    reconcile_counters()
+
+    return written
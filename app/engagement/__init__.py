@@ -0,0 +1,134 @@
+"""Likes and saves of posts and replies, toggled with set-based statements.
+
+A like or a save is one row per user and liked post or reply, enforced by
+unique indexes, so a toggle does not read before it writes: the insert skips a
+row that already exists and the delete removes the row if there is one. Only
+a row actually written moves the like or save number of its post or reply and
+the user counters, with SQL-side increments in the same transaction, so
+concurrent clicks can neither double count nor lose a count.
+"""
+
+import enum
+
+from sqlalchemy import and_, delete, exists, func, literal, select, update
+
+from app.counter import COUNTED_MODELS, adjust_counter
+from app.extensions import db
+from app.models.reply import Reply
+from app.models.request import Request
+from app.utils import dialect_insert, generate_time
+
+
+class EngagementResultEnum(enum.Enum):
+    """Outcome of a like or save toggle."""
+
+    DONE = "DONE"
+    UNCHANGED = "UNCHANGED"
+    REQUEST_NOT_FOUND = "REQUEST_NOT_FOUND"
+    REPLY_NOT_FOUND = "REPLY_NOT_FOUND"
+
+
+def _target_exists(request_id: int, reply_id: int = None):
+    """Condition of an existing post, or reply of the post if a reply is given."""
+
+    if reply_id is None:
+        return exists().where(Request.id == request_id)
+    return exists().where(Reply.id == reply_id, Reply.request_id == request_id)
+
+
+def _row_condition(model: db.Model, user_id: str, request_id: int, reply_id: int):
+    """Condition of the like or save row of a user on a post or a reply."""
+
+    reply_condition = (
+        model.reply_id.is_(None) if reply_id is None else model.reply_id == reply_id
+    )
+    return and_(
+        model.user_id == user_id, model.request_id == request_id, reply_condition
+    )
+
+
+def _count(
+    model: db.Model, user_id: str, request_id: int, reply_id: int, delta: int
+) -> None:
+    """Move the like or save number of the target and the counters by delta."""
+
+    connection = db.session.connection()
+    field, _ = COUNTED_MODELS[model]
+    target = Request if reply_id is None else Reply
+    target_table = target.__table__
+    connection.execute(
+        update(target_table)
+        .where(target_table.c.id == (request_id if reply_id is None else reply_id))
+        .values({field: func.coalesce(target_table.c[field], 0) + delta})
+    )
+
+    # rows written with core statements skip the mapper events
+    adjust_counter(connection, field, delta, user_id)
+
+
+def _missing_target(request_id: int, reply_id: int) -> EngagementResultEnum:
+    """Tell which target of an unchanged toggle does not exist, if any."""
+
+    if not db.session.scalar(select(_target_exists(request_id))):
+        return EngagementResultEnum.REQUEST_NOT_FOUND
+    if reply_id is not None and not db.session.scalar(
+        select(_target_exists(request_id, reply_id))
+    ):
+        return EngagementResultEnum.REPLY_NOT_FOUND
+    return EngagementResultEnum.UNCHANGED
+
+
+def add_engagement(
+    model: db.Model, user_id: str, request_id: int, reply_id: int = None
+) -> EngagementResultEnum:
+    """Like or save a post, or a reply of it, counters included.
+
+    The row is only inserted if the post or reply exists and the user has not
+    liked or saved it yet, in a single INSERT ... SELECT ... ON CONFLICT DO
+    NOTHING RETURNING statement.
+    """
+
+    connection = db.session.connection()
+    table = model.__table__
+    row = select(
+        literal(user_id, table.c.user_id.type),
+        literal(request_id, table.c.request_id.type),
+        literal(reply_id, table.c.reply_id.type),
+        literal(generate_time(), table.c.create_at.type),
+    ).where(_target_exists(request_id, reply_id))
+    inserted = connection.scalar(
+        dialect_insert(connection, table)
+        .from_select(["user_id", "request_id", "reply_id", "create_at"], row)
+        .on_conflict_do_nothing()
+        .returning(table.c.id)
+    )
+
+    if inserted is None:
+        return _missing_target(request_id, reply_id)
+
+    _count(model, user_id, request_id, reply_id, 1)
+    db.session.commit()
+
+    return EngagementResultEnum.DONE
+
+
+def remove_engagement(
+    model: db.Model, user_id: str, request_id: int, reply_id: int = None
+) -> EngagementResultEnum:
+    """Unlike or unsave a post, or a reply of it, counters included."""
+
+    connection = db.session.connection()
+    table = model.__table__
+    deleted = connection.scalar(
+        delete(table)
+        .where(_row_condition(model, user_id, request_id, reply_id))
+        .returning(table.c.id)
+    )
+
+    if deleted is None:
+        return _missing_target(request_id, reply_id)
+
+    _count(model, user_id, request_id, reply_id, -1)
+    db.session.commit()
+
+    return EngagementResultEnum.DONE
@@ -9,6 +9,7 @@ from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import MetaData
 
 from .constants import FlashAlertTypeEnum
+from .database import RoutingSession
 
 
 def get_db_meta_data() -> MetaData:
@@ -27,7 +28,7 @@ def get_db_meta_data() -> MetaData:
 
 # flask-sqlalchemy
 meta_data = get_db_meta_data()
-db = SQLAlchemy(metadata=meta_data)
+db = SQLAlchemy(metadata=meta_data, session_options={"class_": RoutingSession})
 
 # flask-login
 login_manager = LoginManager()
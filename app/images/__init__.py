@@ -0,0 +1,150 @@
+"""Image pipeline, run on uploads before they are stored.
+
+An uploaded image is decoded, turned upright from its EXIF orientation and
+resized to the requested variants, e.g. a square avatar or a bounded full size
+image, then re-encoded to WebP, or JPEG where WebP is not available. Only the
+pixels are encoded again, so EXIF, GPS and other metadata are dropped. Each
+encoded variant is named by the hash of its content, identical uploads map to
+the same object key and are stored once.
+
+Decoding and encoding are CPU bound and run in a worker pool, Pillow releases
+the GIL while it decodes, resamples and encodes, so threads run them in
+parallel without copying the image to another process.
+"""
+
+import hashlib
+import io
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+from app.constants import (
+    IMAGE_JPEG_QUALITY,
+    IMAGE_MAX_PIXELS,
+    IMAGE_PROCESS_TIMEOUT,
+    IMAGE_VARIANTS,
+    IMAGE_WEBP_QUALITY,
+    IMAGE_WORKERS,
+)
+
+# checked once, Pillow may be built without libwebp
+WEBP_SUPPORTED = features.check("webp")
+
+_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="image")
+
+
+class ImageProcessingError(ValueError):
+    """The upload is not an image the pipeline can decode."""
+
+
+@dataclass
+class ProcessedImage:
+    """An encoded variant of an uploaded image."""
+
+    variant: str
+    data: bytes
+    content_type: str
+    extension: str
+    width: int
+    height: int
+
+    @property
+    def digest(self) -> str:
+        """SHA-256 of the encoded image."""
+
+        return hashlib.sha256(self.data).hexdigest()
+
+    def object_key(self, folder: str) -> str:
+        """Content addressed key, the same image always gets the same key."""
+
+        return f"{folder}/{self.variant}/{self.digest}.{self.extension}"
+
+
+def _open(data: bytes) -> Image.Image:
+    """Decode an upload, refusing what is not a raster image or is too large."""
+
+    try:
+        image = Image.open(io.BytesIO(data))
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as error:
+        raise ImageProcessingError("not a supported image") from error
+
+    # the size is in the header, checked before the pixels are decoded
+    if image.width * image.height > IMAGE_MAX_PIXELS:
+        raise ImageProcessingError("image dimensions are too large")
+
+    try:
+        # animated images keep their first frame
+        image.seek(0)
+        image.load()
+    except (OSError, EOFError, Image.DecompressionBombError) as error:
+        raise ImageProcessingError("image could not be decoded") from error
+
+    return ImageOps.exif_transpose(image)
+
+
+def _resize(image: Image.Image, size: tuple, crop: bool) -> Image.Image:
+    """Resize to a variant, cropped to fill it or fitted inside it."""
+
+    if crop:
+        return ImageOps.fit(image, size, Image.Resampling.LANCZOS)
+
+    # never upscaled
+    image = image.copy()
+    image.thumbnail(size, Image.Resampling.LANCZOS)
+    return image
+
+
+def _encode(image: Image.Image, variant: str) -> ProcessedImage:
+    """Encode the pixels of an image, without any of its metadata."""
+
+    has_alpha = image.mode in ("RGBA", "LA") or (
+        image.mode == "P" and "transparency" in image.info
+    )
+    buffer = io.BytesIO()
+
+    if WEBP_SUPPORTED:
+        image = image.convert("RGBA" if has_alpha else "RGB")
+        image.save(buffer, "WEBP", quality=IMAGE_WEBP_QUALITY, method=4)
+        content_type, extension = "image/webp", "webp"
+    else:
+        # JPEG has no alpha channel, transparent pixels become white
+        if has_alpha:
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image.convert("RGBA"), mask=image.convert("RGBA"))
+            image = background
+        image = image.convert("RGB")
+        image.save(
+            buffer, "JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True, progressive=True
+        )
+        content_type, extension = "image/jpeg", "jpg"
+
+    return ProcessedImage(
+        variant, buffer.getvalue(), content_type, extension, image.width, image.height
+    )
+
+
+def process_image(data: bytes, variants: tuple = ("full",)) -> list:
+    """Decode an image and encode each of the variants, see IMAGE_VARIANTS."""
+
+    unknown = [variant for variant in variants if variant not in IMAGE_VARIANTS]
+    if unknown:
+        raise ValueError(f"unknown image variants: {unknown}")
+
+    image = _open(data)
+    return [
+        _encode(_resize(image, *IMAGE_VARIANTS[variant]), variant)
+        for variant in variants
+    ]
+
+
+def process_image_async(data: bytes, variants: tuple = ("full",)):
+    """Process an image in the worker pool, returns the future of its variants."""
+
+    return _executor.submit(process_image, data, variants)
+
+
+def process_upload(data: bytes, variants: tuple = ("full",)) -> list:
+    """Process an uploaded image in the worker pool and wait for the variants."""
+
+    return process_image_async(data, variants).result(timeout=IMAGE_PROCESS_TIMEOUT)
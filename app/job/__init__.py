@@ -7,4 +7,13 @@ from flask import Blueprint
 job_bp = Blueprint("job", __name__)
 
 
-from . import reply_job, request_job, trending_job, user_job
+from . import (
+    counter_job,
+    dataset_job,
+    purge_job,
+    reply_job,
+    request_job,
+    scheduler_job,
+    trending_job,
+    user_job,
+)
@@ -0,0 +1,36 @@
+"""Counter job."""
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.constants import JOB_INTERVAL
+from app.counter import reconcile_counters
+from app.extensions import scheduler
+
+
+@scheduler.task(
+    "interval",
+    id="reconcile_counter_job",
+    seconds=JOB_INTERVAL.get("reconcile_counter"),
+)
+def reconcile_counter_job():
+    """Reconcile counter job."""
+
+    try:
+        scheduler.app.logger.info("Start [reconcile_counter_job]...")
+        reconcile_counter()
+        scheduler.app.logger.info("End [reconcile_counter_job]...")
+    except SQLAlchemyError as e:
+        scheduler.app.logger.error(f"Error [reconcile_counter_job]: {str(e)}")
+        raise
+
+
+def reconcile_counter():
+    """Recount the denormalized counters and repair drift."""
+
+    with scheduler.app.app_context():
+        repaired = reconcile_counters()
+
+        scheduler.app.logger.info(
+            "Counters reconciled from [reconcile_counter_job], %s rows repaired.",
+            repaired,
+        )
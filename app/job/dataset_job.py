@@ -0,0 +1,69 @@
+"""Dataset job, fills an empty database with a synthetic dataset."""
+
+import time
+from dataclasses import fields
+
+import click
+
+from app.constants import (
+    DATASET_CHUNK_SIZE,
+    DATASET_DAYS,
+    DATASET_SEED,
+    DATASET_SKEW,
+    DATASET_WORKERS,
+)
+from app.dataset import DatasetPlan, DatasetScale, generate_dataset
+
+from . import job_bp
+
+
+def scale_options(command):
+    """Add a --<kind> option for every row count of DatasetScale."""
+
+    for scale_field in reversed(fields(DatasetScale)):
+        command = click.option(
+            f"--{scale_field.name}",
+            type=click.IntRange(min=1),
+            default=scale_field.default,
+            show_default=True,
+        )(command)
+    return command
+
+
+@job_bp.cli.command("generate-dataset")
+@scale_options
+@click.option("--seed", type=int, default=DATASET_SEED, show_default=True)
+@click.option("--skew", type=float, default=DATASET_SKEW, show_default=True)
+@click.option("--days", type=click.IntRange(min=1), default=DATASET_DAYS)
+@click.option(
+    "--end",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    default=None,
+    help="Last day of the dataset, today by default.",
+)
+@click.option("--workers", type=click.IntRange(min=1), default=DATASET_WORKERS)
+@click.option("--chunk-size", type=click.IntRange(min=1), default=DATASET_CHUNK_SIZE)
+# pylint: disable=too-many-arguments
+def generate_dataset_command(seed, skew, days, end, workers, chunk_size, **scale):
+    """Fill an empty database with a synthetic dataset, e.g. for benchmarks."""
+
+    plan = DatasetPlan(
+        DatasetScale(**scale),
+        seed=seed,
+        skew=skew,
+        days=days,
+        end=end,
+        chunk_size=chunk_size,
+        workers=workers,
+    )
+
+    start = time.perf_counter()
+    try:
+        written = generate_dataset(plan)
+    except ValueError as error:
+        raise click.ClickException(str(error)) from error
+
+    for table, rows in written.items():
+        click.echo(f"{table}: {rows} rows")
+    click.echo(f"Generated the dataset in {time.perf_counter() - start:.1f}s.")
+    click.echo("Run flask search reindex to index it for search.")
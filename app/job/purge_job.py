@@ -0,0 +1,39 @@
+"""Purge job."""
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.constants import JOB_INTERVAL, PURGE_BATCH_SIZE, PURGE_RETRY_SECONDS
+from app.extensions import scheduler
+from app.purge import retry_post_purges
+
+
+@scheduler.task(
+    "interval",
+    id="purge_post_job",
+    seconds=JOB_INTERVAL.get("purge_post"),
+)
+def purge_post_job():
+    """Purge post job."""
+
+    try:
+        scheduler.app.logger.info("Start [purge_post_job]...")
+        purge_post()
+        scheduler.app.logger.info("End [purge_post_job]...")
+    except SQLAlchemyError as e:
+        scheduler.app.logger.error(f"Error [purge_post_job]: {str(e)}")
+        raise
+
+
+def purge_post():
+    """Run the background purges of deleted posts that stalled."""
+
+    with scheduler.app.app_context():
+        config = scheduler.app.config
+        purged = retry_post_purges(
+            config.get("PURGE_BATCH_SIZE", PURGE_BATCH_SIZE),
+            config.get("PURGE_RETRY_SECONDS", PURGE_RETRY_SECONDS),
+        )
+
+        scheduler.app.logger.info(
+            "Posts purged from [purge_post_job], %s stalled purges resumed.", purged
+        )
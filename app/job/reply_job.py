@@ -27,6 +27,7 @@ def create_reply_job():
         scheduler.app.logger.info("End [create_reply_job]...")
     except SQLAlchemyError as e:
         scheduler.app.logger.error(f"Error [create_reply_job]: {str(e)}")
+        raise
 
 
 def create_reply():
@@ -29,6 +29,7 @@ def create_request_job():
     except SQLAlchemyError as e:
         # skip db constraint validations, so may occur Error sometimes
         scheduler.app.logger.error(f"Error [create_request_job]: {str(e)}")
+        raise
 
 
 def create_request():
@@ -0,0 +1,54 @@
+"""Scheduler job, runs the scheduled jobs in a process of their own."""
+
+import signal
+import sys
+
+import click
+from flask import current_app
+from sqlalchemy import select
+
+from app.coordinator import runner_name, scheduler_coordinator
+from app.extensions import db
+from app.models.job_run import JobRun
+
+from . import job_bp
+
+
+@job_bp.cli.command("run-scheduler")
+def run_scheduler_command():
+    """Run the scheduled jobs while this process is the elected leader."""
+
+    coordinator = scheduler_coordinator(current_app)
+
+    # stop like on Ctrl+C, the running jobs finish and the lead is given up
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    click.echo(f"Scheduler {runner_name()} campaigning for the lead...")
+    coordinator.start()
+    try:
+        coordinator.wait()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        coordinator.stop()
+        click.echo("Scheduler stopped.")
+
+
+@job_bp.cli.command("runs")
+@click.option("--job-id", default=None, help="Runs of this job only.")
+@click.option("--limit", type=click.IntRange(min=1), default=20, show_default=True)
+def job_runs_command(job_id, limit):
+    """List the latest job runs."""
+
+    query = select(JobRun).order_by(JobRun.start_at.desc(), JobRun.id.desc())
+    if job_id is not None:
+        query = query.where(JobRun.job_id == job_id)
+
+    for run in db.session.scalars(query.limit(limit)):
+        line = (
+            f"{run.start_at:%Y-%m-%d %H:%M:%S} {run.job_id} {run.status} "
+            f"{run.duration_ms:.0f}ms {run.runner}"
+        )
+        if run.error:
+            line += f" {run.error}"
+        click.echo(line)
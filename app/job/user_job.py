@@ -4,7 +4,6 @@ import random
 import string
 
 from faker import Faker
-from flask_apscheduler import APScheduler
 from sqlalchemy.exc import SQLAlchemyError
 
 from app.constants import (
@@ -14,8 +13,10 @@ from app.constants import (
     USER_RECORD_MAX_NUM,
     USER_SAVE_MAX_NUM,
 )
-from app.extensions import db
+from app.engagement import add_engagement
+from app.extensions import db, scheduler
 from app.models.community import Community
+from app.models.community_member import CommunityMember
 from app.models.reply import Reply
 from app.models.request import Request
 from app.models.user import User
@@ -27,15 +28,6 @@ from app.models.user_save import UserSave
 faker = Faker()
 random.seed(5505)
 
-scheduler = APScheduler()
-
-
-def init_scheduler(app):
-    """Initialize the scheduler."""
-    scheduler.init_app(app)
-    scheduler.start()
-
-
 @scheduler.task(
     "interval",
     id="create_user",
@@ -56,6 +48,7 @@ def create_user_job():
         scheduler.app.logger.info("End [create_user_job]...")
     except SQLAlchemyError as e:
         scheduler.app.logger.error(f"Error [create_user_job]: {str(e)}")
+        raise
 
 
 def create_user():
@@ -81,11 +74,13 @@ def create_user():
             [c[0] for c in communities], k=random.randint(1, 5)
         )
 
-        user_preference = UserPreference(
-            user_id=user.id,
-            communities=str(user_communities),
+        db.session.add(UserPreference(user_id=user.id))
+        db.session.add_all(
+            [
+                CommunityMember(user_id=user.id, community_id=community_id)
+                for community_id in set(user_communities)
+            ]
         )
-        db.session.add(user_preference)
         db.session.commit()
 
 
@@ -115,6 +110,7 @@ def create_user_record_job():
         scheduler.app.logger.info("End [create_user_record_job]...")
     except SQLAlchemyError as e:
         scheduler.app.logger.error(f"Error [create_user_record_job]: {str(e)}")
+        raise
 
 
 def create_user_record():
@@ -156,6 +152,7 @@ def create_user_like_job():
         scheduler.app.logger.info("End [create_user_like_job]...")
     except SQLAlchemyError as e:
         scheduler.app.logger.error(f"Error [create_user_like_job]: {str(e)}")
+        raise
 
 
 def create_user_like():
@@ -163,20 +160,13 @@ def create_user_like():
     with scheduler.app.app_context():
         # Get random records efficiently
         user = User.query.order_by(db.func.random()).first()
-        request = Request.query.order_by(db.func.random()).first()
         reply = Reply.query.order_by(db.func.random()).first()
 
-        if not user or not request or not reply:
+        if not user or not reply:
             return
 
-        user_like = UserLike(
-            user_id=user.id,
-            request_id=request.id,
-            reply_id=reply.id,
-        )
-
-        db.session.add(user_like)
-        db.session.commit()
+        # skips a like the user already has
+        add_engagement(UserLike, user.id, reply.request_id, reply.id)
 
 
 @scheduler.task(
@@ -199,6 +189,7 @@ def create_user_save_job():
         scheduler.app.logger.info("End [create_user_save_job]...")
     except SQLAlchemyError as e:
         scheduler.app.logger.error(f"Error [create_user_save_job]: {str(e)}")
+        raise
 
 
 def create_user_save():
@@ -206,17 +197,10 @@ def create_user_save():
     with scheduler.app.app_context():
         # Get random records efficiently
         user = User.query.order_by(db.func.random()).first()
-        request = Request.query.order_by(db.func.random()).first()
         reply = Reply.query.order_by(db.func.random()).first()
 
-        if not user or not request or not reply:
+        if not user or not reply:
             return
 
-        user_save = UserSave(
-            user_id=user.id,
-            request_id=request.id,
-            reply_id=reply.id,
-        )
-
-        db.session.add(user_save)
-        db.session.commit()
+        # skips a save the user already has
+        add_engagement(UserSave, user.id, reply.request_id, reply.id)
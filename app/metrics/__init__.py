@@ -0,0 +1,210 @@
+"""Application metrics, exposed in the Prometheus text format on /metrics.
+
+The metrics live in the prometheus_client registry of the process. Under
+gunicorn every worker is a process of its own, with PROMETHEUS_MULTIPROC_DIR
+set, see gunicorn.conf.py, each worker writes its values to memory mapped
+files in that directory and a scrape merges the files of every worker, dead
+workers included for the counters and histograms. Without the directory the
+registry of the process is exposed as it is. The route is closed until a
+METRICS_TOKEN is configured, scrapers send it as a bearer token.
+
+Covered are the request latency per blueprint and endpoint, the checkout wait
+and usage of the database pool, the duration and failures of scheduled jobs,
+the hits and misses of the application cache, the notice queue and streams,
+and the R2 uploads.
+"""
+
+import hmac
+import os
+import time
+from datetime import datetime, timezone
+
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_EXECUTED
+from flask import Flask, Response, abort, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    values,
+)
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+from app.constants import METRICS_LATENCY_BUCKETS
+
+# prometheus_client picks its value class when first imported, a directory set
+# later would be merged without a value of any worker in it
+if (
+    os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    and values.ValueClass is values.MutexValue
+):
+    raise RuntimeError(
+        "PROMETHEUS_MULTIPROC_DIR was set after prometheus_client was imported, "
+        "set it before the app is imported, e.g. in gunicorn.conf.py"
+    )
+
+REQUEST_LATENCY = Histogram(
+    "askify_http_request_duration_seconds",
+    "Latency of the HTTP requests.",
+    ["blueprint", "endpoint", "method", "status"],
+    buckets=METRICS_LATENCY_BUCKETS,
+)
+
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "askify_db_pool_checkout_wait_seconds",
+    "Time spent waiting for a connection of the database pool.",
+    buckets=METRICS_LATENCY_BUCKETS,
+)
+DB_POOL_IN_USE = Gauge(
+    "askify_db_pool_connections_in_use",
+    "Connections of the database pool checked out.",
+    multiprocess_mode="livesum",
+)
+
+JOB_DURATION = Histogram(
+    "askify_job_duration_seconds",
+    "Duration of the scheduled job runs.",
+    ["job"],
+    buckets=METRICS_LATENCY_BUCKETS,
+)
+JOB_FAILURES = Counter(
+    "askify_job_failures_total", "Scheduled job runs that raised.", ["job"]
+)
+
+CACHE_REQUESTS = Counter(
+    "askify_cache_requests_total",
+    "Lookups of the application cache.",
+    ["namespace", "result"],
+)
+
+NOTICE_QUEUE_DEPTH = Gauge(
+    "askify_notice_queue_depth",
+    "Notices queued for the notice writer.",
+    multiprocess_mode="livesum",
+)
+NOTICE_DROPPED = Counter(
+    "askify_notice_dropped_total", "Notices dropped with a full queue."
+)
+VIEWS_DROPPED = Counter(
+    "askify_views_dropped_total",
+    "Post views dropped, with a full buffer or after a failed retry.",
+    ["reason"],
+)
+NOTICE_STREAMS = Gauge(
+    "askify_notice_streams",
+    "Open notification streams.",
+    multiprocess_mode="livesum",
+)
+
+R2_UPLOAD_LATENCY = Histogram(
+    "askify_r2_upload_duration_seconds",
+    "Latency of the R2 uploads.",
+    ["result"],
+    buckets=METRICS_LATENCY_BUCKETS,
+)
+R2_UPLOAD_BYTES = Counter("askify_r2_upload_bytes_total", "Bytes uploaded to R2.")
+R2_RETRIES = Counter("askify_r2_retries_total", "Retried R2 requests.")
+
+
+class MeteredQueuePool(QueuePool):
+    """Queue pool timing the wait for a connection and counting those in use."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        connection = super()._do_get()
+        DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+        DB_POOL_IN_USE.inc()
+        return connection
+
+    def _do_return_conn(self, record) -> None:
+        DB_POOL_IN_USE.dec()
+        super()._do_return_conn(record)
+
+
+def metrics_registry():
+    """The registry to expose, the merged worker files under gunicorn."""
+
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_response() -> Response:
+    """The metrics in the Prometheus text format."""
+
+    return Response(generate_latest(metrics_registry()), mimetype=CONTENT_TYPE_LATEST)
+
+
+def observe_scheduler(scheduler) -> None:
+    """Time the runs of the jobs of a scheduler and count their failures."""
+
+    # every app created in the process shares the scheduler, listen once
+    if getattr(scheduler, "metrics_observed", False):
+        return
+    scheduler.metrics_observed = True
+
+    # the executor may run a job before its submission event is sent, so a run
+    # is timed from its scheduled time, the wait for a busy executor included
+    def finished(event) -> None:
+        seconds = (
+            datetime.now(tz=timezone.utc) - event.scheduled_run_time
+        ).total_seconds()
+        JOB_DURATION.labels(event.job_id).observe(max(seconds, 0))
+        if event.code == EVENT_JOB_ERROR:
+            JOB_FAILURES.labels(event.job_id).inc()
+
+    scheduler.add_listener(finished, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
+
+
+def init_metrics(app: Flask) -> None:
+    """Meter the database pool of the app, before its engine is created."""
+
+    uri = app.config.get("SQLALCHEMY_DATABASE_URI")
+    if not uri:
+        return
+
+    url = make_url(uri)
+    engine_options = app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", {})
+    # in-memory SQLite keeps its single connection pool
+    if url.get_dialect().get_pool_class(url) is QueuePool:
+        engine_options.setdefault("poolclass", MeteredQueuePool)
+
+
+def register_metrics(app: Flask) -> None:
+    """Register the request latency hooks and the /metrics route."""
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response: Response) -> Response:
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            REQUEST_LATENCY.labels(
+                request.blueprint or "app",
+                request.endpoint or "unmatched",
+                request.method,
+                response.status_code,
+            ).observe(time.perf_counter() - start)
+        return response
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        # closed until a token is configured, scrapers authenticate with it
+        token = app.config.get("METRICS_TOKEN")
+        if not token:
+            abort(404)
+        if not hmac.compare_digest(
+            request.headers.get("Authorization", ""), f"Bearer {token}"
+        ):
+            abort(401)
+        return metrics_response()
@@ -2,13 +2,20 @@
 
 from .category import Category
 from .community import Community
+from .community_member import CommunityMember
+from .global_stat import GlobalStat
+from .job_run import JobRun
 from .reply import Reply
 from .request import Request
+from .search_document import SearchDocument
+from .search_term import SearchTerm
 from .tag import Tag
 from .trending import Trending
+from .trending_bucket import TrendingBucket
 from .user import User
 from .user_like import UserLike
 from .user_notice import UserNotice
 from .user_preference import UserPreference
 from .user_record import UserRecord
 from .user_save import UserSave
+from .user_stat import UserStat
@@ -0,0 +1,32 @@
+"""Community Member model."""
+
+import datetime
+
+from app.extensions import db
+from app.utils import generate_time
+
+
+# pylint: disable=too-few-public-methods
+class CommunityMember(db.Model):
+    """Community Member model, the membership of a user in a community."""
+
+    # the primary key serves the communities of a user, the index the members
+    # of a community
+    user_id: str = db.Column(db.String(36), db.ForeignKey("user.id"), primary_key=True)
+    community_id: int = db.Column(
+        db.Integer, db.ForeignKey("community.id"), primary_key=True
+    )
+    create_at: datetime = db.Column(db.DateTime, default=generate_time)
+
+    __table_args__ = (
+        db.Index("ix_community_member_community_user", "community_id", "user_id"),
+    )
+
+    def __init__(self, user_id: str, community_id: int) -> None:
+        self.user_id = user_id
+        self.community_id = community_id
+
+    def __repr__(self) -> str:
+        """Return a string representation of the community member."""
+
+        return f"<CommunityMember {self.user_id} {self.community_id}>"
@@ -0,0 +1,45 @@
+"""Global Stat model."""
+
+import datetime
+
+from app.extensions import db
+from app.utils import format_datetime_to_readable_string, generate_time
+
+# the global stat table only ever holds this row
+GLOBAL_STAT_ID = 1
+
+
+# pylint: disable=too-many-instance-attributes
+class GlobalStat(db.Model):
+    """Global Stat model, denormalized site-wide counters."""
+
+    id: int = db.Column(db.Integer, primary_key=True, default=GLOBAL_STAT_ID)
+    user_num: int = db.Column(db.Integer, nullable=False, default=0)
+    community_num: int = db.Column(db.Integer, nullable=False, default=0)
+    request_num: int = db.Column(db.Integer, nullable=False, default=0)
+    reply_num: int = db.Column(db.Integer, nullable=False, default=0)
+    view_num: int = db.Column(db.Integer, nullable=False, default=0)
+    like_num: int = db.Column(db.Integer, nullable=False, default=0)
+    save_num: int = db.Column(db.Integer, nullable=False, default=0)
+    update_at: datetime = db.Column(
+        db.DateTime, default=generate_time(), onupdate=generate_time()
+    )
+
+    def __repr__(self) -> str:
+        """Return a string representation of the global stat."""
+
+        return f"<GlobalStat {self.id}>"
+
+    def to_dict(self) -> dict:
+        """Return a JSON format of the global stat."""
+
+        return {
+            "user_num": self.user_num,
+            "community_num": self.community_num,
+            "request_num": self.request_num,
+            "view_num": self.view_num,
+            "reply_num": self.reply_num,
+            "like_num": self.like_num,
+            "save_num": self.save_num,
+            "update_at": format_datetime_to_readable_string(self.update_at),
+        }
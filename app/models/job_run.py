@@ -0,0 +1,48 @@
+"""Job Run model."""
+
+import datetime
+import enum
+
+from app.extensions import db
+from app.utils import format_datetime_to_readable_string
+
+
+class JobRunStatusEnum(enum.Enum):
+    """Enum for job run status."""
+
+    SUCCESS = "SUCCESS"
+    FAILURE = "FAILURE"
+
+
+class JobRun(db.Model):
+    """Job Run model, a run of a scheduled job by the leading scheduler."""
+
+    id: int = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    job_id: str = db.Column(db.String(64), nullable=False)
+    runner: str = db.Column(db.String(128), nullable=False)
+    status: str = db.Column(db.String(10), nullable=False)
+    start_at: datetime = db.Column(db.DateTime, nullable=False)
+    end_at: datetime = db.Column(db.DateTime, nullable=False)
+    duration_ms: float = db.Column(db.Float, nullable=False)
+    error: str = db.Column(db.Text, nullable=True)
+
+    __table_args__ = (db.Index("ix_job_run_job_id_start_at", "job_id", "start_at"),)
+
+    def __repr__(self) -> str:
+        """Return a string representation of the job run."""
+
+        return f"<JobRun {self.job_id} {self.status}>"
+
+    def to_dict(self) -> dict:
+        """Return a JSON format of the job run."""
+
+        return {
+            "id": self.id,
+            "job_id": self.job_id,
+            "runner": self.runner,
+            "status": self.status,
+            "start_at": format_datetime_to_readable_string(self.start_at),
+            "end_at": format_datetime_to_readable_string(self.end_at),
+            "duration_ms": self.duration_ms,
+            "error": self.error,
+        }
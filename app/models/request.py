@@ -2,9 +2,38 @@
 
 import datetime
 
+from sqlalchemy.orm import load_only, selectinload
+
 from app.extensions import db
 from app.utils import format_datetime_to_readable_string, generate_time
 
+# fields a feed can ask for, "author.username" style picks one related column
+REQUEST_FIELDS = (
+    "id",
+    "author",
+    "title",
+    "content",
+    "community",
+    "tag",
+    "view_num",
+    "like_num",
+    "reply_num",
+    "save_num",
+    "create_at",
+    "update_at",
+)
+REQUEST_RELATIONSHIPS = {
+    "author": "author_id",
+    "community": "community_id",
+    "tag": "tag_id",
+}
+# related columns a feed can pick, the public ones only
+REQUEST_RELATED_FIELDS = {
+    "author": ("id", "username", "avatar_url"),
+    "community": ("id", "name", "description", "avatar_url"),
+    "tag": ("id", "name"),
+}
+
 
 # pylint: disable=too-many-instance-attributes
 class Request(db.Model):
@@ -26,11 +55,20 @@ class Request(db.Model):
     update_at: datetime = db.Column(
         db.DateTime, default=generate_time(), onupdate=generate_time()
     )
+    # set when a background purge is scheduled, the post is hidden from then on
+    delete_at: datetime = db.Column(db.DateTime, index=True)
 
     author = db.relationship("User", backref=db.backref("requests", lazy=True))
     community = db.relationship("Community", backref=db.backref("requests", lazy=True))
     tag = db.relationship("Tag", backref=db.backref("requests", lazy=True))
 
+    # seek indexes of the cursor paged feeds
+    __table_args__ = (
+        db.Index("ix_request_create_at_id", "create_at", "id"),
+        db.Index("ix_request_update_at_id", "update_at", "id"),
+        db.Index("ix_request_author_create_at_id", "author_id", "create_at", "id"),
+    )
+
     # pylint: disable=too-many-arguments
     def __init__(
         self,
@@ -59,9 +97,55 @@ class Request(db.Model):
 
         return f"<Request {self.id}>"
 
+    @classmethod
+    def feed_options(cls, fields: tuple = None, loader=selectinload) -> list:
+        """Return loader options for a page of requests.
+
+        Each relationship is loaded with one query per page (selectinload by default,
+        joinedload can be passed instead), and only the columns the fields need.
+        """
+
+        options = []
+        columns = set()
+
+        for relationship, foreign_key in REQUEST_RELATIONSHIPS.items():
+            sub_fields = _requested_sub_fields(fields, relationship)
+            if sub_fields is None:
+                continue
+
+            columns.add(foreign_key)
+            related_loader = loader(getattr(cls, relationship))
+            related_class = getattr(cls, relationship).property.mapper.class_
+
+            if sub_fields:
+                related_loader = related_loader.options(
+                    load_only(*[getattr(related_class, name) for name in sub_fields])
+                )
+            elif relationship == "community":
+                # the full community dict also carries its category and creator
+                related_loader = related_loader.options(
+                    selectinload(related_class.category),
+                    selectinload(related_class.creator),
+                )
+
+            options.append(related_loader)
+
+        if fields is not None:
+            columns.update(
+                field
+                for field in fields
+                if "." not in field and field not in REQUEST_RELATIONSHIPS
+            )
+            options.append(load_only(*[getattr(cls, column) for column in columns]))
+
+        return options
+
     # generated by copilot
-    def to_dict(self):
-        """Return a JSON format of the request."""
+    def to_dict(self, fields: tuple = None) -> dict:
+        """Return a JSON format of the request, or only the given fields."""
+
+        if fields is not None:
+            return self._to_projected_dict(fields)
 
         return {
             "id": self.id,
@@ -77,3 +161,52 @@ class Request(db.Model):
             "create_at": format_datetime_to_readable_string(self.create_at),
             "update_at": format_datetime_to_readable_string(self.update_at),
         }
+
+    def _to_projected_dict(self, fields: tuple) -> dict:
+        """Return a JSON format of the request with the given fields only."""
+
+        result = {}
+        for field in fields:
+            name, _, sub_field = field.partition(".")
+            value = getattr(self, name)
+
+            if name in REQUEST_RELATIONSHIPS:
+                if value is None:
+                    result[name] = None
+                elif sub_field:
+                    result.setdefault(name, {})[sub_field] = getattr(value, sub_field)
+                else:
+                    result[name] = value.to_dict()
+            elif name in ("create_at", "update_at"):
+                result[name] = format_datetime_to_readable_string(value)
+            else:
+                result[name] = value
+
+        return result
+
+
+def validate_request_fields(fields: tuple) -> bool:
+    """Check the fields are known request fields or public related columns."""
+
+    for field in fields:
+        name, _, sub_field = field.partition(".")
+        if name not in REQUEST_FIELDS:
+            return False
+        if sub_field and sub_field not in REQUEST_RELATED_FIELDS.get(name, ()):
+            return False
+
+    return True
+
+
+def _requested_sub_fields(fields: tuple, relationship: str) -> list:
+    """Get the related columns asked for, [] for the whole object, None if unused."""
+
+    if fields is None or relationship in fields:
+        return []
+
+    sub_fields = [
+        field.partition(".")[2]
+        for field in fields
+        if field.partition(".")[0] == relationship and "." in field
+    ]
+    return sub_fields or None
@@ -0,0 +1,84 @@
+"""Search Document model."""
+
+import datetime
+import enum
+
+from sqlalchemy import func, literal_column
+
+from app.extensions import db
+from app.utils import generate_time
+
+# text search configuration of the PostgreSQL search vector
+SEARCH_CONFIG = literal_column("'english'::regconfig")
+
+
+def weighted_search_vector(title, author, content):
+    """Build the tsvector expression of a document, titles weigh the most."""
+
+    def weighted(column, weight: str):
+        return func.setweight(
+            func.to_tsvector(
+                SEARCH_CONFIG, func.coalesce(column, literal_column("''"))
+            ),
+            literal_column(f"'{weight}'"),
+        )
+
+    return (
+        weighted(title, "A")
+        .op("||")(weighted(author, "B"))
+        .op("||")(weighted(content, "C"))
+    )
+
+
+class SearchEntityEnum(enum.Enum):
+    """Enum for search entity."""
+
+    COMMUNITY = "community"
+    REQUEST = "request"
+    REPLY = "reply"
+
+
+class SearchDocument(db.Model):
+    """Search Document model, one searchable row per community, request or reply.
+
+    For a community the title is its name, the content its description and the
+    author its creator. For a reply the title is the title of its request.
+    """
+
+    id: int = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    entity_type: str = db.Column(db.String(10), nullable=False)
+    entity_id: int = db.Column(db.Integer, nullable=False)
+    parent_id: int = db.Column(db.Integer, index=True)
+    author_id: str = db.Column(db.String(36), index=True)
+    title: str = db.Column(db.String(200))
+    content: str = db.Column(db.Text)
+    author: str = db.Column(db.String(80))
+    update_at: datetime = db.Column(
+        db.DateTime, default=generate_time(), onupdate=generate_time()
+    )
+
+    # the GIN index only exists on PostgreSQL
+    __table_args__ = (
+        db.UniqueConstraint("entity_type", "entity_id", name="uq_search_document_entity"),
+        db.Index(
+            "ix_search_document_vector",
+            weighted_search_vector(title, author, content),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+    )
+
+    def __repr__(self) -> str:
+        """Return a string representation of the search document."""
+
+        return f"<SearchDocument {self.entity_type} {self.entity_id}>"
+
+    @classmethod
+    def search_vector(cls):
+        """Return the weighted PostgreSQL tsvector of a document.
+
+        The GIN index is built on exactly this expression, queries must use it
+        unchanged for the planner to pick the index.
+        """
+
+        columns = cls.__table__.c
+        return weighted_search_vector(columns.title, columns.author, columns.content)
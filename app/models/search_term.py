@@ -0,0 +1,22 @@
+"""Search Term model."""
+
+from app.extensions import db
+
+
+# pylint: disable=too-few-public-methods
+class SearchTerm(db.Model):
+    """Search Term model, the inverted index used when PostgreSQL is not available.
+
+    The primary key leads with (entity_type, term) so that a term or term prefix
+    lookup for one entity type is a single index range scan.
+    """
+
+    entity_type: str = db.Column(db.String(10), primary_key=True)
+    term: str = db.Column(db.String(64), primary_key=True)
+    entity_id: int = db.Column(db.Integer, primary_key=True)
+    weight: int = db.Column(db.Integer, nullable=False, default=1)
+
+    def __repr__(self) -> str:
+        """Return a string representation of the search term."""
+
+        return f"<SearchTerm {self.entity_type} {self.term} {self.entity_id}>"
@@ -2,6 +2,7 @@
 
 import datetime
 
+from app.constants import TRENDING_DEFAULT_PERIOD
 from app.extensions import db
 from app.utils import (format_datetime_to_readable_string, generate_date,
                        generate_time)
@@ -11,12 +12,16 @@ class Trending(db.Model):
     """Trending model"""
 
     id: int = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    period: str = db.Column(
+        db.String(3), nullable=False, default=TRENDING_DEFAULT_PERIOD
+    )
     request_id: int = db.Column(
-        db.Integer, db.ForeignKey("request.id"), unique=True, nullable=False
+        db.Integer, db.ForeignKey("request.id"), nullable=False
     )
     author_id: str = db.Column(db.String(36), db.ForeignKey("user.id"), nullable=False)
     view_num: int = db.Column(db.Integer, default=0)
     reply_num: int = db.Column(db.Integer, default=0)
+    score: float = db.Column(db.Float, nullable=False, default=0)
     date: str = db.Column(db.String(10), default=generate_date())
     update_at: datetime = db.Column(
         db.DateTime, default=generate_time(), onupdate=generate_time()
@@ -25,13 +30,27 @@ class Trending(db.Model):
     request = db.relationship("Request", backref=db.backref("trendings", lazy=True))
     author = db.relationship("User", backref=db.backref("trendings", lazy=True))
 
+    __table_args__ = (
+        db.UniqueConstraint("period", "request_id", name="uq_trending_period_request"),
+        db.Index("ix_trending_period_score", "period", "score"),
+    )
+
+    # pylint: disable=too-many-arguments
     def __init__(
-        self, request_id: int, author_id: str, view_num: int = 0, reply_num: int = 0
+        self,
+        request_id: int,
+        author_id: str,
+        view_num: int = 0,
+        reply_num: int = 0,
+        period: str = TRENDING_DEFAULT_PERIOD,
+        score: float = 0,
     ) -> None:
         self.request_id = request_id
         self.author_id = author_id
         self.view_num = view_num
         self.reply_num = reply_num
+        self.period = period
+        self.score = score
 
     def __repr__(self) -> str:
         """Return a string representation of the trending."""
@@ -44,10 +63,12 @@ class Trending(db.Model):
 
         return {
             "id": self.id,
+            "period": self.period,
             "request": self.request.to_dict() if self.request else None,
             "author": self.author.to_dict() if self.author else None,
             "view_num": self.view_num,
             "reply_num": self.reply_num,
+            "score": self.score,
             "date": self.date,
             "update_at": format_datetime_to_readable_string(self.update_at),
         }
@@ -0,0 +1,21 @@
+"""Trending Bucket model."""
+
+import datetime
+
+from app.extensions import db
+
+
+# pylint: disable=too-few-public-methods
+class TrendingBucket(db.Model):
+    """Trending Bucket model, the views of a request within one time bucket."""
+
+    request_id: int = db.Column(
+        db.Integer, db.ForeignKey("request.id"), primary_key=True
+    )
+    bucket_start: datetime = db.Column(db.DateTime, primary_key=True, index=True)
+    view_num: int = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        """Return a string representation of the trending bucket."""
+
+        return f"<TrendingBucket {self.request_id} {self.bucket_start}>"
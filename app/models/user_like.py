@@ -19,6 +19,28 @@ class UserLike(db.Model):
     request = db.relationship("Request", backref=db.backref("user_likes", lazy=True))
     reply = db.relationship("Reply", backref=db.backref("user_likes", lazy=True))
 
+    # one like per user and post or reply, null reply ids are distinct in a
+    # plain unique index, so post and reply likes get one partial index each
+    __table_args__ = (
+        db.Index(
+            "uq_user_like_user_request",
+            "user_id",
+            "request_id",
+            unique=True,
+            sqlite_where=reply_id.is_(None),
+            postgresql_where=reply_id.is_(None),
+        ),
+        db.Index(
+            "uq_user_like_user_request_reply",
+            "user_id",
+            "request_id",
+            "reply_id",
+            unique=True,
+            sqlite_where=reply_id.isnot(None),
+            postgresql_where=reply_id.isnot(None),
+        ),
+    )
+
     def __init__(self, user_id: str, request_id: int, reply_id: int = None) -> None:
         self.user_id = user_id
         self.request_id = request_id
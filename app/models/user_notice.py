@@ -55,6 +55,17 @@ class UserNotice(db.Model):
 
     user = db.relationship("User", backref=db.backref("notices", lazy=True))
 
+    # seek index of the cursor paged notices of a user, unread first
+    __table_args__ = (
+        db.Index(
+            "ix_user_notice_user_status_create_at_id",
+            "user_id",
+            "status",
+            "create_at",
+            "id",
+        ),
+    )
+
     # pylint: disable=too-many-arguments
     def __init__(
         self,
@@ -17,6 +17,11 @@ class UserRecord(db.Model):
     user = db.relationship("User", backref=db.backref("user_records", lazy=True))
     request = db.relationship("Request", backref=db.backref("user_records", lazy=True))
 
+    # seek index of the cursor paged records of a user
+    __table_args__ = (
+        db.Index("ix_user_record_user_create_at_id", "user_id", "create_at", "id"),
+    )
+
     def __init__(self, user_id: str, request_id: int) -> None:
         self.user_id = user_id
         self.request_id = request_id
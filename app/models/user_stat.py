@@ -0,0 +1,37 @@
+"""User Stat model."""
+
+import datetime
+
+from app.extensions import db
+from app.utils import format_datetime_to_readable_string, generate_time
+
+
+class UserStat(db.Model):
+    """User Stat model, denormalized per-user counters."""
+
+    user_id: str = db.Column(db.String(36), db.ForeignKey("user.id"), primary_key=True)
+    request_num: int = db.Column(db.Integer, nullable=False, default=0)
+    reply_num: int = db.Column(db.Integer, nullable=False, default=0)
+    view_num: int = db.Column(db.Integer, nullable=False, default=0)
+    like_num: int = db.Column(db.Integer, nullable=False, default=0)
+    save_num: int = db.Column(db.Integer, nullable=False, default=0)
+    update_at: datetime = db.Column(
+        db.DateTime, default=generate_time(), onupdate=generate_time()
+    )
+
+    def __repr__(self) -> str:
+        """Return a string representation of the user stat."""
+
+        return f"<UserStat {self.user_id}>"
+
+    def to_dict(self) -> dict:
+        """Return a JSON format of the user stat."""
+
+        return {
+            "request_num": self.request_num,
+            "view_num": self.view_num,
+            "reply_num": self.reply_num,
+            "like_num": self.like_num,
+            "save_num": self.save_num,
+            "update_at": format_datetime_to_readable_string(self.update_at),
+        }
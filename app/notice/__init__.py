@@ -2,12 +2,10 @@
 
 
 from blinker import Namespace
-from flask import current_app, g
+from flask import current_app
 
-from app.constants import G_NOTICE_NUM, MAX_NOTICE_NUM
-from app.extensions import db
-from app.models.user_notice import (UserNotice, UserNoticeActionEnum,
-                                    UserNoticeModuleEnum)
+from app.models.user_notice import UserNoticeActionEnum, UserNoticeModuleEnum
+from app.notice.writer import notice_writer
 
 signals = Namespace()
 notification_signal = signals.signal("notification")
@@ -37,27 +35,16 @@ def handle_notification(_, **kwargs: dict) -> None:
         current_app.logger.error("Invalid notice action: %s", {notice_action})
         raise ValueError("Invalid notice action: %s", {notice_action})
 
-    # insert to database
-    notice = UserNotice(
+    # queue for the notice writer, the request does not commit it, the unread
+    # count of open pages is pushed once the notice is written
+    notice_writer.enqueue(
         user_id=user_id,
         subject=notice_module,
         content=f"{notice_action} successfully!",
         module=notice_module,
-        status=False,
     )
 
-    db.session.add(notice)
-    db.session.commit()
-
-    current_app.logger.info(
-        "Notification: %s, %s inserted into database", {notice_module}, {notice_action}
-    )
-
-    # update layout notification number
-    notice_num = getattr(g, G_NOTICE_NUM, 0) + 1
-    g.notice_num = min(notice_num, MAX_NOTICE_NUM)
-
-    current_app.logger.info("Notice number updated: [%s]", {g.notice_num})
+    current_app.logger.info("Notice queued for user: [%s]", {user_id})
 
 
 notification_signal.connect(handle_notification)
@@ -0,0 +1,97 @@
+"""In-process pub/sub of notice events.
+
+The notice writer publishes an event once a notice is written, and every open
+notification stream of the user gets it on its own bounded queue. A stream too
+slow to drain its queue is flagged as lagged rather than blocking publishers.
+"""
+
+import queue
+import threading
+from collections import defaultdict
+
+from app.constants import (
+    NOTICE_STREAM_MAX_CONNECTIONS,
+    NOTICE_STREAM_MAX_USER_CONNECTIONS,
+    NOTICE_STREAM_QUEUE_SIZE,
+)
+from app.metrics import NOTICE_STREAMS
+
+
+# pylint: disable=too-few-public-methods
+class Subscription:
+    """Events waiting to be sent on one stream connection."""
+
+    def __init__(self, user_id: str, queue_size: int) -> None:
+        self.user_id = user_id
+        self.events = queue.Queue(queue_size)
+        self.lagged = False
+
+
+class NoticeBroker:
+    """In-process pub/sub of notice events, by user."""
+
+    def __init__(
+        self,
+        max_connections: int = NOTICE_STREAM_MAX_CONNECTIONS,
+        max_user_connections: int = NOTICE_STREAM_MAX_USER_CONNECTIONS,
+        queue_size: int = NOTICE_STREAM_QUEUE_SIZE,
+    ) -> None:
+        self.max_connections = max_connections
+        self.max_user_connections = max_user_connections
+        self.queue_size = queue_size
+        self._subscriptions = defaultdict(set)
+        self._connections = 0
+        self._lock = threading.Lock()
+
+    @property
+    def connections(self) -> int:
+        """Number of open stream connections."""
+
+        return self._connections
+
+    def subscribe(self, user_id: str) -> Subscription:
+        """Open a subscription, None when a connection cap is reached."""
+
+        with self._lock:
+            if self._connections >= self.max_connections:
+                return None
+            if len(self._subscriptions[user_id]) >= self.max_user_connections:
+                return None
+
+            subscription = Subscription(user_id, self.queue_size)
+            self._subscriptions[user_id].add(subscription)
+            self._connections += 1
+            NOTICE_STREAMS.inc()
+            return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Close a subscription, closing it twice is harmless."""
+
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if not subscriptions or subscription not in subscriptions:
+                return
+
+            subscriptions.discard(subscription)
+            self._connections -= 1
+            NOTICE_STREAMS.dec()
+            if not subscriptions:
+                del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_id: str, event: str, data: dict) -> int:
+        """Send an event to every stream of a user, returns the streams reached."""
+
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+
+        for subscription in subscriptions:
+            try:
+                subscription.events.put_nowait((event, data))
+            except queue.Full:
+                # a stream that does not keep up is told to start over
+                subscription.lagged = True
+
+        return len(subscriptions)
+
+
+notice_broker = NoticeBroker()
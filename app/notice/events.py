@@ -2,7 +2,7 @@
 
 import enum
 
-from flask import current_app, g
+from flask import current_app
 from flask_login import current_user
 
 from app.models.user_notice import UserNoticeActionEnum, UserNoticeModuleEnum
@@ -89,4 +89,3 @@ def notice_event(
         "Notice Event - user_id: %s, notice_type: %s", user_id, notice_type.value
     )
     notification_signal.send("app", user_id=user_id, notice_type=notice_type.value)
-    g.notice_num += 1
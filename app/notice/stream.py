@@ -0,0 +1,152 @@
+"""Server-Sent Events stream of notices and unread counts.
+
+Pages no longer count and list unread notices on every load. A page opens one
+event stream instead, which starts with the unread count of the user and then
+receives every new notice, and every notice read or unread again, as a count
+delta. The events come from an in-process pub/sub the notice writer publishes
+to once a notice is written, so a stream only sees the notices of its own
+worker process. Connections are capped per process and per user, get a
+heartbeat while idle and are closed after a while, for the browser to reconnect.
+A stream holds a thread of the server for as long as it is open, a server
+without threads only sends the count and is asked again after a while.
+"""
+
+import json
+import queue
+import time
+
+from flask import Response, current_app, request
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.constants import (
+    LAYOUT_NOTICE_NUM,
+    NOTICE_STREAM_HEARTBEAT_SECONDS,
+    NOTICE_STREAM_MAX_SECONDS,
+    NOTICE_STREAM_POLL_MILLISECONDS,
+    NOTICE_STREAM_RETRY_MILLISECONDS,
+)
+from app.extensions import db
+from app.models.user_notice import UserNotice
+from app.notice.broker import Subscription, notice_broker
+
+
+def format_event(event: str, data: dict) -> str:
+    """Format an event in the text/event-stream format."""
+
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def unread_notice_num(user_id: str) -> int:
+    """Count the unread notices of a user written so far.
+
+    The queued ones are left out, each is sent as a delta once written.
+    """
+
+    # pylint: disable=not-callable
+    return db.session.scalar(
+        select(func.count(UserNotice.id)).where(
+            UserNotice.user_id == user_id, UserNotice.status.is_(False)
+        )
+    )
+
+
+def unread_notices(user_id: str) -> list:
+    """Return the latest unread notices of a user."""
+
+    notices = db.session.scalars(
+        select(UserNotice)
+        .where(UserNotice.user_id == user_id, UserNotice.status.is_(False))
+        .order_by(UserNotice.create_at.desc())
+        .limit(LAYOUT_NOTICE_NUM)
+    )
+    return [
+        {
+            "id": notice.id,
+            "subject": notice.subject,
+            "content": notice.content,
+            "module": notice.module.value,
+            "status": notice.status,
+        }
+        for notice in notices
+    ]
+
+
+def stream_events(
+    subscription: Subscription,
+    unread: int,
+    heartbeat_seconds: float = NOTICE_STREAM_HEARTBEAT_SECONDS,
+    max_seconds: float = NOTICE_STREAM_MAX_SECONDS,
+    retry_milliseconds: int = NOTICE_STREAM_RETRY_MILLISECONDS,
+):
+    """Yield the events of a stream, starting with the unread count."""
+
+    yield f"retry: {retry_milliseconds}\n\n"
+    yield format_event("count", {"unread": unread})
+
+    deadline = time.monotonic() + max_seconds
+    while not subscription.lagged:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+
+        try:
+            event, data = subscription.events.get(
+                timeout=min(heartbeat_seconds, remaining)
+            )
+        except queue.Empty:
+            # a comment line, keeps proxies from closing the idle connection
+            yield ": heartbeat\n\n"
+            continue
+
+        yield format_event(event, data)
+
+    yield format_event("resync", {})
+
+
+def notice_stream_response(user_id: str) -> Response:
+    """Open the notice event stream of a user."""
+
+    # subscribed before counting, a notice written meanwhile is not missed
+    subscription = notice_broker.subscribe(user_id)
+    if subscription is None:
+        return Response(
+            "too many notification streams",
+            status=503,
+            headers={"Retry-After": str(NOTICE_STREAM_RETRY_MILLISECONDS // 1000)},
+        )
+
+    try:
+        unread = unread_notice_num(user_id)
+    except SQLAlchemyError:
+        notice_broker.unsubscribe(subscription)
+        raise
+
+    max_seconds = current_app.config.get(
+        "NOTICE_STREAM_MAX_SECONDS", NOTICE_STREAM_MAX_SECONDS
+    )
+    retry_milliseconds = NOTICE_STREAM_RETRY_MILLISECONDS
+    if not request.environ.get("wsgi.multithread"):
+        # the stream would hold the only thread of the worker
+        max_seconds = 0
+        retry_milliseconds = current_app.config.get(
+            "NOTICE_STREAM_POLL_MILLISECONDS", NOTICE_STREAM_POLL_MILLISECONDS
+        )
+
+    response = Response(
+        stream_events(
+            subscription,
+            unread,
+            current_app.config.get(
+                "NOTICE_STREAM_HEARTBEAT_SECONDS", NOTICE_STREAM_HEARTBEAT_SECONDS
+            ),
+            max_seconds,
+            retry_milliseconds,
+        ),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+    # runs even when the stream is closed before its first event
+    response.call_on_close(lambda: notice_broker.unsubscribe(subscription))
+    return response
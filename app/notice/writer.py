@@ -0,0 +1,237 @@
+"""Batched, asynchronous notice writer.
+
+A notice event only puts the notice on a bounded in-process queue, the request
+that raised it does not commit anything. A background thread takes notices off
+the queue and writes them with one multi-row insert per batch, a batch closes
+once it is full or a few seconds after its first notice. When the queue is full
+the request waits a moment for room and then drops the notice, so a slow
+database costs a bounded amount of memory. Notices still queued when the
+process exits are written before it stops. Written notices are published to
+the open notification streams of their users.
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+from collections import Counter
+
+from flask import Flask
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.constants import (
+    NOTICE_WRITER_BATCH_SIZE,
+    NOTICE_WRITER_ENQUEUE_TIMEOUT,
+    NOTICE_WRITER_FLUSH_SECONDS,
+    NOTICE_WRITER_QUEUE_SIZE,
+)
+from app.extensions import db
+from app.metrics import NOTICE_DROPPED, NOTICE_QUEUE_DEPTH
+from app.models.user_notice import UserNotice
+from app.notice.broker import notice_broker
+from app.utils import generate_time
+
+# put on the queue to make the flusher write its batch and stop
+_STOP = object()
+
+
+class NoticeWriter:
+    """Per-process queue of notices with a background batch writer."""
+
+    # pylint: disable=too-many-instance-attributes
+    def __init__(
+        self,
+        flush_seconds: float = NOTICE_WRITER_FLUSH_SECONDS,
+        batch_size: int = NOTICE_WRITER_BATCH_SIZE,
+        queue_size: int = NOTICE_WRITER_QUEUE_SIZE,
+        enqueue_timeout: float = NOTICE_WRITER_ENQUEUE_TIMEOUT,
+    ) -> None:
+        self.app = None
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self.enqueue_timeout = enqueue_timeout
+        self.dropped = 0
+        self._queue = queue.Queue(queue_size)
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def enqueue(self, user_id: str, subject: str, content: str, module: str) -> bool:
+        """Queue a notice, returns False when it had to be dropped.
+
+        An interval of 0 writes the notice at once, in the calling thread.
+        """
+
+        now = generate_time()
+        notice = {
+            "user_id": user_id,
+            "subject": subject,
+            "content": content,
+            "module": module,
+            "status": False,
+            "create_at": now,
+            "update_at": now,
+        }
+
+        with self._lock:
+            self._pending[user_id] += 1
+
+        if self.flush_seconds <= 0:
+            self.write([notice])
+            return True
+
+        self._ensure_flusher()
+        try:
+            # backpressure, wait a moment for room before shedding the notice
+            self._queue.put(notice, timeout=self.enqueue_timeout)
+        except queue.Full:
+            self._settle([notice])
+            with self._lock:
+                self.dropped += 1
+            NOTICE_DROPPED.inc()
+            return False
+
+        NOTICE_QUEUE_DEPTH.set(self._queue.qsize())
+        return True
+
+    def pending(self, user_id: str) -> int:
+        """Number of unread notices of a user not written yet."""
+
+        with self._lock:
+            return self._pending[user_id]
+
+    def write(self, notices: list) -> int:
+        """Write notices in one multi-row insert, returns the number written."""
+
+        notices = [notice for notice in notices if notice is not _STOP]
+        if not notices or self.app is None:
+            self._settle(notices)
+            return 0
+
+        with self.app.app_context():
+            try:
+                db.session.execute(insert(UserNotice), notices)
+                db.session.commit()
+            except SQLAlchemyError:
+                db.session.rollback()
+                self.app.logger.exception("Failed to write %s notices", len(notices))
+                return 0
+            finally:
+                self._settle(notices)
+
+        # open notification streams learn about the new unread notices
+        for notice in notices:
+            notice_broker.publish(
+                notice["user_id"],
+                "notice",
+                {
+                    "subject": notice["subject"],
+                    "content": notice["content"],
+                    "module": notice["module"],
+                    "delta": 1,
+                },
+            )
+
+        return len(notices)
+
+    def flush(self) -> int:
+        """Write every queued notice in the calling thread."""
+
+        written = 0
+        while True:
+            batch = self._take(block=False)
+            if not batch:
+                return written
+            written += self.write(batch)
+
+    def close(self) -> None:
+        """Stop the flusher after its current batch and write what is left."""
+
+        if self._thread is not None and self._thread.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=self.flush_seconds)
+                self._thread.join(self.flush_seconds + 1)
+            except queue.Full:
+                pass
+        self.flush()
+
+    def _settle(self, notices: list) -> None:
+        """Take notices that left the queue out of the pending counts."""
+
+        with self._lock:
+            self._pending.subtract(notice["user_id"] for notice in notices)
+            self._pending = +self._pending
+
+    def _take(self, block: bool = True) -> list:
+        """Take the next batch off the queue, a stop mark ends the batch."""
+
+        batch = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            try:
+                if not block:
+                    notice = self._queue.get_nowait()
+                elif deadline is None:
+                    notice = self._queue.get()
+                    deadline = time.monotonic() + self.flush_seconds
+                else:
+                    notice = self._queue.get(
+                        timeout=max(deadline - time.monotonic(), 0)
+                    )
+            except queue.Empty:
+                break
+
+            batch.append(notice)
+            if notice is _STOP:
+                break
+
+        NOTICE_QUEUE_DEPTH.set(self._queue.qsize())
+        return batch
+
+    def _ensure_flusher(self) -> None:
+        """Start the flusher thread, again in a forked worker."""
+
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="notice-writer", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take()
+            self.write(batch)
+            if batch and batch[-1] is _STOP:
+                return
+
+
+notice_writer = NoticeWriter()
+atexit.register(notice_writer.close)
+
+
+def init_notice_writer(app: Flask) -> None:
+    """Bind the notice writer to the app and its config."""
+
+    # notices queued for a previous app of the process belong to it
+    if notice_writer.app is not None and notice_writer.app is not app:
+        notice_writer.flush()
+
+    notice_writer.app = app
+    notice_writer.flush_seconds = app.config.get(
+        "NOTICE_WRITER_FLUSH_SECONDS", NOTICE_WRITER_FLUSH_SECONDS
+    )
+    notice_writer.batch_size = app.config.get(
+        "NOTICE_WRITER_BATCH_SIZE", NOTICE_WRITER_BATCH_SIZE
+    )
+    notice_writer.enqueue_timeout = app.config.get(
+        "NOTICE_WRITER_ENQUEUE_TIMEOUT", NOTICE_WRITER_ENQUEUE_TIMEOUT
+    )
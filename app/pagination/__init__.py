@@ -0,0 +1,150 @@
+"""Keyset (cursor) pagination, an opt-in alternative to page numbers.
+
+A page is read by seeking past the sort key and id of the last row of the
+previous page instead of counting and skipping every earlier row, so reading
+page 1000 costs the same as reading page 1. The cursor is an opaque URL-safe
+token of those last values. Counting the total is optional, as it is the part
+that still grows with the table.
+"""
+
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import Select, and_, func, literal, or_, select, tuple_
+
+from app.extensions import db
+
+
+class InvalidCursorError(ValueError):
+    """The cursor could not be decoded for the requested sort."""
+
+
+@dataclass
+class CursorPagination:
+    """A page read with a cursor, in place of a Flask-SQLAlchemy Pagination."""
+
+    items: list
+    per_page: int
+    next_cursor: str = None
+    total: int = None
+
+    @property
+    def has_next(self) -> bool:
+        """Whether another page follows this one."""
+
+        return self.next_cursor is not None
+
+    @property
+    def page_info(self) -> dict:
+        """Return the pagination details of the page."""
+
+        return {
+            "per_page": self.per_page,
+            "next_cursor": self.next_cursor,
+            "has_next": self.has_next,
+            "total_items": self.total,
+        }
+
+
+def encode_cursor(values: list) -> str:
+    """Encode the sort values of a row into a cursor."""
+
+    payload = json.dumps(
+        [
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in values
+        ],
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: list) -> list:
+    """Decode a cursor into the sort values of the keys it was made for."""
+
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(payload)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as error:
+        raise InvalidCursorError("invalid cursor") from error
+
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise InvalidCursorError("invalid cursor")
+
+    try:
+        return [
+            (
+                datetime.fromisoformat(value)
+                if key.type.python_type is datetime
+                else key.type.python_type(value)
+            )
+            for (key, _), value in zip(keys, values)
+        ]
+    except (TypeError, ValueError) as error:
+        raise InvalidCursorError("invalid cursor") from error
+
+
+def _seek_condition(keys: list, values: list):
+    """Build the condition of the rows after the given values, in sort order."""
+
+    # bound as parameters, booleans can not be compared as python literals
+    values = [literal(value, key.type) for (key, _), value in zip(keys, values)]
+
+    # a single row value comparison can seek an index when every key has the
+    # same direction, mixed directions need the expanded form
+    if len({descending for _, descending in keys}) == 1:
+        row, last = tuple_(*[key for key, _ in keys]), tuple_(*values)
+        return row < last if keys[0][1] else row > last
+
+    conditions = []
+    for index, (key, descending) in enumerate(keys):
+        equal = [keys[i][0] == values[i] for i in range(index)]
+        conditions.append(
+            and_(*equal, key < values[index] if descending else key > values[index])
+        )
+    return or_(*conditions)
+
+
+def order_by_keys(query: Select, keys: list) -> Select:
+    """Order a query by its sort keys, (expression, descending) pairs."""
+
+    return query.order_by(
+        *[key.desc() if descending else key for key, descending in keys]
+    )
+
+
+def cursor_paginate(
+    query: Select, keys: list, cursor: str = "", per_page: int = 10, count: bool = False
+) -> CursorPagination:
+    """Read the page of an unordered query after a cursor, "" for the first page.
+
+    The keys are (expression, descending) pairs and must end with a unique
+    column, e.g. the id, so that every row has its own position.
+    """
+
+    total = None
+    if count:
+        total = db.session.scalar(
+            select(func.count()).select_from(query.order_by(None).subquery())
+        )
+
+    if cursor:
+        query = query.where(_seek_condition(keys, decode_cursor(cursor, keys)))
+
+    # the sort values are read along with the items, one extra row tells if
+    # there is a next page without counting
+    rows = db.session.execute(
+        order_by_keys(
+            query.add_columns(*[key.label(None) for key, _ in keys]), keys
+        ).limit(per_page + 1)
+    ).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(list(rows[-1][1:]))
+
+    return CursorPagination([row[0] for row in rows], per_page, next_cursor, total)
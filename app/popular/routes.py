@@ -3,8 +3,7 @@
 from flask import render_template
 from flask_login import login_required
 
-from app.popular.service import (top_community_service, top_replied_service,
-                                 top_viewed_service)
+from app.popular.service import leaderboards_service
 
 from . import popular_bp
 
@@ -14,18 +13,12 @@ from . import popular_bp
 def popular():
     """Render the popular page."""
 
-    # top replied data
-    top_replied = top_replied_service()
-
-    # top viewed data
-    top_viewed = top_viewed_service()
-
-    # top community data
-    top_community = top_community_service()
+    # top replied, viewed and community data, in one query
+    leaderboards = leaderboards_service()
 
     return render_template(
         "popular.html",
-        topReplies=top_replied,
-        topViews=top_viewed,
-        topCommunities=top_community,
+        topReplies=leaderboards["replied"],
+        topViews=leaderboards["viewed"],
+        topCommunities=leaderboards["community"],
     )
@@ -1,104 +1,110 @@
 """This module contains the service functions for the popular blueprint."""
 
-from sqlalchemy import func
-
-from app.constants import TOP_COMMUNITY_NUM, TOP_DATA_NUM
+from sqlalchemy import func, literal, select, union_all
+
+from app.cache import cached
+from app.constants import (
+    POPULAR_CACHE_TTL,
+    TOP_COMMUNITY_NUM,
+    TOP_DATA_NUM,
+    CacheNamespaceEnum,
+)
 from app.extensions import db
-from app.models import Category, Community, Reply, Request, UserRecord
+from app.models import Category, Community, Reply, Request, User, UserRecord
 
 
-def top_replied_service():
-    """Return the top replied requests."""
+def _top_requests_query(board: str, counted_model: db.Model, limit: int):
+    """Build the leaderboard of requests by number of rows of a counted model."""
 
     # pylint: disable=not-callable
-    top_replied = (
-        db.session.query(
-            Reply.request_id, func.count(Reply.request_id).label("reply_count")
+    total = func.count(counted_model.id)
+    return (
+        select(
+            literal(board).label("board"),
+            Request.id.label("id"),
+            Request.title.label("name"),
+            User.username.label("label"),
+            total.label("total"),
         )
-        .group_by(Reply.request_id)
-        .order_by(func.count(Reply.request_id).desc())
-        .limit(TOP_DATA_NUM)
-        .all()
+        .join(counted_model, counted_model.request_id == Request.id)
+        .join(User, User.id == Request.author_id)
+        .group_by(Request.id, Request.title, User.username)
+        .order_by(total.desc(), Request.id.desc())
+        .limit(limit)
     )
 
-    # Get the request details for each top replied request
-    top_replied_info = []
-    for reply in top_replied:
-        request = Request.query.get(reply.request_id)
-        if request:
-            top_replied_info.append(
-                {
-                    "id": request.id,
-                    "username": request.author.username,
-                    "title": request.title,
-                }
-            )
-
-    return top_replied_info
-
 
-def top_viewed_service():
-    """Return the top viewed requests."""
+def _top_communities_query(limit: int):
+    """Build the leaderboard of communities by number of requests."""
 
     # pylint: disable=not-callable
-    top_viewed = (
-        db.session.query(
-            UserRecord.request_id, func.count(UserRecord.request_id).label("view_count")
+    total = func.count(Request.id)
+    return (
+        select(
+            literal("community").label("board"),
+            Community.id.label("id"),
+            Community.name.label("name"),
+            func.coalesce(Category.name, "Unknown").label("label"),
+            total.label("total"),
         )
-        .group_by(UserRecord.request_id)
-        .order_by(func.count(UserRecord.request_id).desc())
-        .limit(TOP_DATA_NUM)
-        .all()
+        .join(Request, Request.community_id == Community.id)
+        .outerjoin(Category, Category.id == Community.category_id)
+        .group_by(Community.id, Community.name, Category.name)
+        .order_by(total.desc(), Community.id.desc())
+        .limit(limit)
     )
 
-    # Get the request details for each top viewed request
-    top_viewed_info = []
-    for record in top_viewed:
-        request = Request.query.get(record.request_id)
-        if request:
-            top_viewed_info.append(
-                {
-                    "id": request.id,
-                    "username": request.author.username,
-                    "title": request.title,
-                }
+
+def query_leaderboards() -> dict:
+    """Compute the replied, viewed and community leaderboards in one round trip."""
+
+    boards = union_all(
+        *[
+            select(query.subquery())
+            for query in (
+                _top_requests_query("replied", Reply, TOP_DATA_NUM),
+                _top_requests_query("viewed", UserRecord, TOP_DATA_NUM),
+                _top_communities_query(TOP_COMMUNITY_NUM),
             )
+        ]
+    ).subquery()
+    rows = db.session.execute(
+        select(boards).order_by(
+            boards.c.board, boards.c.total.desc(), boards.c.id.desc()
+        )
+    ).all()
 
-    return top_viewed_info
+    leaderboards = {"replied": [], "viewed": [], "community": []}
+    for row in rows:
+        if row.board == "community":
+            item = {"id": row.id, "community": row.name, "category": row.label}
+        else:
+            item = {"id": row.id, "username": row.label, "title": row.name}
+        leaderboards[row.board].append(item)
 
+    return leaderboards
 
-def top_community_service():
-    """Return the top communities"""
 
-    # pylint: disable=not-callable
-    top_community = (
-        db.session.query(
-            Request.community_id, func.count(Request.id).label("request_count")
-        )
-        .group_by(Request.community_id)
-        .order_by(func.count(Request.id).desc())
-        .limit(TOP_COMMUNITY_NUM)
-        .all()
-    )
+@cached(CacheNamespaceEnum.LEADERBOARDS, ttl=POPULAR_CACHE_TTL)
+def leaderboards_service() -> dict:
+    """Return the leaderboards, cached for the trending job interval."""
 
-    community_category = db.session.query(Category).all()
-    community_category_dict = {
-        category.id: category.name for category in community_category
-    }
-
-    # Get the community details for each top community
-    top_community_info = []
-    for request in top_community:
-        community = Community.query.get(request.community_id)
-        if community:
-            top_community_info.append(
-                {
-                    "id": community.id,
-                    "community": community.name,
-                    "category": community_category_dict.get(
-                        community.category_id, "Unknown"
-                    ),
-                }
-            )
+    return query_leaderboards()
+
+
+def top_replied_service():
+    """Return the top replied requests."""
+
+    return leaderboards_service()["replied"]
+
+
+def top_viewed_service():
+    """Return the top viewed requests."""
+
+    return leaderboards_service()["viewed"]
+
+
+def top_community_service():
+    """Return the top communities"""
 
-    return top_community_info
+    return leaderboards_service()["community"]
@@ -9,9 +9,9 @@ from app.models.reply import Reply
 from app.models.request import Request
 from app.models.tag import Tag
 from app.models.user_like import UserLike
-from app.models.user_record import UserRecord
 from app.models.user_save import UserSave
 from app.post import post_bp
+from app.view_buffer import record_view
 
 
 @post_bp.route("/create/post", methods=["GET"])
@@ -97,11 +97,8 @@ def post_detail(post_id: int):
 
     user_id: str = current_user.id
 
-    new_record = UserRecord(user_id=user_id, request_id=post_id)
-
-    db.session.add(new_record)
-    request_item.view_num += 1
-    db.session.commit()
+    # the view is written behind, the page stays read-only
+    record_view(user_id, post_id)
 
     # for likes and saves
 
@@ -179,7 +179,8 @@ async function deletePost(postId) {
     post_id: postId,
   };
   const response = await deleteFetch(postUrl)(data)();
-  if (response.code == 200) {
+  // large posts are accepted and purged in the background
+  if (response.code == 200 || response.code == 202) {
     window.location.href = "/";
   } else {
     alert(response.message);
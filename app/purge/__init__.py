@@ -0,0 +1,300 @@
+"""Set-based deletes of posts and reply threads.
+
+The rows depending on a post or a reply thread are removed by DELETE ... WHERE
+statements instead of being loaded and deleted one ORM object at a time. Bulk
+deletes skip the mapper events, so the counters, search documents and trending
+rows those events maintain are updated here, in the same transaction.
+
+Posts with very many dependent rows are purged by a background worker in
+batches. Such a post is marked deleted first, which hides it from every ORM
+query and makes a second delete of it a no-op. A purge that stalls, e.g. lost
+in a restart, is picked up again by the purge job.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from flask import Flask
+from sqlalchemy import delete, event, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import ORMExecuteState, Session, with_loader_criteria
+
+from app.cache import invalidate_cache
+from app.constants import PURGE_BATCH_SIZE, PURGE_RETRY_SECONDS, CacheNamespaceEnum
+from app.counter import COUNTED_MODELS, discount_rows
+from app.extensions import db
+from app.models.reply import Reply
+from app.models.request import Request
+from app.models.search_document import SearchEntityEnum
+from app.models.trending import Trending
+from app.models.trending_bucket import TrendingBucket
+from app.models.user_like import UserLike
+from app.models.user_record import UserRecord
+from app.models.user_save import UserSave
+from app.search.index import remove_documents
+from app.utils import generate_time
+
+# one worker, background purges run one after the other
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="purge")
+
+
+def _hide_deleted_posts_listener(execute_state: ORMExecuteState) -> None:
+    """Leave the posts marked deleted out of the ORM selects.
+
+    A select with the include_deleted execution option sees them too.
+    """
+
+    if (
+        execute_state.is_select
+        and not execute_state.is_column_load
+        and not execute_state.is_relationship_load
+        and not execute_state.execution_options.get("include_deleted", False)
+    ):
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(
+                Request, Request.delete_at.is_(None), include_aliases=True
+            )
+        )
+
+
+event.listen(Session, "do_orm_execute", _hide_deleted_posts_listener)
+
+
+def reply_thread_ids(reply_id: int):
+    """Select the ids of a reply and of every reply below it, at any depth."""
+
+    thread = (
+        select(Reply.id).where(Reply.id == reply_id).cte("reply_thread", recursive=True)
+    )
+    thread = thread.union_all(select(Reply.id).where(Reply.reply_id == thread.c.id))
+    return select(thread.c.id)
+
+
+def _delete_rows(model: db.Model, condition, batch_size: int = None, renew=None) -> int:
+    """Delete the rows of a model matching a condition, counters included.
+
+    With a batch size, rows are deleted and committed batch by batch, so no
+    single transaction holds the locks of every row, and renew is called with
+    each commit. Returns the rows deleted.
+    """
+
+    table = model.__table__
+    deleted = 0
+    while True:
+        connection = db.session.connection()
+        batch = condition
+        if batch_size:
+            ids = connection.scalars(
+                select(table.c.id).where(condition).limit(batch_size)
+            ).all()
+            batch = table.c.id.in_(ids)
+
+        if model in COUNTED_MODELS:
+            discount_rows(connection, model, batch)
+        rowcount = connection.execute(delete(table).where(batch)).rowcount
+        deleted += rowcount
+
+        if not batch_size or rowcount < batch_size:
+            return deleted
+        if renew is not None:
+            renew()
+        db.session.commit()
+
+
+def _delete_post_listings(post_id: int) -> None:
+    """Delete the trending rows and search documents of a post and its replies."""
+
+    connection = db.session.connection()
+    for model in (TrendingBucket, Trending):
+        connection.execute(delete(model.__table__).where(model.request_id == post_id))
+
+    remove_documents(
+        connection,
+        SearchEntityEnum.REPLY.value,
+        select(Reply.id).where(Reply.request_id == post_id),
+    )
+    remove_documents(connection, SearchEntityEnum.REQUEST.value, [post_id])
+
+
+def _mark_post_deleted(post_id: int, marked_before=None) -> bool:
+    """Mark a post deleted now, only if unmarked or marked before the given time.
+
+    Returns whether this call marked it, so one caller wins a concurrent mark.
+    """
+
+    condition = (
+        Request.delete_at.is_(None)
+        if marked_before is None
+        else Request.delete_at < marked_before
+    )
+    return bool(
+        db.session.connection()
+        .execute(
+            update(Request.__table__)
+            .where(Request.id == post_id, condition)
+            .values(delete_at=generate_time())
+        )
+        .rowcount
+    )
+
+
+def hide_post(post_id: int) -> bool:
+    """Mark a post deleted and drop its listings, before purging it later.
+
+    Returns False when the post does not exist or is already marked.
+    """
+
+    if not _mark_post_deleted(post_id):
+        # the update matched nothing, end its write transaction all the same
+        db.session.rollback()
+        return False
+
+    _delete_post_listings(post_id)
+    db.session.commit()
+    return True
+
+
+def purge_post(post_id: int, batch_size: int = None) -> bool:
+    """Delete a post with its replies, views, likes, saves and trending rows.
+
+    In batches, the mark of a post marked deleted is renewed with each commit,
+    so the purge job does not take it over. Returns False when the post does
+    not exist.
+    """
+
+    # locked until the post goes, a concurrent view flush waits and drops its views
+    post_exists = select(Request.id).where(Request.id == post_id).with_for_update()
+    if db.session.scalar(post_exists.execution_options(include_deleted=True)) is None:
+        return False
+
+    def renew() -> None:
+        db.session.connection().execute(
+            update(Request.__table__)
+            .where(Request.id == post_id, Request.delete_at.is_not(None))
+            .values(delete_at=generate_time())
+        )
+
+    for model in (UserRecord, UserLike, UserSave):
+        _delete_rows(model, model.request_id == post_id, batch_size, renew)
+
+    _delete_post_listings(post_id)
+
+    # replies reference each other, they go in one statement
+    _delete_rows(Reply, Reply.request_id == post_id)
+    _delete_rows(Request, Request.id == post_id)
+
+    # the session may still hold the deleted rows
+    db.session.commit()
+    db.session.expire_all()
+
+    return True
+
+
+def purge_reply_thread(reply_id: int) -> int:
+    """Delete a reply and its whole thread of child replies.
+
+    The reply number of the post drops in the same transaction. Returns the
+    number of replies deleted, 0 when the reply does not exist.
+    """
+
+    request_id = db.session.scalar(select(Reply.request_id).where(Reply.id == reply_id))
+    if request_id is None:
+        return 0
+
+    thread_ids = reply_thread_ids(reply_id)
+    for model in (UserLike, UserSave):
+        _delete_rows(model, model.reply_id.in_(thread_ids))
+
+    connection = db.session.connection()
+    remove_documents(connection, SearchEntityEnum.REPLY.value, thread_ids)
+    reply_num = discount_rows(connection, Reply, Reply.id.in_(thread_ids))
+    connection.execute(
+        update(Request.__table__)
+        .where(Request.id == request_id)
+        .values(reply_num=Request.reply_num - reply_num)
+    )
+    connection.execute(delete(Reply.__table__).where(Reply.id.in_(thread_ids)))
+
+    db.session.commit()
+    db.session.expire_all()
+
+    return reply_num
+
+
+def count_post_rows(post: Request) -> int:
+    """Estimate the dependent rows of a post from its denormalized counters."""
+
+    return sum(
+        (getattr(post, counter) or 0)
+        for counter in ("reply_num", "view_num", "like_num", "save_num")
+    )
+
+
+def _invalidate_widgets() -> None:
+    """Invalidate the cached widgets a purged post may appear in."""
+
+    invalidate_cache(
+        CacheNamespaceEnum.STATS,
+        CacheNamespaceEnum.POPULARS,
+        CacheNamespaceEnum.LEADERBOARDS,
+    )
+
+
+def _run_post_purge(app: Flask, post_id: int) -> None:
+    """Purge a post in batches, inside an app context of the worker thread."""
+
+    with app.app_context():
+        try:
+            purge_post(post_id, app.config.get("PURGE_BATCH_SIZE", PURGE_BATCH_SIZE))
+        except SQLAlchemyError:
+            # the post stays marked, the purge job runs it again
+            db.session.rollback()
+            app.logger.exception("Background purge of post %s failed", post_id)
+            return
+
+        _invalidate_widgets()
+        app.logger.info("Background purge of post %s done", post_id)
+
+
+def schedule_post_purge(app: Flask, post_id: int):
+    """Hide a post and purge it in the background, in an app context.
+
+    Returns the future of the purge, None when the post is already scheduled.
+    """
+
+    if not hide_post(post_id):
+        return None
+
+    _invalidate_widgets()
+    return _executor.submit(_run_post_purge, app, post_id)
+
+
+def retry_post_purges(
+    batch_size: int = PURGE_BATCH_SIZE, retry_seconds: int = PURGE_RETRY_SECONDS
+) -> int:
+    """Purge the posts marked deleted whose purge stalled for retry_seconds.
+
+    A post is taken over by renewing its mark, so a purge still running or run
+    by another process is left alone. Returns the number of posts purged.
+    """
+
+    stale_before = generate_time() - timedelta(seconds=retry_seconds)
+    post_ids = db.session.scalars(
+        select(Request.id)
+        .where(Request.delete_at < stale_before)
+        .execution_options(include_deleted=True)
+    ).all()
+
+    purged = 0
+    for post_id in post_ids:
+        if not _mark_post_deleted(post_id, stale_before):
+            db.session.rollback()
+            continue
+        db.session.commit()
+
+        purge_post(post_id, batch_size)
+        purged += 1
+
+    if purged:
+        _invalidate_widgets()
+    return purged
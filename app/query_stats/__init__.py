@@ -0,0 +1,175 @@
+"""Per-request SQL statistics, with repeated statement detection.
+
+Engine events time every statement a request runs. A request counts its
+statements, sums their database time and groups them by fingerprint, the
+statement with its literals, bound parameter placeholders and IN lists
+normalized. A fingerprint seen many
+times in one request usually is an N+1 pattern, e.g. a lazy relationship loaded
+once per row of a list. The totals go to a Server-Timing header and to the
+access record, with the most repeated fingerprints. A query budget, set in the
+config or around a block of a test, turns a request over the budget into an
+error.
+"""
+
+import contextvars
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import Flask, Response, current_app, g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.access_log import add_access_log_fields
+from app.constants import (
+    QUERY_STATS_FINGERPRINT_MAX_LENGTH,
+    QUERY_STATS_REPEAT_LOG_NUM,
+    QUERY_STATS_REPEAT_THRESHOLD,
+)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+# pyformat, format, numeric and named placeholders, a :: cast is left alone
+_PARAMETER = re.compile(r"%\([^)]*\)s|%s|\$\d+|(?<![:\w]):\w+")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+# budget of the requests made inside a query_budget() block
+_query_budget = contextvars.ContextVar("query_budget", default=None)
+
+
+class QueryBudgetError(AssertionError):
+    """A request ran more statements than its query budget."""
+
+
+def fingerprint(statement: str) -> str:
+    """Normalize a statement, the same query gets the same fingerprint."""
+
+    statement = _STRING.sub("?", statement)
+    statement = _PARAMETER.sub("?", statement)
+    statement = _NUMBER.sub("?", statement)
+    statement = _IN_LIST.sub("(?)", statement)
+    statement = _SPACE.sub(" ", statement).strip()
+    return statement[:QUERY_STATS_FINGERPRINT_MAX_LENGTH]
+
+
+class QueryStats:
+    """Statements run by a request."""
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.seconds = 0.0
+        self.fingerprints = Counter()
+
+    def record(self, statement: str, seconds: float) -> None:
+        """Count a statement and its database time."""
+
+        self.queries += 1
+        self.seconds += seconds
+        self.fingerprints[fingerprint(statement)] += 1
+
+    @property
+    def milliseconds(self) -> float:
+        """Database time of the statements, in milliseconds."""
+
+        return round(self.seconds * 1000, 2)
+
+    def repeated(self, threshold: int = QUERY_STATS_REPEAT_THRESHOLD) -> list:
+        """Fingerprints run at least threshold times, most repeated first."""
+
+        return [
+            (statement, count)
+            for statement, count in self.fingerprints.most_common()
+            if count >= threshold
+        ]
+
+    def server_timing(self) -> str:
+        """The Server-Timing metric of the database time."""
+
+        return f'db;dur={self.milliseconds};desc="{self.queries} queries"'
+
+
+def current_query_stats() -> QueryStats:
+    """Statistics of the current request, None outside requests."""
+
+    if not has_request_context():
+        return None
+    return g.get("query_stats")
+
+
+# pylint: disable=too-many-arguments
+def _before_cursor_execute(_conn, _cursor, _statement, _parameters, context, _many):
+    if context is not None:
+        context.query_stats_start = time.perf_counter()
+
+
+def _after_cursor_execute(_conn, _cursor, statement, _parameters, context, _many):
+    start = getattr(context, "query_stats_start", None)
+    if start is None:
+        return
+
+    # background threads run in their own app context, without statistics
+    stats = current_query_stats()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - start)
+
+
+@contextmanager
+def query_budget(max_queries: int):
+    """Fail the requests made in the block that run more than max_queries."""
+
+    token = _query_budget.set(max_queries)
+    try:
+        yield
+    finally:
+        _query_budget.reset(token)
+
+
+def register_query_stats(app: Flask) -> None:
+    """Register the hooks collecting and reporting per-request SQL statistics.
+
+    The statistics are reported before the access record is written, so this
+    has to be registered after the access log.
+    """
+
+    # every engine of the process, once
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    threshold = app.config.get(
+        "QUERY_STATS_REPEAT_THRESHOLD", QUERY_STATS_REPEAT_THRESHOLD
+    )
+
+    @app.before_request
+    def start_query_stats():
+        g.query_stats = QueryStats()
+
+    @app.after_request
+    def report_query_stats(response: Response) -> Response:
+        stats = g.pop("query_stats", None)
+        if stats is None:
+            return response
+
+        response.headers.add("Server-Timing", stats.server_timing())
+
+        fields = {"db_queries": stats.queries, "db_ms": stats.milliseconds}
+        repeated = stats.repeated(threshold)
+        if repeated:
+            fields["db_repeated"] = [
+                {"statement": statement, "count": count}
+                for statement, count in repeated[:QUERY_STATS_REPEAT_LOG_NUM]
+            ]
+        add_access_log_fields(**fields)
+
+        budget = _query_budget.get()
+        if budget is None:
+            budget = current_app.config.get("QUERY_BUDGET")
+        if budget is not None and stats.queries > budget:
+            raise QueryBudgetError(
+                f"{stats.queries} queries, over the budget of {budget}, "
+                f"most repeated: {stats.fingerprints.most_common(1)}"
+            )
+
+        return response
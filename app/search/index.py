@@ -0,0 +1,453 @@
+"""Inverted search index over communities, requests and replies.
+
+Every searchable row has a search document, kept up to date in the same
+transaction as the row itself by mapper events. On PostgreSQL documents are
+matched through a GIN-indexed tsvector, elsewhere through the search term table,
+an inverted index filled by the tokenizer below.
+"""
+
+import re
+import unicodedata
+from collections import Counter
+
+from sqlalchemy import (
+    and_,
+    case,
+    delete,
+    distinct,
+    event,
+    func,
+    insert,
+    inspect,
+    null,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql import Select
+
+from app.constants import (
+    SEARCH_FIELD_WEIGHT,
+    SEARCH_MAX_TERMS,
+    SEARCH_REINDEX_BATCH_SIZE,
+)
+from app.extensions import db
+from app.models.community import Community
+from app.models.reply import Reply
+from app.models.request import Request
+from app.models.search_document import (
+    SEARCH_CONFIG,
+    SearchDocument,
+    SearchEntityEnum,
+)
+from app.models.search_term import SearchTerm
+from app.models.user import User
+
+_TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+_MAX_TERM_LENGTH = 64
+
+_STOP_WORDS = frozenset(
+    "a an and are as at be but by for from has have i in is it its of on or so "
+    "that the this to was were will with".split()
+)
+
+# indexed model -> (entity type, attributes that feed its search document)
+INDEXED_MODELS = {
+    Community: (SearchEntityEnum.COMMUNITY.value, ("name", "description")),
+    Request: (SearchEntityEnum.REQUEST.value, ("title", "content")),
+    Reply: (SearchEntityEnum.REPLY.value, ("content",)),
+}
+
+
+def tokenize(text: str) -> list:
+    """Split a text into normalized search terms, stop words removed."""
+
+    if not text:
+        return []
+
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return [
+        token
+        for token in _TOKEN_PATTERN.findall(text)
+        if token not in _STOP_WORDS and len(token) <= _MAX_TERM_LENGTH
+    ]
+
+
+def query_terms(keyword: str) -> list:
+    """Get the distinct search terms of a query, in query order."""
+
+    return list(dict.fromkeys(tokenize(keyword)))[:SEARCH_MAX_TERMS]
+
+
+def _use_tsvector(connection: Connection) -> bool:
+    """Whether the database matches documents with its own tsvector index."""
+
+    return connection.dialect.name == "postgresql"
+
+
+def _term_weights(values: dict) -> dict:
+    """Get the weight of every term of a search document."""
+
+    weights = Counter()
+    for field, weight in SEARCH_FIELD_WEIGHT.items():
+        for term in tokenize(values.get(field)):
+            weights[term] += weight
+
+    return weights
+
+
+def _write_terms(connection: Connection, entity_type: str, documents: list) -> None:
+    """Replace the search terms of documents, given as (entity id, values) pairs."""
+
+    if _use_tsvector(connection) or not documents:
+        return
+
+    term_table = SearchTerm.__table__
+    connection.execute(
+        delete(term_table).where(
+            term_table.c.entity_type == entity_type,
+            term_table.c.entity_id.in_([entity_id for entity_id, _ in documents]),
+        )
+    )
+
+    rows = [
+        {
+            "entity_type": entity_type,
+            "term": term,
+            "entity_id": entity_id,
+            "weight": weight,
+        }
+        for entity_id, values in documents
+        for term, weight in _term_weights(values).items()
+    ]
+    if rows:
+        connection.execute(insert(term_table), rows)
+
+
+def _username(connection: Connection, user_id: str) -> str:
+    """Get the username of a user within the current transaction."""
+
+    if not user_id:
+        return None
+
+    user_table = User.__table__
+    return connection.execute(
+        select(user_table.c.username).where(user_table.c.id == user_id)
+    ).scalar()
+
+
+def _document_values(connection: Connection, target: db.Model) -> dict:
+    """Build the search document columns of an indexed row."""
+
+    if isinstance(target, Community):
+        return {
+            "parent_id": None,
+            "author_id": target.creator_id,
+            "title": target.name,
+            "content": target.description,
+            "author": _username(connection, target.creator_id),
+        }
+
+    if isinstance(target, Request):
+        return {
+            "parent_id": None,
+            "author_id": target.author_id,
+            "title": target.title,
+            "content": target.content,
+            "author": _username(connection, target.author_id),
+        }
+
+    request_table = Request.__table__
+    request_title = connection.execute(
+        select(request_table.c.title).where(request_table.c.id == target.request_id)
+    ).scalar()
+    return {
+        "parent_id": target.request_id,
+        "author_id": target.replier_id,
+        "title": request_title,
+        "content": target.content,
+        "author": _username(connection, target.replier_id),
+    }
+
+
+def index_document(
+    connection: Connection, entity_type: str, entity_id: int, values: dict
+) -> None:
+    """Insert or replace the search document of a row in the current transaction."""
+
+    document_table = SearchDocument.__table__
+    result = connection.execute(
+        update(document_table)
+        .where(
+            document_table.c.entity_type == entity_type,
+            document_table.c.entity_id == entity_id,
+        )
+        .values(values)
+    )
+    if result.rowcount == 0:
+        connection.execute(
+            insert(document_table).values(
+                entity_type=entity_type, entity_id=entity_id, **values
+            )
+        )
+
+    _write_terms(connection, entity_type, [(entity_id, values)])
+
+
+def remove_documents(connection: Connection, entity_type: str, entity_ids) -> None:
+    """Remove the search documents of deleted rows in the current transaction.
+
+    The ids are a list, or a select of ids for bulk deletes.
+    """
+
+    document_table = SearchDocument.__table__
+    term_table = SearchTerm.__table__
+    if not isinstance(entity_ids, Select):
+        entity_ids = list(entity_ids)
+        if not entity_ids:
+            return
+
+    connection.execute(
+        delete(document_table).where(
+            document_table.c.entity_type == entity_type,
+            document_table.c.entity_id.in_(entity_ids),
+        )
+    )
+    connection.execute(
+        delete(term_table).where(
+            term_table.c.entity_type == entity_type,
+            term_table.c.entity_id.in_(entity_ids),
+        )
+    )
+
+
+def _refresh_documents(connection: Connection, condition, values: dict) -> None:
+    """Update a column shared by several documents, e.g. a renamed author."""
+
+    document_table = SearchDocument.__table__
+    connection.execute(update(document_table).where(condition).values(values))
+    if _use_tsvector(connection):
+        return
+
+    rows = (
+        connection.execute(
+            select(
+                document_table.c.entity_type,
+                document_table.c.entity_id,
+                document_table.c.title,
+                document_table.c.content,
+                document_table.c.author,
+            ).where(condition)
+        )
+        .mappings()
+        .all()
+    )
+
+    documents = {}
+    for row in rows:
+        documents.setdefault(row["entity_type"], []).append((row["entity_id"], row))
+
+    for entity_type, entity_documents in documents.items():
+        _write_terms(connection, entity_type, entity_documents)
+
+
+def _after_insert_listener(mapper, connection, target) -> None:
+    """Index an inserted row."""
+
+    entity_type, _ = INDEXED_MODELS[mapper.class_]
+    index_document(
+        connection, entity_type, target.id, _document_values(connection, target)
+    )
+
+
+def _after_update_listener(mapper, connection, target) -> None:
+    """Re-index an updated row when one of its searchable attributes changed."""
+
+    entity_type, attributes = INDEXED_MODELS[mapper.class_]
+    state = inspect(target)
+    if not any(state.attrs[name].history.has_changes() for name in attributes):
+        return
+
+    index_document(
+        connection, entity_type, target.id, _document_values(connection, target)
+    )
+
+    # replies carry the title of their request
+    if isinstance(target, Request) and state.attrs.title.history.has_changes():
+        document_table = SearchDocument.__table__
+        _refresh_documents(
+            connection,
+            and_(
+                document_table.c.entity_type == SearchEntityEnum.REPLY.value,
+                document_table.c.parent_id == target.id,
+            ),
+            {"title": target.title},
+        )
+
+
+def _after_delete_listener(mapper, connection, target) -> None:
+    """Drop the search document of a deleted row."""
+
+    entity_type, _ = INDEXED_MODELS[mapper.class_]
+    remove_documents(connection, entity_type, [target.id])
+
+
+def _after_user_update_listener(_, connection, target) -> None:
+    """Follow a username change into the documents the user authored."""
+
+    if not inspect(target).attrs.username.history.has_changes():
+        return
+
+    document_table = SearchDocument.__table__
+    _refresh_documents(
+        connection,
+        document_table.c.author_id == target.id,
+        {"author": target.username},
+    )
+
+
+for indexed_model in INDEXED_MODELS:
+    event.listen(indexed_model, "after_insert", _after_insert_listener)
+    event.listen(indexed_model, "after_update", _after_update_listener)
+    event.listen(indexed_model, "after_delete", _after_delete_listener)
+
+event.listen(User, "after_update", _after_user_update_listener)
+
+
+def search_documents(entity_type: str, terms: list, page: int, per_page: int):
+    """Find the documents of one entity type matching every term, best first.
+
+    Each term also matches as a prefix. Returns the page of documents and the
+    total number of matches, computed by the same single indexed query.
+    """
+
+    if not terms:
+        return [], 0
+
+    # pylint: disable=not-callable
+    if _use_tsvector(db.session.connection()):
+        tsquery = func.to_tsquery(
+            SEARCH_CONFIG, " & ".join(f"{term}:*" for term in terms)
+        )
+        vector = SearchDocument.search_vector()
+        score = func.ts_rank_cd(vector, tsquery)
+        statement = select(SearchDocument, func.count().over()).where(
+            SearchDocument.entity_type == entity_type, vector.op("@@")(tsquery)
+        )
+    else:
+        term_column = SearchTerm.term
+        prefixes = [
+            and_(term_column >= term, term_column < term + "\uffff") for term in terms
+        ]
+        matched_term = case(*[(prefix, index) for index, prefix in enumerate(prefixes)])
+        matches = (
+            select(SearchTerm.entity_id, func.sum(SearchTerm.weight).label("score"))
+            .where(SearchTerm.entity_type == entity_type, or_(*prefixes))
+            .group_by(SearchTerm.entity_id)
+            .having(func.count(distinct(matched_term)) == len(terms))
+            .subquery()
+        )
+        score = matches.c.score
+        statement = select(SearchDocument, func.count().over()).join(
+            matches,
+            and_(
+                SearchDocument.entity_type == entity_type,
+                SearchDocument.entity_id == matches.c.entity_id,
+            ),
+        )
+
+    rows = db.session.execute(
+        statement.order_by(score.desc(), SearchDocument.entity_id.desc())
+        .limit(per_page)
+        .offset((page - 1) * per_page)
+    ).all()
+
+    total = rows[0][1] if rows else 0
+    return [document for document, _ in rows], total
+
+
+def _document_rows(model: db.Model) -> Select:
+    """Select the search document columns of every row of an indexed model.
+
+    The author and the title of the parent request are joined in, the same
+    values _document_values reads one row at a time.
+    """
+
+    if model is Community:
+        return select(
+            Community.id.label("entity_id"),
+            null().label("parent_id"),
+            Community.creator_id.label("author_id"),
+            Community.name.label("title"),
+            Community.description.label("content"),
+            User.username.label("author"),
+        ).outerjoin(User, User.id == Community.creator_id)
+
+    if model is Request:
+        return select(
+            Request.id.label("entity_id"),
+            null().label("parent_id"),
+            Request.author_id.label("author_id"),
+            Request.title.label("title"),
+            Request.content.label("content"),
+            User.username.label("author"),
+        ).outerjoin(User, User.id == Request.author_id)
+
+    return (
+        select(
+            Reply.id.label("entity_id"),
+            Reply.request_id.label("parent_id"),
+            Reply.replier_id.label("author_id"),
+            Request.title.label("title"),
+            Reply.content.label("content"),
+            User.username.label("author"),
+        )
+        .join(Request, Request.id == Reply.request_id)
+        .outerjoin(User, User.id == Reply.replier_id)
+    )
+
+
+def rebuild_search_index(batch_size: int = SEARCH_REINDEX_BATCH_SIZE) -> int:
+    """Rebuild every search document from the source tables.
+
+    The rows are read batch by batch, each with its author and parent title in
+    the same query. Returns the number of documents indexed.
+    """
+
+    connection = db.session.connection()
+    connection.execute(delete(SearchTerm.__table__))
+    connection.execute(delete(SearchDocument.__table__))
+
+    indexed = 0
+    for model, (entity_type, _) in INDEXED_MODELS.items():
+        last_id = None
+        while True:
+            statement = _document_rows(model).order_by(model.id).limit(batch_size)
+            if last_id is not None:
+                statement = statement.where(model.id > last_id)
+            rows = db.session.execute(statement).mappings().all()
+            if not rows:
+                break
+
+            documents = [
+                (
+                    row["entity_id"],
+                    {key: value for key, value in row.items() if key != "entity_id"},
+                )
+                for row in rows
+            ]
+            connection.execute(
+                insert(SearchDocument.__table__),
+                [
+                    {"entity_type": entity_type, "entity_id": entity_id, **values}
+                    for entity_id, values in documents
+                ],
+            )
+            _write_terms(connection, entity_type, documents)
+            indexed += len(documents)
+            last_id = rows[-1]["entity_id"]
+
+    db.session.commit()
+    return indexed
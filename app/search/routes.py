@@ -1,9 +1,11 @@
 """This module contains the routes for the search blueprint."""
 
+import click
 from flask import render_template, request
 from flask_login import login_required
 
 from app.search import search_bp
+from app.search.index import rebuild_search_index
 from app.search.service import search_service
 
 
@@ -23,12 +25,13 @@ def search_result():
     if not keyword:
         return render_template("searchResult.html", total_results="no")
 
-    result = search_service(keyword)
+    page = request.args.get("page", 1, type=int)
+    result = search_service(keyword, max(page, 1))
 
     community_results = result.get("community")
     request_results = result.get("request")
     reply_results = result.get("reply")
-    total_results = len(community_results) + len(request_results) + len(reply_results)
+    total_results = sum(result.get("total").values())
 
     return render_template(
         "searchResult.html",
@@ -37,3 +40,11 @@ def search_result():
         request_results=request_results,
         reply_results=reply_results,
     )
+
+
+@search_bp.cli.command("reindex")
+def reindex():
+    """Rebuild the search index from the source tables."""
+
+    indexed = rebuild_search_index()
+    click.echo(f"Indexed {indexed} search documents.")
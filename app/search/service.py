@@ -1,154 +1,128 @@
 """Service for searching."""
 
-from sqlalchemy.orm import joinedload
+import re
+
+from markupsafe import Markup, escape
+
+from app.constants import SEARCH_PER_PAGE, SEARCH_SNIPPET_LENGTH
+from app.database import read_only
+from app.models.search_document import SearchEntityEnum
+from app.search.index import query_terms, search_documents
+
+# search document field -> result key, per entity type
+_RESULT_FIELDS = {
+    SearchEntityEnum.COMMUNITY.value: {
+        "title": "name",
+        "content": "description",
+        "author": "creator",
+    },
+    SearchEntityEnum.REQUEST.value: {
+        "title": "title",
+        "content": "content",
+        "author": "author",
+    },
+    SearchEntityEnum.REPLY.value: {
+        "title": "title",
+        "content": "content",
+        "author": "replier",
+    },
+}
+
+
+@read_only
+def search_service(
+    keyword: str = None, page: int = 1, per_page: int = SEARCH_PER_PAGE
+) -> dict:
+    """Service for searching communities, requests and replies by keyword.
+
+    Returns one ranked page of results per entity type, and the total number of
+    matches of each type under "total".
+    """
 
-from app.models.community import Community
-from app.models.reply import Reply
-from app.models.request import Request
-from app.models.user import User
+    if not keyword:
+        return None
 
+    terms = query_terms(keyword)
+    pattern = _match_pattern(terms)
 
-def search_service(keyword: str = None) -> dict:
-    """Service for searching requests by keyword."""
+    search_results = {"total": {}}
+    for entity in SearchEntityEnum:
+        documents, total = search_documents(entity.value, terms, page, per_page)
+        search_results[entity.value] = [
+            _search_result(document, pattern) for document in documents
+        ]
+        search_results["total"][entity.value] = total
 
-    if not keyword:
+    return search_results
+
+
+def _match_pattern(terms: list) -> re.Pattern:
+    """Compile a pattern matching the words that start with any of the terms."""
+
+    if not terms:
         return None
 
-    keyword = "%" + keyword + "%"
+    alternatives = "|".join(re.escape(term) for term in terms)
+    return re.compile(rf"\b(?:{alternatives})\w*", re.IGNORECASE)
 
-    search_results = {}
 
-    # community
-    community_results = community_search_result(keyword)
-    search_results["community"] = community_results
+def _search_result(document, pattern: re.Pattern) -> dict:
+    """Build a search result, the first matching field is the highlight."""
 
-    # request
-    request_results = request_search_result(keyword)
-    search_results["request"] = request_results
+    result_fields = _RESULT_FIELDS[document.entity_type]
 
-    # reply
-    reply_results = reply_search_result(keyword)
-    search_results["reply"] = reply_results
+    highlight = None
+    for field, key in result_fields.items():
+        if pattern.search(getattr(document, field) or ""):
+            highlight = key
+            break
 
-    return search_results
+    result = {
+        "id": document.entity_id,
+        "highlight": highlight,
+        result_fields["title"]: highlight_text(document.title, pattern),
+        result_fields["content"]: snippet_text(document.content, pattern),
+        result_fields["author"]: document.author,
+    }
+    if document.entity_type == SearchEntityEnum.REPLY.value:
+        result["request_id"] = document.parent_id
+
+    return result
+
+
+def highlight_text(text: str, pattern: re.Pattern) -> Markup:
+    """Escape a text and wrap every match in a mark tag."""
+
+    if not text:
+        return Markup("")
+
+    parts = []
+    last = 0
+    for match in pattern.finditer(text):
+        parts.append(escape(text[last : match.start()]))
+        parts.append(Markup("<mark>%s</mark>") % match.group())
+        last = match.end()
+    parts.append(escape(text[last:]))
+
+    return Markup("").join(parts)
+
+
+def snippet_text(
+    text: str, pattern: re.Pattern, length: int = SEARCH_SNIPPET_LENGTH
+) -> Markup:
+    """Cut a highlighted window of a text around its first match."""
+
+    if not text or len(text) <= length:
+        return highlight_text(text, pattern)
+
+    match = pattern.search(text)
+    start = max(0, match.start() - length // 4) if match else 0
+    end = min(len(text), start + length)
 
+    snippet = highlight_text(text[start:end], pattern)
+    if start > 0:
+        snippet = Markup("&hellip;") + snippet
+    if end < len(text):
+        snippet = snippet + Markup("&hellip;")
 
-def community_search_result(keyword: str = None) -> list:
-    """Service for searching community by keyword."""
-
-    # name
-    community_names = Community.query.filter(Community.name.like(keyword)).all()
-    community_name_result = [
-        {
-            "id": community.id,
-            "highlight": "name",
-            "name": community.name,
-            "description": community.description,
-            "creator": "tonglam",
-        }
-        for community in community_names
-    ]
-
-    # description
-    community_descriptions = Community.query.filter(
-        Community.description.like(keyword)
-    ).all()
-    community_description_result = [
-        {
-            "id": community.id,
-            "highlight": "description",
-            "name": community.name,
-            "description": community.description,
-            "creator": "tonglam",
-        }
-        for community in community_descriptions
-    ]
-
-    return community_name_result + community_description_result
-
-
-def request_search_result(keyword: str = None) -> list:
-    """Service for searching requests by keyword."""
-
-    # title
-    request_titles = Request.query.filter(Request.title.like(keyword)).all()
-    request_title_result = [
-        {
-            "id": request.id,
-            "highlight": "title",
-            "title": request.title,
-            "content": request.content,
-            "author": request.author.username,
-        }
-        for request in request_titles
-    ]
-
-    # content
-    request_contents = Request.query.filter(Request.content.like(keyword)).all()
-    request_content_result = [
-        {
-            "id": request.id,
-            "highlight": "content",
-            "title": request.title,
-            "content": request.content,
-            "author": request.author.username,
-        }
-        for request in request_contents
-    ]
-
-    # author
-    request_authors = (
-        Request.query.join(User, Request.author_id == User.id)
-        .filter(User.username.like(keyword))
-        .options(joinedload(Request.author))
-        .all()
-    )
-    request_author_result = [
-        {
-            "id": request.id,
-            "highlight": "author",
-            "title": request.title,
-            "content": request.content,
-            "author": request.author.username,
-        }
-        for request in request_authors
-    ]
-
-    return request_title_result + request_content_result + request_author_result
-
-
-def reply_search_result(keyword: str = None) -> list:
-    """Service for searching replies by keyword."""
-
-    # content
-    reply_contents = Reply.query.filter(Reply.content.like(keyword)).all()
-    reply_content_result = [
-        {
-            "id": reply.id,
-            "highlight": "content",
-            "title": reply.request.title,
-            "content": reply.content,
-            "replier": reply.replier.username,
-        }
-        for reply in reply_contents
-    ]
-
-    # replier
-    reply_repliers = (
-        Reply.query.join(User, Reply.replier_id == User.id)
-        .filter(User.username.like(keyword))
-        .options(joinedload(Reply.replier))
-        .all()
-    )
-    reply_replier_result = [
-        {
-            "id": reply.id,
-            "highlight": "replier",
-            "title": reply.request.title,
-            "content": reply.content,
-            "replier": reply.replier.username,
-        }
-        for reply in reply_repliers
-    ]
-
-    return reply_content_result + reply_replier_result
+    return snippet
@@ -1,14 +1,27 @@
 """Service for handling file uploads and deletions using Cloudflare R2 storage."""
 
+import io
 import os
+import random
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
 
 import requests
-from flask import current_app
+from flask import current_app, has_request_context
+from requests.adapters import HTTPAdapter
 from werkzeug.datastructures import FileStorage
 from werkzeug.utils import secure_filename
 
-from app.utils import get_config
+from app.access_log import add_access_log_fields
+from app.constants import (IMAGE_UPLOADED_KEYS_SIZE, R2_API_URL,
+                           R2_MAX_RETRIES, R2_POOL_SIZE,
+                           R2_RETRY_BACKOFF_MAX_SECONDS,
+                           R2_RETRY_BACKOFF_SECONDS, R2_RETRY_STATUSES,
+                           R2_TIMEOUT)
+from app.metrics import R2_RETRIES, R2_UPLOAD_BYTES, R2_UPLOAD_LATENCY
+from app.settings import CloudflareSettings, get_settings
 
 
 class R2UploadError(Exception):
@@ -19,8 +32,82 @@ class R2DeleteError(Exception):
     """Custom exception for R2 delete errors."""
 
 
+class R2Metrics:
+    """Counters of the R2 requests of the process."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.uploads = 0
+        self.upload_failures = 0
+        self.upload_bytes = 0
+        self.upload_seconds = 0.0
+        self.upload_seconds_max = 0.0
+        self.deletes = 0
+        self.delete_failures = 0
+        self.retries = 0
+        self.dedupes = 0
+
+    def record_upload(self, size: int, seconds: float, success: bool) -> None:
+        """Count an upload, its bytes and its latency."""
+
+        R2_UPLOAD_LATENCY.labels("success" if success else "failure").observe(seconds)
+        if success:
+            R2_UPLOAD_BYTES.inc(size)
+
+        with self._lock:
+            if not success:
+                self.upload_failures += 1
+                return
+            self.uploads += 1
+            self.upload_bytes += size
+            self.upload_seconds += seconds
+            self.upload_seconds_max = max(self.upload_seconds_max, seconds)
+
+    def record_delete(self, success: bool) -> None:
+        """Count a delete."""
+
+        with self._lock:
+            if success:
+                self.deletes += 1
+            else:
+                self.delete_failures += 1
+
+    def record_retry(self) -> None:
+        """Count a retried request."""
+
+        R2_RETRIES.inc()
+        with self._lock:
+            self.retries += 1
+
+    def record_dedupe(self) -> None:
+        """Count an upload skipped as the object was already uploaded."""
+
+        with self._lock:
+            self.dedupes += 1
+
+    def snapshot(self) -> dict:
+        """Return the current values of the counters."""
+
+        with self._lock:
+            return {
+                "uploads": self.uploads,
+                "upload_failures": self.upload_failures,
+                "upload_bytes": self.upload_bytes,
+                "upload_seconds": round(self.upload_seconds, 6),
+                "upload_seconds_max": round(self.upload_seconds_max, 6),
+                "deletes": self.deletes,
+                "delete_failures": self.delete_failures,
+                "retries": self.retries,
+                "dedupes": self.dedupes,
+            }
+
+
 class R2Service:
-    """Service class for managing file operations with Cloudflare R2 storage."""
+    """Service class for managing file operations with Cloudflare R2 storage.
+
+    One instance is shared by the process, see get_r2_service(), so that its
+    pooled session keeps connections to the API alive between uploads.
+    """
 
     # Maximum file size (10MB)
     MAX_FILE_SIZE = 10 * 1024 * 1024
@@ -28,27 +115,53 @@ class R2Service:
     # Allowed file types
     ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "webp", "svg"}
 
-    def __init__(self) -> None:
+    def __init__(
+        self, cloudflare: CloudflareSettings = None, api_url: str = R2_API_URL
+    ) -> None:
         """Initialize R2 service with Cloudflare credentials."""
-        self.account_id = get_config("CLOUDFLARE", "ACCOUNT_ID")
-        self.bucket = get_config("CLOUDFLARE", "R2_BUCKET_NAME")
-        self.token = get_config("CLOUDFLARE", "API_TOKEN")
-        self.public_url = get_config("CLOUDFLARE", "R2_PUBLIC_URL")
+        self.cloudflare = cloudflare or get_settings().cloudflare
+        self.account_id = self.cloudflare.account_id
+        self.bucket = self.cloudflare.bucket
+        self.token = self.cloudflare.api_token
+        self.public_url = self.cloudflare.public_url
+        self.api_url = api_url.rstrip("/")
+        self.metrics = R2Metrics()
+
+        # Keys of the objects uploaded by the process, least recent first
+        self._uploaded_keys = OrderedDict()
+        self._uploaded_lock = threading.Lock()
 
         # Validate configuration
         if not all([self.account_id, self.bucket, self.token, self.public_url]):
             current_app.logger.error("Missing required Cloudflare configuration")
             raise R2UploadError("Missing required Cloudflare configuration")
 
+        # Keep-alive connections, shared by the threads of the process
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=R2_POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["Authorization"] = f"Bearer {self.token}"
+
         current_app.logger.debug(f"Initialized R2Service with bucket: {self.bucket}")
 
-    def _validate_file(self, file: FileStorage) -> None:
+    def _object_url(self, key: str) -> str:
+        """Return the API URL of an object of the bucket."""
+        return (
+            f"{self.api_url}/accounts/{self.account_id}"
+            f"/r2/buckets/{self.bucket}/objects/{key}"
+        )
+
+    def _validate_file(self, file: FileStorage) -> int:
         """
         Validate file before upload.
 
         Args:
             file: The file to validate
 
+        Returns:
+            int: The size of the file in bytes
+
         Raises:
             R2UploadError: If validation fails
         """
@@ -74,6 +187,8 @@ class R2Service:
                     Allowed types: {', '.join(self.ALLOWED_EXTENSIONS)}"
             )
 
+        return size
+
     def _generate_key(self, file: FileStorage, folder: str) -> str:
         """
         Generate a unique and secure key for the file.
@@ -90,54 +205,98 @@ class R2Service:
         secure_name = secure_filename(filename)
         return f"{folder}/{timestamp}_{secure_name}"
 
-    def upload_file(self, file: FileStorage, folder: str = "images") -> str:
+    def _send(self, method: str, url: str, body=None, **kwargs) -> requests.Response:
         """
-        Upload a file to R2 using direct PUT request.
+        Send a request, retrying connection errors and retryable statuses.
+
+        Retries wait an exponential backoff with full jitter, so clients that
+        failed together do not retry together. A file body is rewound before
+        every attempt and streamed, never read into memory.
 
         Args:
-            file: The file to upload
-            folder: The folder to upload to within the bucket
+            method: The HTTP method
+            url: The URL to send the request to
+            body: The file-like body of the request, if any
 
         Returns:
-            str: The public URL of the uploaded file
+            requests.Response: The response of the last attempt
 
         Raises:
-            R2UploadError: If upload fails
+            requests.RequestException: If the last attempt failed to connect
         """
+        attempt = 0
+        while True:
+            if body is not None:
+                body.seek(0)
+
+            try:
+                response = self.session.request(
+                    method, url, data=body, timeout=R2_TIMEOUT, **kwargs
+                )
+                if (
+                    response.status_code not in R2_RETRY_STATUSES
+                    or attempt >= R2_MAX_RETRIES
+                ):
+                    return response
+                response.close()
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= R2_MAX_RETRIES:
+                    raise
+
+            attempt += 1
+            self.metrics.record_retry()
+            backoff = R2_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1)
+            time.sleep(random.uniform(0, min(backoff, R2_RETRY_BACKOFF_MAX_SECONDS)))
+
+    @staticmethod
+    def _error_message(response: requests.Response) -> str:
+        """Return the first error of an API response."""
         try:
-            self._validate_file(file)
-            key = self._generate_key(file, folder)
+            return response.json().get("errors", ["Unknown error"])[0]
+        except ValueError:
+            return f"HTTP {response.status_code}"
 
+    def _put(self, key: str, body, size: int, content_type: str) -> str:
+        """
+        Stream a body to an object of the bucket with a PUT request.
+
+        Args:
+            key: The key of the object
+            body: The file-like body to upload
+            size: The size of the body in bytes
+            content_type: The content type of the object
+
+        Returns:
+            str: The public URL of the uploaded object
+
+        Raises:
+            R2UploadError: If upload fails
+        """
+        start = time.perf_counter()
+        success = False
+        try:
             # Direct PUT to R2 bucket
-            upload_url = f"https://api.cloudflare.com/client/v4/accounts/{self.account_id}/r2/buckets/{self.bucket}/objects/{key}"
+            upload_url = self._object_url(key)
             current_app.logger.debug(f"Uploading file to: {upload_url}")
 
-            # Read file data
-            file_data = file.read()
-            file.seek(0)  # Reset file pointer
-
-            # Upload headers
+            # Upload headers, the length lets the body be streamed as is
             headers = {
-                "Authorization": f"Bearer {self.token}",
-                "Content-Type": file.content_type or "application/octet-stream",
+                "Content-Type": content_type or "application/octet-stream",
+                "Content-Length": str(size),
             }
 
-            # Make the PUT request
-            response = requests.put(
-                upload_url,
-                headers=headers,
-                data=file_data,
-                timeout=30,
-            )
+            response = self._send("PUT", upload_url, body, headers=headers)
 
             if response.status_code != 200:
-                error_msg = response.json().get("errors", ["Unknown error"])[0]
+                error_msg = self._error_message(response)
                 current_app.logger.error(f"R2 upload failed: {error_msg}")
                 raise R2UploadError(f"Upload failed: {error_msg}")
 
-            image_url = f"{self.public_url}/{key}"
-            return image_url
+            success = True
+            return f"{self.public_url}/{key}"
 
+        except R2UploadError:
+            raise
         except requests.RequestException as e:
             current_app.logger.error(f"R2 upload error: {str(e)}", exc_info=True)
             raise R2UploadError(f"Failed to upload file: {str(e)}") from e
@@ -146,6 +305,72 @@ class R2Service:
                 f"Unexpected error during upload: {str(e)}", exc_info=True
             )
             raise R2UploadError(f"Unexpected error during upload: {str(e)}") from e
+        finally:
+            seconds = time.perf_counter() - start
+            self.metrics.record_upload(size, seconds, success)
+            if has_request_context():
+                add_access_log_fields(
+                    r2_upload_ms=round(seconds * 1000, 2), r2_upload_bytes=size
+                )
+
+    def upload_file(self, file: FileStorage, folder: str = "images") -> str:
+        """
+        Upload a file to R2 with a streamed PUT request.
+
+        Args:
+            file: The file to upload
+            folder: The folder to upload to within the bucket
+
+        Returns:
+            str: The public URL of the uploaded file
+
+        Raises:
+            R2UploadError: If upload fails
+        """
+        try:
+            size = self._validate_file(file)
+        except R2UploadError:
+            self.metrics.record_upload(0, 0.0, False)
+            raise
+
+        key = self._generate_key(file, folder)
+        try:
+            return self._put(key, file.stream, size, file.content_type)
+        finally:
+            file.seek(0)  # Reset file pointer
+
+    def upload_bytes(self, data: bytes, key: str, content_type: str) -> str:
+        """
+        Upload content under a content addressed key.
+
+        The key names the content, so an object already uploaded by the
+        process under the same key is not uploaded again.
+
+        Args:
+            data: The content to upload
+            key: The key of the object, derived from the content
+            content_type: The content type of the object
+
+        Returns:
+            str: The public URL of the object
+
+        Raises:
+            R2UploadError: If upload fails
+        """
+        with self._uploaded_lock:
+            if key in self._uploaded_keys:
+                self._uploaded_keys.move_to_end(key)
+                self.metrics.record_dedupe()
+                return f"{self.public_url}/{key}"
+
+        url = self._put(key, io.BytesIO(data), len(data), content_type)
+
+        with self._uploaded_lock:
+            self._uploaded_keys[key] = True
+            while len(self._uploaded_keys) > IMAGE_UPLOADED_KEYS_SIZE:
+                self._uploaded_keys.popitem(last=False)
+
+        return url
 
     def delete_file(self, url: str) -> bool:
         """
@@ -160,27 +385,25 @@ class R2Service:
         Raises:
             R2DeleteError: If deletion fails
         """
+        success = False
         try:
             # Extract key from URL
             key = url.replace(f"{self.public_url}/", "")
             if not key or key == url:
                 raise R2DeleteError("Could not extract valid key from URL")
 
-            delete_url = f"https://api.cloudflare.com/client/v4/accounts/{self.account_id}/r2/buckets/{self.bucket}/objects/{key}"
-            headers = {
-                "Authorization": f"Bearer {self.token}",
-                "Content-Type": "application/json",
-            }
-
-            response = requests.delete(delete_url, headers=headers, timeout=30)
+            response = self._send("DELETE", self._object_url(key))
 
             if response.status_code != 200:
-                error_msg = response.json().get("errors", ["Unknown error"])[0]
+                error_msg = self._error_message(response)
                 current_app.logger.error(f"R2 delete failed: {error_msg}")
                 raise R2DeleteError(f"Delete failed: {error_msg}")
 
+            success = True
             return True
 
+        except R2DeleteError:
+            raise
         except requests.RequestException as e:
             current_app.logger.error(f"R2 delete error: {str(e)}", exc_info=True)
             raise R2DeleteError(f"Failed to delete file: {str(e)}") from e
@@ -189,3 +412,24 @@ class R2Service:
                 f"Unexpected error during deletion: {str(e)}", exc_info=True
             )
             raise R2DeleteError(f"Unexpected error during deletion: {str(e)}") from e
+        finally:
+            self.metrics.record_delete(success)
+
+
+_r2_service = None
+_r2_service_lock = threading.Lock()
+
+
+def get_r2_service() -> R2Service:
+    """Return the R2 service of the process, rebuilt when the settings change."""
+    global _r2_service  # pylint: disable=global-statement
+
+    cloudflare = get_settings().cloudflare
+    service = _r2_service
+    if service is not None and service.cloudflare is cloudflare:
+        return service
+
+    with _r2_service_lock:
+        if _r2_service is None or _r2_service.cloudflare is not cloudflare:
+            _r2_service = R2Service(cloudflare)
+        return _r2_service
@@ -0,0 +1,114 @@
+"""Typed settings object, built once from the cached config registry."""
+
+from dataclasses import dataclass
+
+from app.utils import cached_config, get_config
+
+
+def _optional_config(section: str, key: str, default: str = None) -> str:
+    """Get a config value, falling back to the default when it is not set."""
+
+    try:
+        return get_config(section, key)
+    except KeyError:
+        return default
+
+
+@dataclass(frozen=True)
+class OAuthProviderSettings:
+    """OAuth provider settings."""
+
+    client_id: str
+    client_secret: str
+    redirect_uri: str
+    authorize_url: str
+    token_url: str
+    user_info_url: str
+
+
+@dataclass(frozen=True)
+class CloudflareSettings:
+    """Cloudflare R2 settings."""
+
+    account_id: str
+    bucket: str
+    api_token: str
+    public_url: str
+
+
+@dataclass(frozen=True)
+class DatabaseSettings:
+    """Database engine settings, unset values keep the engine defaults."""
+
+    replica_urls: str = None
+    pool_size: str = None
+    max_overflow: str = None
+    pool_timeout: str = None
+    pool_recycle: str = None
+    pool_pre_ping: str = None
+    statement_timeout_ms: str = None
+
+
+@dataclass(frozen=True)
+class Settings:  # pylint: disable=too-many-instance-attributes
+    """Application settings."""
+
+    secret_key: str
+    jwt_secret_key: str
+    database_url: str
+    database: DatabaseSettings
+    google: OAuthProviderSettings
+    github: OAuthProviderSettings
+    cloudflare: CloudflareSettings
+    google_scope_profile: str = None
+    google_scope_email: str = None
+    metrics_token: str = None
+
+
+def _oauth_provider_settings(section: str) -> OAuthProviderSettings:
+    """Build the settings of an OAuth provider section, e.g. GOOGLE."""
+
+    return OAuthProviderSettings(
+        client_id=_optional_config(section, f"{section}_OAUTH_CLIENT_ID"),
+        client_secret=_optional_config(section, f"{section}_OAUTH_CLIENT_SECRET"),
+        redirect_uri=_optional_config(section, f"{section}_OAUTH_REDIRECT_URI"),
+        authorize_url=_optional_config(section, f"{section}_OAUTH_AUTH_URL"),
+        token_url=_optional_config(section, f"{section}_OAUTH_TOKEN_URL"),
+        user_info_url=_optional_config(section, f"{section}_OAUTH_USER_INFO_URL"),
+    )
+
+
+def get_settings() -> Settings:
+    """Get the process-wide settings, use reload_config() to rebuild them."""
+
+    return cached_config("settings", _build_settings)
+
+
+def _build_settings() -> Settings:
+    """Build the settings from the config."""
+
+    return Settings(
+        secret_key=_optional_config("APP", "SECRET_KEY"),
+        jwt_secret_key=_optional_config("APP", "JWT_SECRET_KEY"),
+        database_url=_optional_config("POSTGRESQL", "DATABASE_URL"),
+        database=DatabaseSettings(
+            replica_urls=_optional_config("POSTGRESQL", "REPLICA_URLS"),
+            pool_size=_optional_config("POSTGRESQL", "POOL_SIZE"),
+            max_overflow=_optional_config("POSTGRESQL", "MAX_OVERFLOW"),
+            pool_timeout=_optional_config("POSTGRESQL", "POOL_TIMEOUT"),
+            pool_recycle=_optional_config("POSTGRESQL", "POOL_RECYCLE"),
+            pool_pre_ping=_optional_config("POSTGRESQL", "POOL_PRE_PING"),
+            statement_timeout_ms=_optional_config("POSTGRESQL", "STATEMENT_TIMEOUT_MS"),
+        ),
+        google=_oauth_provider_settings("GOOGLE"),
+        github=_oauth_provider_settings("GITHUB"),
+        cloudflare=CloudflareSettings(
+            account_id=_optional_config("CLOUDFLARE", "ACCOUNT_ID"),
+            bucket=_optional_config("CLOUDFLARE", "R2_BUCKET_NAME"),
+            api_token=_optional_config("CLOUDFLARE", "API_TOKEN"),
+            public_url=_optional_config("CLOUDFLARE", "R2_PUBLIC_URL"),
+        ),
+        google_scope_profile=_optional_config("GOOGLE", "GOOGLE_OAUTH_SCOPE_PROFILE"),
+        google_scope_email=_optional_config("GOOGLE", "GOOGLE_OAUTH_SCOPE_EMAIL"),
+        metrics_token=_optional_config("APP", "METRICS_TOKEN"),
+    )
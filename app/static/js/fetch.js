@@ -222,6 +222,14 @@ const getFetch =
     return await fetchData(getUrl, { headers: getHeaders });
   };
 
+const getCursorFetch =
+  (url) =>
+  (data = {}) =>
+  async (cursor = "", headers = {}) => {
+    // cursor paged urls start with an empty cursor, then follow next_cursor
+    return await getFetch(url)({ ...data, cursor: cursor })(headers);
+  };
+
 const postFetch =
   (url) =>
   (data = {}) =>
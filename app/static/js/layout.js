@@ -5,6 +5,10 @@ $(document).ready(function () {
   init_alert();
   // search
   init_search();
+  // infinite paging
+  init_infinite_paging();
+  // notification stream
+  init_notification_stream();
 });
 
 const init_nav_active = () => {
@@ -91,6 +95,57 @@ const handle_page_click = async (page, scrollId) => {
   });
 };
 
+const init_infinite_paging = () => {
+  if (!("IntersectionObserver" in window)) {
+    return false;
+  }
+
+  // load the next page when its placeholder scrolls into view
+  document.querySelectorAll(".load-more").forEach((loadMore) => {
+    const observer = new IntersectionObserver((entries) => {
+      if (entries.some((entry) => entry.isIntersecting)) {
+        observer.disconnect();
+        handle_load_more(loadMore);
+      }
+    });
+    observer.observe(loadMore);
+  });
+};
+
+const handle_load_more = async (loadMore) => {
+  if (loadMore === undefined || loadMore === null) {
+    return false;
+  }
+
+  // a page is only requested once
+  if (loadMore.dataset.loading === "true") {
+    return false;
+  }
+  loadMore.dataset.loading = "true";
+
+  // get render url
+  const render_url = document.getElementById("render-url").textContent;
+  if (render_url === undefined || render_url === null || render_url === "") {
+    console.error("render url is missing");
+    return false;
+  }
+
+  // fetch the page after the cursor
+  const response = await getCursorFetch(render_url)()(
+    loadMore.dataset.nextCursor
+  );
+  if (response === undefined || response === null || response === "") {
+    console.error("load more response is missing");
+    loadMore.dataset.loading = "false";
+    return false;
+  }
+
+  // append the page, it brings the placeholder of the next one
+  loadMore.insertAdjacentHTML("afterend", response);
+  loadMore.remove();
+  init_infinite_paging();
+};
+
 const re_render = async (paramsToAdd = {}, keysToRemove = []) => {
   // get render id
   const render_id = document.getElementById("render-id").textContent;
@@ -144,6 +199,7 @@ const re_render = async (paramsToAdd = {}, keysToRemove = []) => {
 
     // re-render search results, client side rendering here
     document.getElementById(render_id).innerHTML = content;
+    init_infinite_paging();
   } catch (error) {
     console.error("Error processing response:", error);
     return false;
@@ -197,6 +253,60 @@ const handle_user_profile_click = async () => {
     });
 };
 
+// unread notices are pushed by the server, pages do not count them
+let notice_num = 0;
+let notification_stale = true;
+
+const init_notification_stream = () => {
+  // only signed in users have notifications
+  if (!window.EventSource || !document.getElementById("navUserProfile")) {
+    return;
+  }
+
+  const source = new EventSource("/notifications/stream");
+  source.addEventListener("count", (event) => {
+    set_notice_badge(JSON.parse(event.data).unread);
+  });
+  source.addEventListener("notice", (event) => {
+    set_notice_badge(notice_num + JSON.parse(event.data).delta);
+    notification_stale = true;
+  });
+  source.addEventListener("read", (event) => {
+    set_notice_badge(notice_num + JSON.parse(event.data).delta);
+  });
+  // the stream missed events, open a new one for a fresh count
+  source.addEventListener("resync", () => {
+    source.close();
+    init_notification_stream();
+  });
+};
+
+const set_notice_badge = (num) => {
+  const notice = document.getElementById("notice");
+  if (notice === undefined || notice === null) {
+    console.error("notice is missing");
+    return false;
+  }
+
+  let spanBadge = notice.querySelector("span");
+  if (spanBadge === undefined || spanBadge === null) {
+    spanBadge = document.createElement("span");
+    spanBadge.className =
+      "badge nav-badge position-absolute start-100 translate-middle rounded-pill bg-danger";
+    notice.appendChild(spanBadge);
+  }
+
+  notice_num = Math.max(0, num);
+  spanBadge.textContent = notice_num > 99 ? "99+" : notice_num;
+  spanBadge.classList.toggle("d-none", notice_num === 0);
+
+  if (notice_num === 0) {
+    // close notification
+    handle_close_notification();
+  }
+  return true;
+};
+
 const handle_notification_click = async () => {
   const notice = document.getElementById("notice");
   if (notice === undefined || notice === null) {
@@ -213,6 +323,11 @@ const handle_notification_click = async () => {
 
   // Toggle notification visibility
   notification.classList.toggle("d-none");
+
+  // load the notices when opened for the first time or after a new one
+  if (!notification.classList.contains("d-none") && notification_stale) {
+    await re_render_notification();
+  }
 };
 
 const handle_notification_change = async (notice_id) => {
@@ -262,41 +377,16 @@ const update_notification = async (notice_id) => {
 };
 
 const re_render_notification = async () => {
-  const notice = document.getElementById("notice");
-  if (notice === undefined || notice === null) {
-    console.error("notice is missing");
-    return false;
-  }
-
-  const spanBadge = notice.querySelector("span");
-  if (spanBadge === undefined || spanBadge === null) {
-    console.error("spanBadge is missing");
-    return false;
-  }
-
-  let notification_num = parseInt(spanBadge.textContent) || 0;
   try {
     const response = await getFetch(`/notifications`)()();
 
-    // re-render notification
+    // re-render notification, the badge follows the notification stream
     const notification = document.getElementById("notification");
     if (notification) {
       // The response is already processed HTML from the server
       notification.innerHTML = response;
     }
-
-    // re-render navbar notification
-    notification_num = Math.max(0, notification_num - 1);
-    spanBadge.textContent = notification_num;
-
-    if (notification_num === 0) {
-      // hide notification badge
-      spanBadge.classList.add("d-none");
-      // close notification
-      if (notification) {
-        notification.classList.add("d-none");
-      }
-    }
+    notification_stale = false;
     return true;
   } catch (error) {
     console.error("Failed to get notifications:", error);
@@ -545,6 +545,13 @@ def get_swagger_schema() -> dict:
                     "minimum": 1,
                     "maximum": 100,
                 },
+                "cursor": {
+                    "type": "string",
+                    "description": (
+                        "Opt-in cursor mode, empty for the first page, then the "
+                        "next_cursor of the previous page"
+                    ),
+                },
             },
         },
         "Stats": {
@@ -685,7 +692,15 @@ def get_swagger_path() -> dict:
                                         "code": {"type": "integer", "example": 200},
                                         "data": {
                                             "type": "object",
-                                            "properties": {"url": {"type": "string"}},
+                                            "properties": {
+                                                "image_url": {"type": "string"},
+                                                "variants": {
+                                                    "type": "object",
+                                                    "additionalProperties": {
+                                                        "type": "string"
+                                                    },
+                                                },
+                                            },
                                         },
                                         "message": {"type": "string"},
                                     },
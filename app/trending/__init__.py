@@ -0,0 +1,199 @@
+"""Incremental trending, built from per-request view counters in time buckets.
+
+Every view increments the counter of its request in the current bucket, in the
+same transaction as the view itself. Refreshing the trending table then only
+reads the buckets inside the longest trending window, and the buckets that fall
+out of it are pruned, so its cost follows recent views, not the view history.
+"""
+
+import heapq
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, event, select, tuple_
+from sqlalchemy.engine import Connection
+
+from app.constants import (
+    TRENDING_BUCKET_SECONDS,
+    TRENDING_PERIODS,
+    TRENDING_TOP_NUM,
+)
+from app.extensions import db
+from app.models.request import Request
+from app.models.trending import Trending
+from app.models.trending_bucket import TrendingBucket
+from app.models.user_record import UserRecord
+from app.utils import dialect_insert, generate_time
+
+
+def bucket_start(moment: datetime) -> datetime:
+    """Get the start of the bucket of a moment, as a naive UTC datetime."""
+
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+    epoch_seconds = int((moment - datetime(1970, 1, 1)).total_seconds())
+    return datetime(1970, 1, 1) + timedelta(
+        seconds=epoch_seconds - epoch_seconds % TRENDING_BUCKET_SECONDS
+    )
+
+
+def record_views(connection: Connection, views: dict, viewed_at=None) -> None:
+    """Add view counts, request id -> views, to their bucket in one upsert."""
+
+    if not views:
+        return
+
+    start = bucket_start(viewed_at or generate_time())
+    statement = dialect_insert(connection, TrendingBucket.__table__)
+    statement = statement.on_conflict_do_update(
+        index_elements=["request_id", "bucket_start"],
+        set_={
+            "view_num": TrendingBucket.__table__.c.view_num
+            + statement.excluded.view_num
+        },
+    )
+    connection.execute(
+        statement,
+        [
+            {"request_id": request_id, "bucket_start": start, "view_num": view_num}
+            for request_id, view_num in views.items()
+        ],
+    )
+
+
+def _after_user_record_insert_listener(_, connection, target) -> None:
+    """Count a recorded view in the current bucket."""
+
+    record_views(connection, {target.request_id: 1})
+
+
+event.listen(UserRecord, "after_insert", _after_user_record_insert_listener)
+
+
+def _score_buckets(rows, now: datetime) -> tuple:
+    """Sum the views and time-decayed scores of each request, per period."""
+
+    views = {period: Counter() for period in TRENDING_PERIODS}
+    scores = {period: defaultdict(float) for period in TRENDING_PERIODS}
+    for request_id, start, view_num in rows:
+        age = (now - start).total_seconds()
+        for period, (window, half_life) in TRENDING_PERIODS.items():
+            if age < window:
+                views[period][request_id] += view_num
+                scores[period][request_id] += view_num * 0.5 ** (age / half_life)
+
+    return views, scores
+
+
+def refresh_trending(now: datetime = None) -> int:
+    """Refresh the trending rows of every period in a single transaction.
+
+    Ranks are upserted and rows that left the top are deleted in the same
+    transaction, so readers never see a partial or empty table. Returns the
+    number of trending rows written.
+    """
+
+    now = bucket_start(now or generate_time()) + timedelta(
+        seconds=TRENDING_BUCKET_SECONDS
+    )
+    horizon = now - timedelta(
+        seconds=max(window for window, _ in TRENDING_PERIODS.values())
+    )
+
+    if db.session.query(TrendingBucket.request_id).first() is None:
+        _backfill_buckets(horizon)
+
+    bucket_table = TrendingBucket.__table__
+    rows = db.session.execute(
+        select(
+            bucket_table.c.request_id,
+            bucket_table.c.bucket_start,
+            bucket_table.c.view_num,
+        ).where(bucket_table.c.bucket_start >= horizon)
+    ).all()
+    views, scores = _score_buckets(rows, now)
+
+    tops = {
+        period: heapq.nlargest(
+            TRENDING_TOP_NUM, period_scores.items(), key=lambda item: item[1]
+        )
+        for period, period_scores in scores.items()
+    }
+
+    # author and reply number of every ranked request, in one query
+    ranked_ids = {request_id for top in tops.values() for request_id, _ in top}
+    requests = {
+        request.id: request
+        for request in db.session.execute(
+            select(Request.id, Request.author_id, Request.reply_num).where(
+                Request.id.in_(ranked_ids)
+            )
+        )
+    }
+
+    trending_rows = [
+        {
+            "period": period,
+            "request_id": request_id,
+            "author_id": requests[request_id].author_id,
+            "view_num": views[period][request_id],
+            "reply_num": requests[request_id].reply_num or 0,
+            "score": score,
+            "date": now.strftime("%Y-%m-%d"),
+            "update_at": generate_time(),
+        }
+        for period, top in tops.items()
+        for request_id, score in top
+        if request_id in requests
+    ]
+
+    connection = db.session.connection()
+    trending_table = Trending.__table__
+    connection.execute(
+        delete(trending_table).where(
+            tuple_(trending_table.c.period, trending_table.c.request_id).not_in(
+                [(row["period"], row["request_id"]) for row in trending_rows]
+            )
+        )
+    )
+    if trending_rows:
+        statement = dialect_insert(connection, trending_table)
+        statement = statement.on_conflict_do_update(
+            index_elements=["period", "request_id"],
+            set_={
+                column: statement.excluded[column]
+                for column in (
+                    "author_id",
+                    "view_num",
+                    "reply_num",
+                    "score",
+                    "date",
+                    "update_at",
+                )
+            },
+        )
+        connection.execute(statement, trending_rows)
+
+    connection.execute(
+        delete(bucket_table).where(bucket_table.c.bucket_start < horizon)
+    )
+    db.session.commit()
+
+    return len(trending_rows)
+
+
+def _backfill_buckets(horizon: datetime) -> None:
+    """Fill empty buckets from the view records inside the trending horizon."""
+
+    buckets = defaultdict(Counter)
+    for request_id, create_at in db.session.execute(
+        select(UserRecord.request_id, UserRecord.create_at).where(
+            UserRecord.create_at >= horizon
+        )
+    ):
+        buckets[bucket_start(create_at)][request_id] += 1
+
+    connection = db.session.connection()
+    for start, views in buckets.items():
+        record_views(connection, views, start)
@@ -121,12 +121,9 @@ def user_profile():
 
         if profile_form.username.data != username:
             # verify username
-            verify_username = (
-                user_verification_service(profile_form.username.data)
-                .get_json()
-                .get("data")
-                .get("result")
-            )
+            verify_username = user_verification_service(
+                profile_form.username.data
+            ).data.get("result")
 
             if not verify_username:
                 current_app.logger.error("Username: %s exists.", {username})
@@ -138,12 +135,9 @@ def user_profile():
 
         if profile_form.email.data != email:
             # verify email
-            verify_email = (
-                user_email_verify_service(profile_form.email.data)
-                .get_json()
-                .get("data")
-                .get("result")
-            )
+            verify_email = user_email_verify_service(
+                profile_form.email.data
+            ).data.get("result")
 
             if verify_email:
                 current_app.logger.error("Email: %s exists", {username})
@@ -147,17 +147,16 @@ def post_data(page: int = 1, per_page: int = 10):
     """Get the user's posts."""
 
     posts = user_posts_service(page, per_page)
-    posts_data = posts.get_json()
 
-    user_posts_data = posts_data["data"]["user_posts"]
+    user_posts_data = posts.data["user_posts"]
     posts_item_data = [
         {"id": post["id"], "title": post["title"]} for post in user_posts_data
     ]
 
     posts_page = get_pagination_details(
-        posts_data["pagination"]["page"],
-        posts_data["pagination"]["total_pages"],
-        posts_data["pagination"]["total_items"],
+        posts.page_info["page"],
+        posts.page_info["total_pages"],
+        posts.page_info["total_items"],
     )
 
     return {"name": "Posts", "data": posts_item_data, "pagination": posts_page}
@@ -167,18 +166,17 @@ def like_data(page: int = 1, per_page: int = 10):
     """Get the user's likes."""
 
     likes = user_likes_service(page, per_page)
-    likes_data = likes.get_json()
 
-    user_likes_data = likes_data["data"]["user_likes"]
+    user_likes_data = likes.data["user_likes"]
     likes_item_data = [
         {"id": like["request"]["id"], "title": like["request"]["title"]}
         for like in user_likes_data
     ]
 
     likes_page = get_pagination_details(
-        likes_data["pagination"]["page"],
-        likes_data["pagination"]["total_pages"],
-        likes_data["pagination"]["total_items"],
+        likes.page_info["page"],
+        likes.page_info["total_pages"],
+        likes.page_info["total_items"],
     )
 
     return {
@@ -192,18 +190,17 @@ def history_data(page: int = 1, per_page: int = 10):
     """Get the user's history."""
 
     histories = users_records_service(page, per_page)
-    histories_data = histories.get_json()
 
-    user_histories_data = histories_data["data"]["user_records"]
+    user_histories_data = histories.data["user_records"]
     histories_item_data = [
         {"id": history["request"]["id"], "title": history["request"]["title"]}
         for history in user_histories_data
     ]
 
     histories_page = get_pagination_details(
-        histories_data["pagination"]["page"],
-        histories_data["pagination"]["total_pages"],
-        histories_data["pagination"]["total_items"],
+        histories.page_info["page"],
+        histories.page_info["total_pages"],
+        histories.page_info["total_items"],
     )
 
     return {
@@ -217,9 +214,8 @@ def save_data(page: int = 1, per_page: int = 10):
     """Get the user's wishlist."""
 
     saves = user_saves_service(page, per_page)
-    saves_data = saves.get_json()
 
-    user_saves_data = saves_data["data"]["user_saves"]
+    user_saves_data = saves.data["user_saves"]
 
     saves_item_data = [
         {"id": save["request"]["id"], "title": save["request"]["title"]}
@@ -227,9 +223,9 @@ def save_data(page: int = 1, per_page: int = 10):
     ]
 
     saves_page = get_pagination_details(
-        saves_data["pagination"]["page"],
-        saves_data["pagination"]["total_pages"],
-        saves_data["pagination"]["total_items"],
+        saves.page_info["page"],
+        saves.page_info["total_pages"],
+        saves.page_info["total_items"],
     )
 
     return {"name": "Collects", "data": saves_item_data, "pagination": saves_page}
@@ -238,15 +234,13 @@ def save_data(page: int = 1, per_page: int = 10):
 def stat_data():
     """Get the user's statistics."""
 
-    user_stat = user_stats_service().get_json()
-    return user_stat.get("data").get("user_stats")
+    return user_stats_service().data.get("user_stats")
 
 
 def display_community_data():
     """Get the user's display communities."""
 
-    user_communities = user_communities_service().get_json()
-    user_communities_data = user_communities.get("data").get("user_communities")
+    user_communities_data = user_communities_service().data.get("user_communities")
     default_data = Community.query.limit(1).all()
     if user_communities_data == []:
         return default_data
@@ -256,7 +250,7 @@ def display_community_data():
 def get_upload_avatar_url(avatar_file: FileStorage):
     """Get upload avatar url."""
 
-    upload_avatar_response = upload_image_service(avatar_file).get_json()
-    if upload_avatar_response.get("code") != HttpRequestEnum.SUCCESS_OK.value:
+    upload_avatar_result = upload_image_service(avatar_file, variants=("avatar",))
+    if upload_avatar_result.code != HttpRequestEnum.SUCCESS_OK.value:
         return None
-    return upload_avatar_response.get("data").get("image_url")
+    return upload_avatar_result.data.get("image_url")
@@ -7,14 +7,37 @@ import uuid
 from datetime import datetime, timezone
 from pathlib import Path
 
+from sqlalchemy import Insert, Table
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+
 from app.constants import EnvironmentEnum
 
 
+# process-wide config registry, keyed by environment so each file is parsed once
+_config_registry: dict = {}
+
+
 def load_config() -> configparser.ConfigParser:
-    """Function to load config.ini file."""
-    config = configparser.ConfigParser()
+    """Function to load config.ini file, parsed once per environment."""
+
+    return _config_entry()["file"]
+
+
+def _config_entry() -> dict:
+    """Get the parsed config file and .env overlay of the current environment."""
 
     environment = get_env()
+    entry = _config_registry.get(environment)
+    if entry is None:
+        entry = _load_config_registry(environment)
+    return entry
+
+
+def _load_config_registry(environment: str) -> dict:
+    """Parse the config file and the .env overlay for an environment."""
+
+    config = configparser.ConfigParser()
     config_file = f"config.{environment}.ini"
 
     if not os.path.exists(config_file):
@@ -23,7 +46,24 @@ def load_config() -> configparser.ConfigParser:
     logging.info("Loading config file: %s", config_file)
 
     config.read(config_file)
-    return config
+    _config_registry[environment] = {"file": config, "env_file": load_env_file()}
+    return _config_registry[environment]
+
+
+def reload_config() -> configparser.ConfigParser:
+    """Function to drop the cached config and parse it again."""
+
+    _config_registry.clear()
+    return load_config()
+
+
+def cached_config(name: str, build):
+    """Function to get a value built from the config, cached until reload_config()."""
+
+    entry = _config_entry()
+    if name not in entry:
+        entry[name] = build()
+    return entry[name]
 
 
 def load_env_file() -> dict:
@@ -35,10 +75,13 @@ def load_env_file() -> dict:
         with env_path.open(encoding="utf-8") as f:
             for line in f:
                 line = line.strip()
-                if line and not line.startswith("#"):
-                    key, value = line.split("=", 1)
-                    # Remove quotes if present
-                    env_vars[key.strip()] = value.strip().strip("\"'")
+                # skip blanks, comments and lines that set nothing, e.g. "export"
+                if not line or line.startswith("#") or "=" not in line:
+                    continue
+                key, value = line.split("=", 1)
+                key = key.strip().removeprefix("export ").strip()
+                # Remove quotes if present
+                env_vars[key] = value.strip().strip("\"'")
 
     return env_vars
 
@@ -51,8 +94,9 @@ def get_env() -> str:
 def get_config(section, key) -> str:
     """Function to get config value following priority order:
     1. config.ini file
-    2. .env file
-    3. environment variables
+    2. environment variables
+    3. .env file
+    Both files are read once per process, call reload_config() to pick up edits.
     """
     # Try config file first
     try:
@@ -60,14 +104,16 @@ def get_config(section, key) -> str:
     except (configparser.Error, KeyError):
         pass
 
-    # Try environment variables (both with and without section prefix)
+    # Try environment variables, then the .env file (both with and without section
+    # prefix), the real environment wins over the file
     env_keys = [
         f"{section}_{key}",  # e.g. GOOGLE_OAUTH_CLIENT_ID
         key,  # e.g. OAUTH_CLIENT_ID
     ]
 
+    env_file = _config_entry()["env_file"]
     for env_key in env_keys:
-        value = os.environ.get(env_key)
+        value = os.environ.get(env_key, env_file.get(env_key))
         if value is not None:
             return value
 
@@ -92,6 +138,13 @@ def generate_date() -> str:
     return datetime.now(tz=timezone.utc).strftime("%Y-%m-%d")
 
 
+def dialect_insert(connection: Connection, table: Table) -> Insert:
+    """Function to build an insert supporting ON CONFLICT for the connection dialect."""
+    if connection.dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
 def calculate_render_page(current_page: int, total_pages: int) -> tuple:
     """Function to calculate render page.
     Returns a tuple containing the first and last page numbers to be rendered"""
@@ -0,0 +1,233 @@
+"""Write-behind buffer of post views.
+
+Viewing a post only appends a view event to the in-memory buffer of the worker,
+the page itself stays read-only. A background thread flushes the buffer every
+few seconds, or sooner when it fills up: the view records go in one multi-row
+insert, and the post view numbers, view counters and trending buckets get one
+aggregated update per flush. A batch that fails to write goes back in the
+buffer for one more flush, then it is dropped. The buffer is drained when the
+process exits, the views of a killed worker are lost. Dropped views are
+counted in the metrics.
+"""
+
+import atexit
+import os
+import threading
+from collections import Counter, defaultdict
+
+from flask import Flask
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.constants import (
+    VIEW_BUFFER_FLUSH_SECONDS,
+    VIEW_BUFFER_FLUSH_SIZE,
+    VIEW_BUFFER_MAX_SIZE,
+)
+from app.counter import adjust_user_counters
+from app.extensions import db
+from app.metrics import VIEWS_DROPPED
+from app.models.request import Request
+from app.models.user_record import UserRecord
+from app.trending import bucket_start, record_views
+from app.utils import generate_time
+
+
+def write_views(events: list) -> int:
+    """Write view events, (user id, request id, viewed at), in one transaction.
+
+    The views of a post deleted, or marked deleted, since they were buffered are
+    dropped. The posts kept are locked until the commit, so they stay. Returns
+    the number of views written.
+    """
+
+    connection = db.session.connection()
+    request_table = Request.__table__
+    existing = set(
+        connection.scalars(
+            select(request_table.c.id)
+            .where(
+                request_table.c.id.in_({request_id for _, request_id, _ in events}),
+                request_table.c.delete_at.is_(None),
+            )
+            .with_for_update(read=True)
+        )
+    )
+    events = [view for view in events if view[1] in existing]
+    if not events:
+        return 0
+
+    connection.execute(
+        insert(UserRecord.__table__),
+        [
+            {"user_id": user_id, "request_id": request_id, "create_at": viewed_at}
+            for user_id, request_id, viewed_at in events
+        ],
+    )
+
+    # the view number of each post, one batched statement
+    views = Counter(request_id for _, request_id, _ in events)
+    connection.execute(
+        update(request_table)
+        .where(request_table.c.id == bindparam("b_request_id"))
+        .values(
+            view_num=func.coalesce(request_table.c.view_num, 0) + bindparam("b_views")
+        ),
+        [
+            {"b_request_id": request_id, "b_views": view_num}
+            for request_id, view_num in views.items()
+        ],
+    )
+
+    # the records skip the mapper events, count them here
+    adjust_user_counters(
+        connection, "view_num", Counter(user_id for user_id, _, _ in events)
+    )
+
+    buckets = defaultdict(Counter)
+    for _, request_id, viewed_at in events:
+        buckets[bucket_start(viewed_at)][request_id] += 1
+    for start, bucket_views in buckets.items():
+        record_views(connection, bucket_views, start)
+
+    db.session.commit()
+    return len(events)
+
+
+# pylint: disable=too-many-instance-attributes
+class ViewBuffer:
+    """Per-process buffer of view events with a background flusher."""
+
+    def __init__(
+        self,
+        flush_seconds: float = VIEW_BUFFER_FLUSH_SECONDS,
+        flush_size: int = VIEW_BUFFER_FLUSH_SIZE,
+        max_size: int = VIEW_BUFFER_MAX_SIZE,
+    ) -> None:
+        self.app = None
+        self.flush_seconds = flush_seconds
+        self.flush_size = flush_size
+        self.max_size = max_size
+        self.dropped = 0
+        self._events = []
+        # the events at the head of the buffer that already failed a write
+        self._retries = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def add(self, user_id: str, request_id: int) -> None:
+        """Buffer a view, a flush interval of 0 writes it at once."""
+
+        with self._lock:
+            if len(self._events) >= self.max_size:
+                # the database is not keeping up, shed views over memory
+                self.dropped += 1
+                VIEWS_DROPPED.labels(reason="full").inc()
+                return
+            self._events.append((user_id, request_id, generate_time()))
+            full = len(self._events) >= self.flush_size
+
+        if self.flush_seconds <= 0:
+            self.flush()
+            return
+
+        self._ensure_flusher()
+        if full:
+            self._wakeup.set()
+
+    def drain(self) -> list:
+        """Take every buffered event out of the buffer."""
+
+        events, _ = self._take()
+        return events
+
+    def _take(self) -> tuple:
+        """Take every buffered event, with the number that already failed once."""
+
+        with self._lock:
+            events, self._events = self._events, []
+            retries, self._retries = self._retries, 0
+        return events, retries
+
+    def _requeue(self, events: list, retries: int) -> None:
+        """Put the events of a failed write back, the first retries ones go.
+
+        The events put back go before those buffered since, within the size of
+        the buffer.
+        """
+
+        with self._lock:
+            retried = events[retries:][: max(self.max_size - len(self._events), 0)]
+            self._events[:0] = retried
+            self._retries = len(retried)
+            dropped = len(events) - len(retried)
+            self.dropped += dropped
+
+        if dropped:
+            VIEWS_DROPPED.labels(reason="failed").inc(dropped)
+
+    def flush(self) -> int:
+        """Write the buffered views, returns the number of views written."""
+
+        events, retries = self._take()
+        if not events or self.app is None:
+            return 0
+
+        with self.app.app_context():
+            try:
+                return write_views(events)
+            except SQLAlchemyError:
+                db.session.rollback()
+                self.app.logger.exception("Failed to write %s views", len(events))
+                self._requeue(events, retries)
+                return 0
+
+    def _ensure_flusher(self) -> None:
+        """Start the flusher thread, again in a forked worker."""
+
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="view-buffer", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.flush_seconds)
+            self._wakeup.clear()
+            self.flush()
+
+
+view_buffer = ViewBuffer()
+atexit.register(view_buffer.flush)
+
+
+def record_view(user_id: str, request_id: int) -> None:
+    """Record a post view, written later by the view buffer."""
+
+    view_buffer.add(user_id, request_id)
+
+
+def init_view_buffer(app: Flask) -> None:
+    """Bind the view buffer to the app and its config."""
+
+    # views buffered for a previous app of the process belong to it
+    if view_buffer.app is not None and view_buffer.app is not app:
+        view_buffer.flush()
+
+    view_buffer.app = app
+    view_buffer.flush_seconds = app.config.get(
+        "VIEW_BUFFER_FLUSH_SECONDS", VIEW_BUFFER_FLUSH_SECONDS
+    )
+    view_buffer.flush_size = app.config.get(
+        "VIEW_BUFFER_FLUSH_SIZE", VIEW_BUFFER_FLUSH_SIZE
+    )
+    view_buffer.max_size = app.config.get("VIEW_BUFFER_MAX_SIZE", VIEW_BUFFER_MAX_SIZE)
@@ -0,0 +1,88 @@
+"""This is the benchmark suite for the application."""
+
+import argparse
+import os
+import sys
+
+from tests.benchmark import (
+    BENCHMARK_DATABASE_URI,
+    BENCHMARK_REPEAT,
+    BENCHMARK_SIZES,
+    BENCHMARK_THRESHOLD,
+    compare_results,
+    load_baseline,
+    run_benchmarks,
+    save_baseline,
+)
+
+BASELINE_PATH = "benchmark_baseline.json"
+
+
+def cleanup_benchmark_db() -> None:
+    """Clean up the benchmark database file."""
+    if os.path.exists("instance/benchmark.db"):
+        os.remove("instance/benchmark.db")
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark the page and API routes.")
+    parser.add_argument(
+        "sizes",
+        nargs="*",
+        choices=list(BENCHMARK_SIZES),
+        help="dataset sizes to benchmark, small by default",
+    )
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=BENCHMARK_THRESHOLD)
+    parser.add_argument("--repeat", type=int, default=BENCHMARK_REPEAT)
+    parser.add_argument(
+        "--database-uri",
+        default=BENCHMARK_DATABASE_URI,
+        help="an empty database to generate the datasets into, its tables are dropped",
+    )
+    parser.add_argument(
+        "--update", action="store_true", help="write the results as the baseline"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Run the benchmarks and compare them to the baseline."""
+    args = parse_args()
+
+    try:
+        results = run_benchmarks(
+            args.sizes or ["small"], args.repeat, args.database_uri
+        )
+    finally:
+        cleanup_benchmark_db()
+
+    print(
+        f"{'size':8} {'route':26} {'status':>6} {'ms':>10} {'queries':>8} {'rows':>8}"
+    )
+    for size, routes in results.items():
+        for name, result in routes.items():
+            print(
+                f"{size:8} {name:26} {result['status']:>6} {result['ms']:>10.3f} "
+                f"{result['queries']:>8} {result['rows']:>8}"
+            )
+
+    baseline = load_baseline(args.baseline)
+    if args.update or not baseline:
+        save_baseline(args.baseline, baseline, results)
+        print(f"Baseline written to {args.baseline}.")
+        return
+
+    regressions = compare_results(baseline, results, args.threshold)
+    if regressions:
+        print("Benchmark regressed:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+    print("Benchmark passed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Gunicorn configuration, threaded workers and multi-process metrics.
+
+A notification stream holds its request open for minutes, so the workers serve
+requests on threads: a sync worker would be taken by one stream and killed by
+its timeout. Half the threads of a worker at most serve streams, the others
+are left for the pages.
+
+Every worker writes its metrics to files in PROMETHEUS_MULTIPROC_DIR, and the
+/metrics route of any worker merges the files of all of them. The directory is
+set before prometheus_client is first imported, which picks the multi-process
+values then, and emptied when the server starts, so values of a previous run
+are not merged into the new one.
+"""
+
+import os
+import shutil
+
+# before any import of prometheus_client, the app's included
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join("instance", "prometheus_multiproc")
+)
+
+
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "32"))
+
+
+def post_worker_init(worker):
+    """Cap the notification streams of the worker to half its threads."""
+
+    # pylint: disable=import-outside-toplevel
+    from app.notice.broker import notice_broker
+
+    notice_broker.max_connections = min(
+        notice_broker.max_connections, max(worker.cfg.threads // 2, 1)
+    )
+
+
+def on_starting(_server):
+    """Start with an empty metrics directory."""
+
+    directory = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+
+
+def child_exit(_server, worker):
+    """Drop the live gauges of an exited worker, its counters are kept."""
+
+    # pylint: disable=import-outside-toplevel
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,10 @@
+-- Upgrade an existing request table with the mark of the posts being purged.
+-- Run once before deploying the background purge of marked posts.
+
+BEGIN;
+
+-- Request, set when a background purge is scheduled, the post is hidden from then on
+ALTER TABLE request ADD COLUMN IF NOT EXISTS delete_at TIMESTAMP;
+CREATE INDEX IF NOT EXISTS ix_request_delete_at ON request (delete_at);
+
+COMMIT;
@@ -0,0 +1,25 @@
+-- Upgrade an existing trending table to one ranked row per (period, request).
+-- Run once before deploying the incremental trending, the job refills the rows.
+
+BEGIN;
+
+-- Trending Bucket, the views of a request within one time bucket
+CREATE TABLE IF NOT EXISTS trending_bucket (
+    request_id INTEGER NOT NULL REFERENCES request(id),
+    bucket_start TIMESTAMP NOT NULL,
+    view_num INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (request_id, bucket_start)
+);
+CREATE INDEX IF NOT EXISTS ix_trending_bucket_bucket_start ON trending_bucket (bucket_start);
+
+-- Trending, the existing rows were the daily ranking
+ALTER TABLE trending ADD COLUMN IF NOT EXISTS period VARCHAR(3) NOT NULL DEFAULT '24h';
+ALTER TABLE trending ADD COLUMN IF NOT EXISTS score DOUBLE PRECISION NOT NULL DEFAULT 0;
+
+-- a request now ranks once per period
+ALTER TABLE trending DROP CONSTRAINT IF EXISTS trending_request_id_key;
+ALTER TABLE trending DROP CONSTRAINT IF EXISTS uq_trending_period_request;
+ALTER TABLE trending ADD CONSTRAINT uq_trending_period_request UNIQUE (period, request_id);
+CREATE INDEX IF NOT EXISTS ix_trending_period_score ON trending (period, score);
+
+COMMIT;
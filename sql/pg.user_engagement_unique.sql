@@ -0,0 +1,60 @@
+-- Upgrade existing user_like and user_save tables to one row per user and target.
+-- Run once before deploying the set-based like and save toggles, their inserts
+-- rely on the unique indexes to skip a row that already exists.
+
+BEGIN;
+
+-- no like or save is written between the cleanup and the indexes
+LOCK TABLE user_like, user_save IN SHARE ROW EXCLUSIVE MODE;
+
+-- keep the first like or save of a user on a post or reply, null reply ids are
+-- one partition, the likes and saves of the post itself
+DELETE FROM user_like
+WHERE id IN (
+    SELECT id FROM (
+        SELECT id, ROW_NUMBER() OVER (
+            PARTITION BY user_id, request_id, reply_id ORDER BY id
+        ) AS position
+        FROM user_like
+    ) AS ranked
+    WHERE position > 1
+);
+
+DELETE FROM user_save
+WHERE id IN (
+    SELECT id FROM (
+        SELECT id, ROW_NUMBER() OVER (
+            PARTITION BY user_id, request_id, reply_id ORDER BY id
+        ) AS position
+        FROM user_save
+    ) AS ranked
+    WHERE position > 1
+);
+
+-- the like and save numbers of the posts and replies counted the duplicates,
+-- the global and user counters are repaired by the reconcile counter job
+UPDATE request SET
+    like_num = (
+        SELECT count(*) FROM user_like
+        WHERE user_like.request_id = request.id AND user_like.reply_id IS NULL
+    ),
+    save_num = (
+        SELECT count(*) FROM user_save
+        WHERE user_save.request_id = request.id AND user_save.reply_id IS NULL
+    );
+
+UPDATE reply SET
+    like_num = (SELECT count(*) FROM user_like WHERE user_like.reply_id = reply.id),
+    save_num = (SELECT count(*) FROM user_save WHERE user_save.reply_id = reply.id);
+
+-- one like or save per user and post, and per user and reply
+CREATE UNIQUE INDEX IF NOT EXISTS uq_user_like_user_request
+    ON user_like (user_id, request_id) WHERE reply_id IS NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_user_like_user_request_reply
+    ON user_like (user_id, request_id, reply_id) WHERE reply_id IS NOT NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_user_save_user_request
+    ON user_save (user_id, request_id) WHERE reply_id IS NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_user_save_user_request_reply
+    ON user_save (user_id, request_id, reply_id) WHERE reply_id IS NOT NULL;
+
+COMMIT;
@@ -0,0 +1,327 @@
+"""End-to-end benchmarks of the page and API routes.
+
+Each dataset size is generated into a fresh database with the synthetic dataset
+generator, then every route is requested through the test client as the most
+active generated user. A route records its median wall time, the number of SQL
+statements it runs and the number of rows it fetches. Results are compared to a
+JSON baseline: more statements than the baseline is a regression, and so is a
+wall time or a row count over the baseline by more than the threshold.
+"""
+
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+from flask import Flask
+from sqlalchemy import event, select
+
+from app import create_app
+from app.constants import DATASET_PASSWORD
+from app.dataset import DatasetPlan, DatasetScale, generate_dataset
+from app.extensions import db
+from app.models.community import Community
+from app.models.request import Request
+from app.notice.writer import notice_writer
+from app.search.index import rebuild_search_index
+from app.trending import refresh_trending
+from app.view_buffer import view_buffer
+from tests.config import AuthActions
+
+BENCHMARK_DATABASE_URI = "sqlite:///benchmark.db"
+
+BENCHMARK_SIZES = {
+    "small": DatasetScale(
+        users=200,
+        communities=20,
+        requests=2000,
+        replies=5000,
+        views=20000,
+        likes=4000,
+        saves=1000,
+        memberships=600,
+    ),
+    "medium": DatasetScale(
+        users=2000,
+        communities=100,
+        requests=20000,
+        replies=50000,
+        views=200000,
+        likes=40000,
+        saves=10000,
+        memberships=6000,
+    ),
+    "large": DatasetScale(
+        users=20000,
+        communities=500,
+        requests=200000,
+        replies=500000,
+        views=2000000,
+        likes=400000,
+        saves=100000,
+        memberships=60000,
+    ),
+}
+
+# route name -> url, formatted with the ids of the generated dataset
+BENCHMARK_ROUTES = {
+    "home": "/",
+    "index_posts": "/index_posts?cursor=",
+    "index_posts_page": "/index_posts?page=10",
+    "post": "/posts/{post_id}",
+    "search": "/search/results?keyword={keyword}",
+    "communities": "/communities/",
+    "community": "/communities/{community_id}",
+    "populars": "/populars/",
+    "users": "/users/",
+    "api_posts": "/api/v1/posts",
+    "api_posts_cursor": "/api/v1/posts?cursor=",
+    "api_user_posts": "/api/v1/users/posts",
+    "api_user_replies": "/api/v1/users/replies",
+    "api_user_records": "/api/v1/users/records",
+    "api_user_likes": "/api/v1/users/likes",
+    "api_user_saves": "/api/v1/users/saves",
+    "api_user_notifications": "/api/v1/users/notifications",
+    "api_user_stats": "/api/v1/users/stats",
+    "api_user_communities": "/api/v1/users/communities",
+    "api_categories": "/api/v1/categories",
+    "api_tags": "/api/v1/tags",
+    "api_stats": "/api/v1/stats",
+}
+
+BENCHMARK_REPEAT = 15
+BENCHMARK_THRESHOLD = 0.3
+
+# wall time differences under this are noise, whatever the threshold
+BENCHMARK_MIN_MS = 5.0
+
+
+@dataclass
+class RouteResult:
+    """Measurements of a route."""
+
+    status: int
+    ms: float
+    queries: int
+    rows: int
+
+
+class _RowCountingCursor:
+    """DBAPI cursor proxy counting the rows fetched through it."""
+
+    def __init__(self, cursor, recorder: "QueryRecorder") -> None:
+        self._cursor = cursor
+        self._recorder = recorder
+
+    def __getattr__(self, name: str):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._recorder.rows += 1
+            yield row
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._recorder.rows += 1
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._cursor.fetchmany(*args)
+        self._recorder.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._recorder.rows += len(rows)
+        return rows
+
+
+class QueryRecorder:
+    """Count the statements run and the rows fetched by the recording thread."""
+
+    def __init__(self, engine) -> None:
+        self.engine = engine
+        self.queries = 0
+        self.rows = 0
+        self._thread = None
+
+    def __enter__(self) -> "QueryRecorder":
+        self.queries = 0
+        self.rows = 0
+        self._thread = threading.get_ident()
+        event.listen(self.engine, "after_cursor_execute", self._after_execute)
+        return self
+
+    def __exit__(self, *_) -> None:
+        event.remove(self.engine, "after_cursor_execute", self._after_execute)
+
+    def _after_execute(self, conn, cursor, statement, params, context, many):
+        # the background writers run their statements on other threads
+        if threading.get_ident() != self._thread:
+            return
+
+        self.queries += 1
+        if context is not None and cursor.description is not None:
+            # the result fetches its rows from the context cursor
+            context.cursor = _RowCountingCursor(cursor, self)
+
+
+def create_benchmark_app(database_uri: str) -> Flask:
+    """Create an app on the benchmark database."""
+
+    app = create_app(
+        {
+            "TESTING": True,
+            "WTF_CSRF_ENABLED": False,
+            "SQLALCHEMY_DATABASE_URI": database_uri,
+            "SECRET_KEY": "benchmark-secret-key",
+        }
+    )
+
+    # an access log line per measured request would bury the results
+    app.logger.setLevel(logging.WARNING)
+    return app
+
+
+def seed_benchmark_database(app: Flask, scale: DatasetScale) -> dict:
+    """Generate a dataset into an empty database, returns the route ids."""
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        generate_dataset(DatasetPlan(scale))
+        rebuild_search_index()
+        refresh_trending()
+
+        post = db.session.execute(
+            select(Request.id, Request.title).order_by(
+                Request.view_num.desc(), Request.id
+            )
+        ).first()
+        community_id = db.session.scalar(select(Community.id).order_by(Community.id))
+
+    return {
+        "post_id": post.id,
+        "keyword": post.title.split()[0],
+        "community_id": community_id,
+    }
+
+
+def measure_route(
+    client, engine, url: str, repeat: int, headers: dict = None
+) -> RouteResult:
+    """Request a route once to warm it up, then measure repeated requests."""
+
+    client.get(url, headers=headers)
+
+    timings = []
+    with QueryRecorder(engine) as recorder:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = client.get(url, headers=headers)
+            timings.append((time.perf_counter() - start) * 1000)
+
+    return RouteResult(
+        status=response.status_code,
+        ms=round(statistics.median(timings), 3),
+        queries=recorder.queries // repeat,
+        rows=recorder.rows // repeat,
+    )
+
+
+def run_benchmarks(
+    sizes: list,
+    repeat: int = BENCHMARK_REPEAT,
+    database_uri: str = BENCHMARK_DATABASE_URI,
+) -> dict:
+    """Benchmark every route on every dataset size, size -> route -> result."""
+
+    results = {}
+    for size in sizes:
+        app = create_benchmark_app(database_uri)
+        ids = seed_benchmark_database(app, BENCHMARK_SIZES[size])
+        with app.app_context():
+            engine = db.engine
+
+        client = app.test_client()
+        auth = AuthActions(client)
+        # the first generated user is the most active one
+        response = auth.login(email="user0@example.com", password=DATASET_PASSWORD)
+        if response.status_code != 302:
+            raise RuntimeError(f"Benchmark login failed: {response.status_code}")
+
+        results[size] = {
+            name: asdict(
+                measure_route(
+                    client,
+                    engine,
+                    url.format(**ids),
+                    repeat,
+                    # the API authenticates with the JWT, the pages with the session
+                    auth.get_auth_headers() if url.startswith("/api/") else None,
+                )
+            )
+            for name, url in BENCHMARK_ROUTES.items()
+        }
+
+        # write what the routes buffered while the database is still there
+        view_buffer.flush()
+        notice_writer.flush()
+        with app.app_context():
+            db.engine.dispose()
+
+    return results
+
+
+def compare_results(
+    baseline: dict, results: dict, threshold: float = BENCHMARK_THRESHOLD
+) -> list:
+    """Return a message per route measurement that regressed past the baseline."""
+
+    regressions = []
+    for size, routes in results.items():
+        for name, result in routes.items():
+            base = baseline.get(size, {}).get(name)
+            if base is None:
+                continue
+
+            label = f"{size} {name}"
+            if result["status"] != base["status"]:
+                regressions.append(
+                    f"{label}: status {base['status']} -> {result['status']}"
+                )
+            if result["queries"] > base["queries"]:
+                regressions.append(
+                    f"{label}: queries {base['queries']} -> {result['queries']}"
+                )
+            if result["rows"] > base["rows"] * (1 + threshold):
+                regressions.append(f"{label}: rows {base['rows']} -> {result['rows']}")
+            if (
+                result["ms"] > base["ms"] * (1 + threshold)
+                and result["ms"] - base["ms"] > BENCHMARK_MIN_MS
+            ):
+                regressions.append(f"{label}: ms {base['ms']} -> {result['ms']}")
+
+    return regressions
+
+
+def load_baseline(path: str) -> dict:
+    """Load a baseline, empty if there is none yet."""
+
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as baseline_file:
+        return json.load(baseline_file)
+
+
+def save_baseline(path: str, baseline: dict, results: dict) -> None:
+    """Write the results into a baseline, keeping the sizes not run."""
+
+    with open(path, "w", encoding="utf-8") as baseline_file:
+        json.dump({**baseline, **results}, baseline_file, indent=2, sort_keys=True)
+        baseline_file.write("\n")
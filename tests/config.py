@@ -37,6 +37,8 @@ def get_test_config() -> Dict[str, Any]:
         "WTF_CSRF_ENABLED": False,
         "SQLALCHEMY_DATABASE_URI": "sqlite:///test.db",
         "SECRET_KEY": "test-secret-key",  # Add secret key for session management
+        "VIEW_BUFFER_FLUSH_SECONDS": 0,  # Write post views at once
+        "NOTICE_WRITER_FLUSH_SECONDS": 0,  # Write notices at once
     }
 
 
@@ -37,7 +37,14 @@ def seed_user_like():
     if not seed_user_like_data:
         return
 
+    # one like per user and reply
+    seeded = set()
     for data in seed_user_like_data:
+        key = (data["user_id"], data["request_id"], data["reply_id"])
+        if key in seeded:
+            continue
+        seeded.add(key)
+
         user_like = UserLike(
             user_id=data["user_id"],
             request_id=data["request_id"],
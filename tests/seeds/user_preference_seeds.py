@@ -1,10 +1,12 @@
-"""This module seeds the database with initial user preference data for testing. """
+"""This module seeds the database with initial user preference and membership data
+for testing."""
 
 import random
 
 from app.extensions import db
 from app.models.category import Category
 from app.models.community import Community
+from app.models.community_member import CommunityMember
 from app.models.user import User
 from app.models.user_preference import UserPreference
 
@@ -28,14 +30,14 @@ def create_seed_user_preference_data() -> list:
     ]
 
 
-def create_communities(communities: list) -> str:
-    """Create a string of communities for user preference."""
+def create_communities(communities: list) -> set:
+    """Create a set of communities the user is a member of."""
 
     community_datas = []
     for _ in range(random.randint(1, 5)):
         community_datas.append(random.choice(communities))
 
-    return str(community_datas)
+    return set(community_datas)
 
 
 def create_interests(categories: list) -> str:
@@ -58,9 +60,14 @@ def seed_user_preference():
     for data in seed_user_preference_data:
         user_preference = UserPreference(
             user_id=data["user_id"],
-            communities=data["communities"],
             interests=data["interests"],
         )
         db.session.add(user_preference)
+        db.session.add_all(
+            [
+                CommunityMember(user_id=data["user_id"], community_id=community_id)
+                for community_id in data["communities"]
+            ]
+        )
 
     db.session.commit()
@@ -35,7 +35,14 @@ def seed_user_save():
     if not seed_user_save_data:
         return
 
+    # one save per user and reply
+    seeded = set()
     for data in seed_user_save_data:
+        key = (data["user_id"], data["request_id"], data["reply_id"])
+        if key in seeded:
+            continue
+        seeded.add(key)
+
         user_save = UserSave(
             user_id=data["user_id"],
             request_id=data["request_id"],
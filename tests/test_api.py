@@ -1,11 +1,40 @@
 """Tests for the API module."""
 
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import asdict, replace
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from apscheduler.schedulers.background import BackgroundScheduler
 from flask import Flask
 from flask.testing import FlaskClient
-
-from app.constants import HttpRequestEnum
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from app import create_app, get_home_stats
+from app.api.service import posts_service
+from app.constants import (
+    DATASET_PASSWORD,
+    DATASET_SEED,
+    NOTICE_STREAM_POLL_MILLISECONDS,
+    NOTICE_STREAM_RETRY_MILLISECONDS,
+    HttpRequestEnum,
+)
+from app.coordinator import FileLeaderLock, SchedulerCoordinator, record_job_runs
+from app.counter import adjust_counter, get_user_stats, reconcile_counters
+from app.dataset import DatasetPlan, DatasetScale, build_chunk, user_id
 from app.extensions import db
+from app.images import ImageProcessingError, process_image, process_upload
 from app.models.category import Category
+from app.models.community import Community
+from app.models.global_stat import GLOBAL_STAT_ID, GlobalStat
+from app.models.job_run import JobRun, JobRunStatusEnum
 from app.models.reply import Reply
 from app.models.request import Request
 from app.models.tag import Tag
@@ -14,7 +43,22 @@ from app.models.user_like import UserLike
 from app.models.user_notice import UserNotice, UserNoticeModuleEnum
 from app.models.user_record import UserRecord
 from app.models.user_save import UserSave
-from tests.config import AuthActions, TestBase
+from app.models.user_stat import UserStat
+from app.notice.broker import NoticeBroker, notice_broker
+from app.notice.stream import format_event, stream_events
+from app.notice.writer import NoticeWriter, notice_writer
+from app.query_stats import QueryBudgetError, QueryStats, fingerprint, query_budget
+from app.services.r2_service import R2Service, R2UploadError
+from app.settings import CloudflareSettings
+from app.utils import get_config, reload_config
+from tests.benchmark import compare_results, measure_route
+from tests.config import (
+    AuthActions,
+    TestBase,
+    clean_up_test_database,
+    create_test_database,
+    get_test_config,
+)
 
 _PREFIX = "/api/v1"
 
@@ -265,6 +309,61 @@ class TestApi(TestBase):
         # logout
         auth.logout()
 
+    def test_toggle_user_like(self, app: Flask, client: FlaskClient):
+        """Test liking and unliking a reply keeps the counters in step."""
+
+        url = _PREFIX + "/users/likes"
+
+        with app.app_context():
+            user = User.query.first()
+            email = user.email
+            liked = {
+                like.reply_id for like in UserLike.query.filter_by(user_id=user.id)
+            }
+            reply = Reply.query.filter(Reply.id.notin_(liked)).first()
+            reply_id, request_id = reply.id, reply.request_id
+            like_num = reply.like_num or 0
+            reconcile_counters()
+            user_like_num = get_user_stats(user.id)["like_num"]
+
+        # login
+        auth = AuthActions(client)
+        auth.login(email=email, password="Password@123")
+        payload = {"request_id": request_id, "reply_id": reply_id}
+
+        # like twice, the second click changes nothing
+        response = client.post(url, json=payload, headers=auth.get_auth_headers())
+        self.assertEqual(response.status_code, HttpRequestEnum.CREATED.value)
+        response = client.post(url, json=payload, headers=auth.get_auth_headers())
+        self.assertEqual(response.status_code, HttpRequestEnum.BAD_REQUEST.value)
+
+        with app.app_context():
+            self.assertEqual(db.session.get(Reply, reply_id).like_num, like_num + 1)
+            self.assertEqual(get_user_stats(user.id)["like_num"], user_like_num + 1)
+            self.assertEqual(reconcile_counters(), 0)
+
+        # a reply of another post is not found
+        response = client.post(
+            url,
+            json={"request_id": 9999999, "reply_id": reply_id},
+            headers=auth.get_auth_headers(),
+        )
+        self.assertEqual(response.status_code, HttpRequestEnum.NOT_FOUND.value)
+
+        # unlike twice, the second click changes nothing
+        response = client.delete(url, json=payload, headers=auth.get_auth_headers())
+        self.assertEqual(response.status_code, HttpRequestEnum.NO_CONTENT.value)
+        response = client.delete(url, json=payload, headers=auth.get_auth_headers())
+        self.assertEqual(response.status_code, HttpRequestEnum.NOT_FOUND.value)
+
+        with app.app_context():
+            self.assertEqual(db.session.get(Reply, reply_id).like_num, like_num)
+            self.assertEqual(get_user_stats(user.id)["like_num"], user_like_num)
+            self.assertEqual(reconcile_counters(), 0)
+
+        # logout
+        auth.logout()
+
     def test_get_user_saves(self, app: Flask, client: FlaskClient):
         """Test the user saves API."""
 
@@ -428,8 +527,8 @@ class TestApi(TestBase):
         user = None
         user_notification = None
         with app.app_context():
-            user = User.query.first()
-            user_notification = UserNotice.query.filter_by(user_id=user.id).first()
+            user_notification = UserNotice.query.first()
+            user = db.session.get(User, user_notification.user_id)
 
         # login
         auth = AuthActions(client)
@@ -451,6 +550,297 @@ class TestApi(TestBase):
         # logout
         auth.logout()
 
+    def test_notice_writer(self, app: Flask, _):
+        """Test queued notices are pending until the writer writes them."""
+
+        with app.app_context():
+            user_id = User.query.first().id
+            notice_num = UserNotice.query.filter_by(user_id=user_id).count()
+
+        writer = NoticeWriter(flush_seconds=3600, batch_size=100)
+        writer.app = app
+        for _ in range(3):
+            self.assertTrue(
+                writer.enqueue(user_id, "POST", "CREATED successfully!", "POST")
+            )
+
+        # the batch stays open until it is full or its interval is over
+        self.assertEqual(writer.pending(user_id), 3)
+        with app.app_context():
+            self.assertEqual(
+                UserNotice.query.filter_by(user_id=user_id).count(), notice_num
+            )
+
+        # closing writes the open batch
+        writer.close()
+        self.assertEqual(writer.pending(user_id), 0)
+        with app.app_context():
+            notices = UserNotice.query.filter_by(user_id=user_id, subject="POST").all()
+            self.assertEqual(
+                UserNotice.query.filter_by(user_id=user_id).count(), notice_num + 3
+            )
+            self.assertTrue(
+                all(notice.module == UserNoticeModuleEnum.POST for notice in notices)
+            )
+
+    def test_notification_stream(self, app: Flask, client: FlaskClient):
+        """Test the notification stream pushes the unread count and new notices."""
+
+        with app.app_context():
+            user = User.query.first()
+            email, user_id = user.email, user.id
+            unread = UserNotice.query.filter_by(user_id=user_id, status=False).count()
+
+        # login
+        auth = AuthActions(client)
+        auth.login(email=email, password="Password@123")
+
+        response = client.get(
+            "/notifications/stream",
+            buffered=False,
+            environ_overrides={"wsgi.multithread": True},
+        )
+        self.assertEqual(response.status_code, HttpRequestEnum.SUCCESS_OK.value)
+        self.assertEqual(response.mimetype, "text/event-stream")
+        self.assertEqual(notice_broker.connections, 1)
+
+        events = iter(response.response)
+        self.assertEqual(
+            next(events).decode(), f"retry: {NOTICE_STREAM_RETRY_MILLISECONDS}\n\n"
+        )
+        self.assertEqual(
+            next(events).decode(), format_event("count", {"unread": unread})
+        )
+
+        # a written notice is pushed to the stream
+        with app.app_context():
+            notice_writer.enqueue(user_id, "POST", "CREATED successfully!", "POST")
+        self.assertIn(b'"delta": 1', next(events))
+
+        # closing the stream frees its connection
+        response.close()
+        self.assertEqual(notice_broker.connections, 0)
+
+        # a queued notice is counted once, by its delta when it is written
+        with patch.object(notice_writer, "flush_seconds", 3600), patch.object(
+            notice_writer, "_ensure_flusher"
+        ):
+            with app.app_context():
+                notice_writer.enqueue(user_id, "POST", "CREATED successfully!", "POST")
+            response = client.get(
+                "/notifications/stream",
+                buffered=False,
+                environ_overrides={"wsgi.multithread": True},
+            )
+            events = iter(response.response)
+            next(events)
+            self.assertEqual(
+                next(events).decode(), format_event("count", {"unread": unread + 1})
+            )
+            notice_writer.flush()
+            self.assertIn(b'"delta": 1', next(events))
+            response.close()
+
+        # a server without threads only gets the count, and polls
+        response = client.get("/notifications/stream")
+        self.assertEqual(
+            response.get_data(as_text=True),
+            f"retry: {NOTICE_STREAM_POLL_MILLISECONDS}\n\n"
+            + format_event("count", {"unread": unread + 2}),
+        )
+        response.close()
+        self.assertEqual(notice_broker.connections, 0)
+
+        # logout
+        auth.logout()
+
+    def test_notice_broker(self, *_):
+        """Test the notice broker caps connections and flags slow streams."""
+
+        broker = NoticeBroker(max_connections=2, max_user_connections=1, queue_size=1)
+        first = broker.subscribe("user-1")
+        self.assertIsNotNone(first)
+        self.assertIsNone(broker.subscribe("user-1"))
+        self.assertIsNotNone(broker.subscribe("user-2"))
+        self.assertIsNone(broker.subscribe("user-3"))
+
+        # a full queue flags the stream, which asks the browser to start over
+        self.assertEqual(broker.publish("user-1", "read", {"delta": -1}), 1)
+        broker.publish("user-1", "read", {"delta": -1})
+        self.assertTrue(first.lagged)
+        self.assertEqual(
+            list(stream_events(first, 3)),
+            [
+                f"retry: {NOTICE_STREAM_RETRY_MILLISECONDS}\n\n",
+                format_event("count", {"unread": 3}),
+                format_event("resync", {}),
+            ],
+        )
+
+        # idle streams get heartbeats until they are closed
+        broker.unsubscribe(first)
+        broker.unsubscribe(first)
+        self.assertEqual(broker.connections, 1)
+        second = broker.subscribe("user-1")
+        events = list(
+            stream_events(second, 0, heartbeat_seconds=0.01, max_seconds=0.05)
+        )
+        self.assertIn(": heartbeat\n\n", events)
+
+    def test_r2_upload(self, app: Flask, _):
+        """Test R2 uploads stream, retry and reuse connections on a fake endpoint."""
+
+        requests_seen = []
+
+        class FakeR2Handler(BaseHTTPRequestHandler):
+            """Fake R2 API, failing the first upload with a 503."""
+
+            protocol_version = "HTTP/1.1"
+
+            def _reply(self, status: int) -> None:
+                body = json.dumps({"success": status == 200}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_PUT(self):  # pylint: disable=invalid-name
+                length = int(self.headers["Content-Length"])
+                requests_seen.append(
+                    (
+                        "PUT",
+                        self.path,
+                        self.client_address[1],
+                        self.headers["Authorization"],
+                        self.rfile.read(length),
+                    )
+                )
+                self._reply(503 if len(requests_seen) == 1 else 200)
+
+            def do_DELETE(self):  # pylint: disable=invalid-name
+                requests_seen.append(
+                    ("DELETE", self.path, self.client_address[1], None, b"")
+                )
+                self._reply(200)
+
+            def log_message(self, *_):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), FakeR2Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        try:
+            with app.app_context():
+                service = R2Service(
+                    CloudflareSettings("account", "bucket", "token", "https://r2.dev"),
+                    api_url=f"http://127.0.0.1:{server.server_port}",
+                )
+                data = b"\x89PNG" * 4096
+                image = FileStorage(
+                    io.BytesIO(data), filename="a.png", content_type="image/png"
+                )
+                image_url = service.upload_file(image)
+                self.assertTrue(service.delete_file(image_url))
+
+                # a file type not allowed is never sent
+                with self.assertRaises(R2UploadError):
+                    service.upload_file(FileStorage(io.BytesIO(b"x"), filename="a.exe"))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        key = image_url.removeprefix("https://r2.dev/")
+        self.assertTrue(key.startswith("images/"))
+        self.assertEqual(
+            [request[0] for request in requests_seen], ["PUT", "PUT", "DELETE"]
+        )
+        self.assertTrue(
+            all(
+                request[1] == f"/accounts/account/r2/buckets/bucket/objects/{key}"
+                for request in requests_seen
+            )
+        )
+        self.assertEqual(requests_seen[1][3], "Bearer token")
+        self.assertEqual(requests_seen[1][4], data)
+
+        # the retry and the delete reuse the kept-alive connection
+        self.assertEqual(len({request[2] for request in requests_seen}), 1)
+
+        metrics = service.metrics.snapshot()
+        self.assertEqual(metrics["uploads"], 1)
+        self.assertEqual(metrics["upload_failures"], 1)
+        self.assertEqual(metrics["upload_bytes"], len(data))
+        self.assertEqual(metrics["retries"], 1)
+        self.assertEqual(metrics["deletes"], 1)
+
+    def test_process_image(self, app: Flask, _):
+        """Test uploads are re-encoded to hashed variants without metadata."""
+
+        photo = Image.new("RGB", (800, 600), (200, 30, 30))
+        exif = Image.Exif()
+        exif[0x010F] = "Camera"  # make
+        buffer = io.BytesIO()
+        photo.save(buffer, "JPEG", exif=exif)
+        data = buffer.getvalue()
+
+        thumbnail, avatar, full = process_image(data, ("thumbnail", "avatar", "full"))
+        self.assertEqual((avatar.width, avatar.height), (256, 256))
+        self.assertEqual((thumbnail.width, thumbnail.height), (320, 320))
+
+        # the full size is never upscaled, and carries no metadata
+        self.assertEqual((full.width, full.height), (800, 600))
+        encoded = Image.open(io.BytesIO(full.data))
+        self.assertEqual(len(encoded.getexif()), 0)
+        self.assertEqual(Image.MIME[encoded.format], full.content_type)
+
+        # the same upload gets the same key, a different variant another one
+        (again,) = process_upload(data, ("full",))
+        self.assertEqual(again.object_key("images"), full.object_key("images"))
+        self.assertNotEqual(avatar.object_key("images"), full.object_key("images"))
+        self.assertTrue(full.object_key("images").startswith("images/full/"))
+
+        with self.assertRaises(ImageProcessingError):
+            process_image(b"<svg xmlns='http://www.w3.org/2000/svg'/>")
+
+        puts = []
+
+        class FakeR2Handler(BaseHTTPRequestHandler):
+            """Fake R2 API, accepting every upload."""
+
+            protocol_version = "HTTP/1.1"
+
+            def do_PUT(self):  # pylint: disable=invalid-name
+                puts.append(self.rfile.read(int(self.headers["Content-Length"])))
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *_):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), FakeR2Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        try:
+            with app.app_context():
+                service = R2Service(
+                    CloudflareSettings("account", "bucket", "token", "https://r2.dev"),
+                    api_url=f"http://127.0.0.1:{server.server_port}",
+                )
+                key = full.object_key("images")
+                first = service.upload_bytes(full.data, key, full.content_type)
+                second = service.upload_bytes(again.data, key, again.content_type)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        # an object already uploaded is not sent again
+        self.assertEqual(first, f"https://r2.dev/{key}")
+        self.assertEqual(second, first)
+        self.assertEqual(puts, [full.data])
+        self.assertEqual(service.metrics.snapshot()["dedupes"], 1)
+
     def test_get_user_stat(self, app: Flask, client: FlaskClient):
         """Test the user stat GET API."""
 
@@ -473,6 +863,104 @@ class TestApi(TestBase):
         # logout
         auth.logout()
 
+    def test_get_posts(self, app: Flask, client: FlaskClient):
+        """Test the posts GET API."""
+
+        url = _PREFIX + "/posts"
+
+        user = None
+        with app.app_context():
+            user = User.query.first()
+
+        # login
+        auth = AuthActions(client)
+        auth.login(email=user.email, password="Password@123")
+
+        # check valid data
+        response = client.get(url, headers=auth.get_auth_headers())
+        self.assertEqual(response.status_code, HttpRequestEnum.SUCCESS_OK.value)
+
+        response_data = response.json
+        self.assertEqual(response_data["code"], HttpRequestEnum.SUCCESS_OK.value)
+        self.assertEqual(
+            len(response_data["data"]["posts"]), min(Request.query.count(), 10)
+        )
+
+        # check projected data
+        response = client.get(
+            url + "?fields=id,title,author.username", headers=auth.get_auth_headers()
+        )
+        self.assertEqual(response.status_code, HttpRequestEnum.SUCCESS_OK.value)
+
+        post = response.json["data"]["posts"][0]
+        self.assertEqual(set(post.keys()), {"id", "title", "author"})
+        self.assertEqual(set(post["author"].keys()), {"username"})
+
+        # test invalid fields
+        response = client.get(
+            url + "?fields=id,secret", headers=auth.get_auth_headers()
+        )
+        self.assertEqual(response.status_code, HttpRequestEnum.BAD_REQUEST.value)
+
+        # test private related columns
+        for field in ("author.password_hash", "author.security_answer", "author.email"):
+            response = client.get(
+                url + f"?fields=id,{field}", headers=auth.get_auth_headers()
+            )
+            self.assertEqual(response.status_code, HttpRequestEnum.BAD_REQUEST.value)
+
+        # logout
+        auth.logout()
+
+    def test_get_posts_cursor(self, app: Flask, client: FlaskClient):
+        """Test the posts GET API in cursor mode."""
+
+        url = _PREFIX + "/posts"
+
+        user = None
+        with app.app_context():
+            user = User.query.first()
+
+        # login
+        auth = AuthActions(client)
+        auth.login(email=user.email, password="Password@123")
+
+        for order_by in ("create_at_desc", "view_num_desc"):
+            # page numbers
+            response = client.get(
+                url + f"?order_by={order_by}&per_page=1000",
+                headers=auth.get_auth_headers(),
+            )
+            expected_ids = [post["id"] for post in response.json["data"]["posts"]]
+
+            # walk the feed by cursor
+            post_ids = []
+            cursor = ""
+            while cursor is not None:
+                response = client.get(
+                    url + f"?order_by={order_by}&per_page=7&cursor={cursor}",
+                    headers=auth.get_auth_headers(),
+                )
+                self.assertEqual(response.status_code, HttpRequestEnum.SUCCESS_OK.value)
+
+                pagination = response.json["pagination"]
+                if not cursor:
+                    self.assertEqual(pagination["total_items"], len(expected_ids))
+                else:
+                    self.assertIsNone(pagination["total_items"])
+
+                post_ids += [post["id"] for post in response.json["data"]["posts"]]
+                cursor = pagination["next_cursor"]
+
+            self.assertEqual(post_ids, expected_ids)
+
+        # test invalid cursor
+        response = client.get(url + "?cursor=invalid", headers=auth.get_auth_headers())
+        self.assertEqual(response.status_code, HttpRequestEnum.BAD_REQUEST.value)
+
+        # logout
+        auth.logout()
+
     def test_get_categories(self, app: Flask, client: FlaskClient):
         """Test the categories GET API."""
 
@@ -607,5 +1095,423 @@ class TestApi(TestBase):
         response_data = response.json
         self.assertEqual(response_data["code"], HttpRequestEnum.SUCCESS_OK.value)
 
+        # counters follow the source tables
+        stats = response_data["data"]["stats"]
+        self.assertEqual(stats["user_num"], User.query.count())
+        self.assertEqual(stats["request_num"], Request.query.count())
+        self.assertEqual(stats["reply_num"], Reply.query.count())
+        self.assertEqual(stats["view_num"], UserRecord.query.count())
+        self.assertEqual(stats["like_num"], UserLike.query.count())
+        self.assertEqual(stats["save_num"], UserSave.query.count())
+
         # logout
         auth.logout()
+
+    def test_home_stats_cache(self, app: Flask, client: FlaskClient):
+        """Test the cached home stats are invalidated by a new post."""
+
+        url = _PREFIX + "/posts/create/post"
+
+        user = None
+        community = None
+        with app.app_context():
+            user = User.query.first()
+            community = Community.query.first()
+
+            stats = get_home_stats()
+            self.assertIs(get_home_stats(), stats)
+
+        # login
+        auth = AuthActions(client)
+        auth.login(email=user.email, password="Password@123")
+
+        # a new post invalidates the cached stats
+        response = client.post(
+            url,
+            json={
+                "title": "Cache test",
+                "community": community.name,
+                "content": "Cache test content",
+                "tag": "ProblemSolving",
+            },
+            headers=auth.get_auth_headers(),
+        )
+        self.assertEqual(response.status_code, HttpRequestEnum.CREATED.value)
+
+        with app.app_context():
+            new_stats = get_home_stats()
+            self.assertIsNot(new_stats, stats)
+            self.assertEqual(new_stats["request_num"], stats["request_num"] + 1)
+
+        # logout
+        auth.logout()
+
+    def test_reconcile_counters(self, app: Flask, _):
+        """Test the counters reconciliation repairs drift."""
+
+        with app.app_context():
+            user = User.query.first()
+            request_num = Request.query.filter_by(author_id=user.id).count()
+
+            # drift the counters
+            global_stat = db.session.get(GlobalStat, GLOBAL_STAT_ID)
+            global_stat.request_num += 10
+            db.session.get(UserStat, user.id).request_num = 0
+            db.session.commit()
+
+            self.assertGreater(reconcile_counters(), 0)
+            self.assertEqual(
+                db.session.get(GlobalStat, GLOBAL_STAT_ID).request_num,
+                Request.query.count(),
+            )
+            self.assertEqual(get_user_stats(user.id)["request_num"], request_num)
+
+            # nothing left to repair
+            self.assertEqual(reconcile_counters(), 0)
+
+            # a missing user counter row is created and recounted
+            db.session.delete(db.session.get(UserStat, user.id))
+            db.session.commit()
+            reconcile_counters()
+            self.assertEqual(get_user_stats(user.id)["request_num"], request_num)
+            self.assertEqual(reconcile_counters(), 0)
+
+            # a missing counter row is created by the first adjustment
+            db.session.delete(db.session.get(GlobalStat, GLOBAL_STAT_ID))
+            db.session.commit()
+            adjust_counter(db.session.connection(), "like_num", 1)
+            adjust_counter(db.session.connection(), "like_num", 1)
+            db.session.commit()
+            self.assertEqual(db.session.get(GlobalStat, GLOBAL_STAT_ID).like_num, 2)
+
+    def test_generate_dataset(self, app: Flask, _):
+        """Test the dataset generator fills an empty database deterministically."""
+
+        # the generator only writes into an empty database
+        clean_up_test_database(app)
+        create_test_database(app)
+
+        args = ["job", "generate-dataset", "--end", "2026-01-01", "--chunk-size", "25"]
+        scale = {
+            "users": 60,
+            "communities": 5,
+            "requests": 120,
+            "replies": 200,
+            "views": 1000,
+            "likes": 150,
+            "saves": 40,
+            "memberships": 90,
+        }
+        for kind, rows in scale.items():
+            args += [f"--{kind}", str(rows)]
+
+        result = app.test_cli_runner().invoke(args=args)
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("user_record: 1000 rows", result.output)
+
+        with app.app_context():
+            self.assertEqual(User.query.count(), 60)
+            self.assertEqual(Request.query.count(), 120)
+            self.assertEqual(UserRecord.query.count(), 1000)
+            self.assertLessEqual(abs(UserLike.query.count() - 150), 5)
+
+            # the counters were set from the written rows
+            self.assertEqual(reconcile_counters(), 0)
+            self.assertEqual(
+                sum(request.view_num for request in Request.query.all()), 1000
+            )
+
+            # a tenth of the posts gets most of the views
+            views = sorted(
+                (request.view_num for request in Request.query.all()), reverse=True
+            )
+            self.assertGreater(sum(views[:12]), 400)
+
+            # generated users log in with the dataset password
+            user = db.session.get(User, user_id(DATASET_SEED, 0))
+            self.assertTrue(user.verify_password(DATASET_PASSWORD))
+
+        # the same seed builds the same rows
+        plan = DatasetPlan(DatasetScale(**scale), end=datetime(2026, 1, 1))
+        self.assertEqual(
+            build_chunk(plan, "user_like", 0, 30), build_chunk(plan, "user_like", 0, 30)
+        )
+        self.assertNotEqual(
+            build_chunk(plan, "request", 0, 30),
+            build_chunk(replace(plan, seed=1), "request", 0, 30),
+        )
+
+        # a second run refuses to mix with the existing rows
+        result = app.test_cli_runner().invoke(args=args)
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("is not empty", result.output)
+
+    def test_benchmark_harness(self, app: Flask, client: FlaskClient):
+        """Test the benchmark counts statements and rows and flags regressions."""
+
+        with app.app_context():
+            user = User.query.first()
+            engine = db.engine
+            categories_count = Category.query.count()
+
+        auth = AuthActions(client)
+        auth.login(email=user.email, password="Password@123")
+
+        result = measure_route(
+            client, engine, _PREFIX + "/categories", 3, auth.get_auth_headers()
+        )
+        self.assertEqual(result.status, HttpRequestEnum.SUCCESS_OK.value)
+        self.assertGreater(result.queries, 0)
+        self.assertGreaterEqual(result.rows, min(categories_count, 10))
+
+        baseline = {"small": {"categories": asdict(result)}}
+        self.assertEqual(compare_results(baseline, baseline), [])
+
+        # one more statement is a regression, a little more time is noise
+        slower = {**asdict(result), "ms": result.ms + 1, "queries": result.queries + 1}
+        self.assertEqual(
+            compare_results(baseline, {"small": {"categories": slower}}),
+            [f"small categories: queries {result.queries} -> {result.queries + 1}"],
+        )
+
+        auth.logout()
+
+    def test_query_stats(self, app: Flask, client: FlaskClient):
+        """Test requests report their SQL statistics and fail over a budget."""
+
+        self.assertEqual(
+            fingerprint("SELECT *  FROM tag\nWHERE id IN (1, 2, 3) AND name = 'x'"),
+            "SELECT * FROM tag WHERE id IN (?) AND name = ?",
+        )
+
+        # the placeholders of every driver fold the same way
+        for statement in (
+            "SELECT * FROM tag WHERE id IN (%(id_1_1)s, %(id_1_2)s) AND name = %(name_1)s",
+            "SELECT * FROM tag WHERE id IN (%s, %s, %s) AND name = %s",
+            "SELECT * FROM tag WHERE id IN ($1, $2) AND name = $3",
+            "SELECT * FROM tag WHERE id IN (:1, :2) AND name = :name",
+            "SELECT * FROM tag WHERE id IN (?, ?) AND name = ?",
+        ):
+            self.assertEqual(
+                fingerprint(statement), "SELECT * FROM tag WHERE id IN (?) AND name = ?"
+            )
+        self.assertEqual(fingerprint("SELECT 'a'::regconfig"), "SELECT ?::regconfig")
+
+        stats = QueryStats()
+        for tag_id in range(6):
+            stats.record(f"SELECT * FROM tag WHERE id = {tag_id}", 0.001)
+        stats.record("SELECT * FROM category", 0.001)
+        self.assertEqual(stats.queries, 7)
+        self.assertEqual(stats.repeated(), [("SELECT * FROM tag WHERE id = ?", 6)])
+
+        with app.app_context():
+            user = User.query.first()
+
+        auth = AuthActions(client)
+        auth.login(email=user.email, password="Password@123")
+
+        url = _PREFIX + "/categories"
+        response = client.get(url, headers=auth.get_auth_headers())
+        self.assertEqual(response.status_code, HttpRequestEnum.SUCCESS_OK.value)
+        self.assertRegex(
+            response.headers["Server-Timing"], r'^db;dur=[\d.]+;desc="\d+ queries"$'
+        )
+
+        # a route over its budget fails the test
+        with self.assertRaises(QueryBudgetError), query_budget(1):
+            client.get(url, headers=auth.get_auth_headers())
+
+        with query_budget(10):
+            response = client.get(url, headers=auth.get_auth_headers())
+        self.assertEqual(response.status_code, HttpRequestEnum.SUCCESS_OK.value)
+
+        auth.logout()
+
+    def test_scheduler_coordinator(self, app: Flask, client: FlaskClient):
+        """Test one coordinator leads at a time and job runs are recorded."""
+
+        path = os.path.join(app.instance_path, "test_scheduler.lock")
+        os.makedirs(app.instance_path, exist_ok=True)
+        leader = SchedulerCoordinator(app, BackgroundScheduler(), FileLeaderLock(path))
+        standby = SchedulerCoordinator(app, BackgroundScheduler(), FileLeaderLock(path))
+
+        try:
+            self.assertTrue(leader.elect())
+            self.assertTrue(leader.scheduler.running)
+            self.assertFalse(standby.elect())
+            self.assertFalse(standby.scheduler.running)
+
+            # the standby takes over once the leader gives up its lock
+            leader.stop()
+            self.assertFalse(leader.scheduler.running)
+            self.assertTrue(standby.elect())
+            self.assertTrue(standby.scheduler.running)
+        finally:
+            leader.stop()
+            standby.stop()
+            os.remove(path)
+
+        def failing_job():
+            raise RuntimeError("boom")
+
+        job_scheduler = BackgroundScheduler()
+        job_scheduler.app = app
+        record_job_runs(job_scheduler)
+        job_scheduler.add_job(lambda: None, id="passing_job")
+        job_scheduler.add_job(failing_job, id="failing_job")
+        job_scheduler.start()
+        try:
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline:
+                with app.app_context():
+                    if JobRun.query.count() == 2:
+                        break
+                time.sleep(0.05)
+        finally:
+            job_scheduler.shutdown()
+
+        with app.app_context():
+            runs = {run.job_id: run for run in JobRun.query.all()}
+            self.assertEqual(runs["passing_job"].status, JobRunStatusEnum.SUCCESS.value)
+            self.assertIsNone(runs["passing_job"].error)
+            self.assertEqual(runs["failing_job"].status, JobRunStatusEnum.FAILURE.value)
+            self.assertEqual(runs["failing_job"].error, "RuntimeError: boom")
+            self.assertGreaterEqual(runs["failing_job"].duration_ms, 0)
+
+        result = app.test_cli_runner().invoke(
+            args=["job", "runs", "--job-id", "failing_job"]
+        )
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("failing_job FAILURE", result.output)
+        self.assertNotIn("passing_job", result.output)
+
+    def test_read_replica(self, app: Flask, client: FlaskClient):
+        """Test read-only services read from a replica until the session writes."""
+
+        replica_app = create_app(
+            {
+                **get_test_config(),
+                "DB_REPLICA_URLS": ["sqlite:///test_replica.db"],
+                "DB_POOL_SIZE": 3,
+                "DB_POOL_PRE_PING": True,
+            }
+        )
+
+        with replica_app.app_context():
+            replica = db.engines["replica_0"]
+            try:
+                self.assertEqual(db.engine.pool.size(), 3)
+                self.assertEqual(replica.pool.size(), 3)
+                self.assertTrue(replica.pool._pre_ping)
+
+                # an empty replica, far behind the primary
+                db.metadata.create_all(replica)
+
+                post_num = Request.query.count()
+                self.assertGreater(post_num, 0)
+                self.assertEqual(len(posts_service(None).data["posts"]), 0)
+
+                with replica_app.app_context():
+                    # read your writes, the session reads from the primary
+                    db.session.add(Tag(name="replica"))
+                    db.session.flush()
+                    self.assertEqual(
+                        len(posts_service(None).data["posts"]), min(post_num, 10)
+                    )
+                    db.session.rollback()
+
+                # the pages and the API read from the replica too
+                with replica_app.test_client() as replica_client:
+                    auth = AuthActions(replica_client)
+                    auth.login(email=User.query.first().email, password="Password@123")
+                    response = replica_client.get(
+                        _PREFIX + "/posts", headers=auth.get_auth_headers()
+                    )
+                    self.assertEqual(
+                        response.status_code, HttpRequestEnum.SUCCESS_OK.value
+                    )
+                    self.assertEqual(response.json["data"]["posts"], [])
+                    auth.logout()
+            finally:
+                db.session.remove()
+                replica.dispose()
+                # bind metadata is shared by the apps of the process, the test
+                # apps have no replica to create tables on
+                db.metadatas.pop("replica_0")
+                os.remove(os.path.join(replica_app.instance_path, "test_replica.db"))
+
+    def test_metrics(self, app: Flask, client: FlaskClient):
+        """Test the metrics route exposes the request, pool and cache metrics."""
+
+        with app.app_context():
+            user = User.query.first()
+
+        auth = AuthActions(client)
+        auth.login(email=user.email, password="Password@123")
+
+        response = client.get("/")
+        self.assertEqual(response.status_code, HttpRequestEnum.SUCCESS_OK.value)
+
+        # closed until a token is configured
+        response = client.get("/metrics")
+        self.assertEqual(response.status_code, HttpRequestEnum.NOT_FOUND.value)
+
+        app.config["METRICS_TOKEN"] = "metrics-token"
+        response = client.get("/metrics")
+        self.assertEqual(response.status_code, HttpRequestEnum.UNAUTHORIZED.value)
+
+        response = client.get(
+            "/metrics", headers={"Authorization": "Bearer metrics-token"}
+        )
+        self.assertEqual(response.status_code, HttpRequestEnum.SUCCESS_OK.value)
+        self.assertTrue(response.content_type.startswith("text/plain"))
+
+        metrics = response.get_data(as_text=True)
+        self.assertIn(
+            'askify_http_request_duration_seconds_bucket{blueprint="app",'
+            'endpoint="index"',
+            metrics,
+        )
+        self.assertIn(
+            'askify_cache_requests_total{namespace="populars",result=', metrics
+        )
+        self.assertIn("askify_db_pool_checkout_wait_seconds_count", metrics)
+        self.assertIn("askify_db_pool_connections_in_use", metrics)
+
+        auth.logout()
+
+    def test_config_loading(self, app: Flask, client: FlaskClient):
+        """Test the config is cached, reloaded and read from the environment."""
+
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as config_dir:
+            with open(os.path.join(config_dir, ".env"), "w", encoding="utf-8") as env:
+                env.write(
+                    "# comment\n"
+                    "export\n"
+                    "\n"
+                    "export APP_FROM_FILE='file'\n"
+                    "APP_OVERRIDDEN=file\n"
+                )
+
+            os.chdir(config_dir)
+            os.environ["APP_OVERRIDDEN"] = "environment"
+            try:
+                reload_config()
+                self.assertEqual(get_config("APP", "FROM_FILE"), "file")
+                self.assertEqual(get_config("APP", "OVERRIDDEN"), "environment")
+                with self.assertRaises(KeyError):
+                    get_config("APP", "MISSING")
+
+                # the file is read once, until the config is reloaded
+                with open(".env", "a", encoding="utf-8") as env:
+                    env.write("APP_ADDED=added\n")
+                with self.assertRaises(KeyError):
+                    get_config("APP", "ADDED")
+
+                reload_config()
+                self.assertEqual(get_config("APP", "ADDED"), "added")
+            finally:
+                del os.environ["APP_OVERRIDDEN"]
+                os.chdir(cwd)
+                reload_config()
@@ -1,11 +1,18 @@
 """Tests for the auth module."""
 
 import enum
+import json
+from unittest.mock import patch
 
+from flask import Flask
 from flask.testing import FlaskClient
+from wtforms import PasswordField
 
+from app.access_log import capture_body, redact
+from app.auth.forms import ForgotPasswordForm, RegisterForm
 from app.constants import HttpRequestEnum
 from app.models.user import User
+from app.user.forms import PasswordForm, ProfileForm
 from tests.config import AuthActions, TestBase
 from tests.seeds.user_seeds import seed_user_data
 
@@ -188,3 +195,56 @@ class TestAuth(TestBase):
         forgot_password_data["rpassword"] = "Password@4567"
         response = client.post(url, data=forgot_password_data)
         self.assertLocationHeader(response, "/auth/forgot_password")
+
+    def test_access_log(self, app: Flask, client: FlaskClient):
+        """Test the access log record of a login, with a redacted body."""
+
+        self.assertEqual(
+            redact('{"email": "a@b.c", "password": "Secret@123"}'),
+            '{"email": "a@b.c", "password": "[REDACTED]"}',
+        )
+        self.assertEqual(
+            redact("email=a%40b.c&password=Secret%40123&remember=y"),
+            "email=a%40b.c&password=[REDACTED]&remember=y",
+        )
+        self.assertEqual(capture_body(b"x" * 10, 4), "xxxx...(truncated)")
+
+        # the fields posted by the register, reset and change-password forms
+        with app.test_request_context():
+            for form_class in (
+                RegisterForm,
+                ForgotPasswordForm,
+                PasswordForm,
+                ProfileForm,
+            ):
+                form = form_class(meta={"csrf": False})
+                secrets = [
+                    field.name for field in form if isinstance(field, PasswordField)
+                ]
+                if hasattr(form, "security_answer"):
+                    secrets.append(form.security_answer.name)
+
+                values = {field.name: "Secret@123" for field in form}
+                body = redact(
+                    "&".join(f"{name}={value}" for name, value in values.items())
+                )
+                json_body = redact(json.dumps(values))
+                for name in secrets:
+                    self.assertIn(f"{name}=[REDACTED]", body)
+                    self.assertIn(f'"{name}": "[REDACTED]"', json_body)
+                self.assertEqual(body.count("Secret"), len(values) - len(secrets))
+
+        with self.assertLogs(app.logger, level="INFO") as logs:
+            with patch("app.access_log.random.random", return_value=0.0):
+                AuthActions(client).login(password="Secret@123")
+
+        records = [
+            json.loads(line.split("access ", 1)[1])
+            for line in logs.output
+            if "access {" in line
+        ]
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]["path"], "/auth/login")
+        self.assertIn("duration_ms", records[0])
+        self.assertIn("password=[REDACTED]", records[0]["request_body"])
+        self.assertNotIn("Secret", records[0]["request_body"])
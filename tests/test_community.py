@@ -3,9 +3,14 @@
 from flask import Flask
 from flask.testing import FlaskClient
 
+from app.api.service import communities_service
+from app.community.service import migrate_community_members
 from app.constants import HttpRequestEnum
+from app.extensions import db
 from app.models.community import Community
+from app.models.community_member import CommunityMember
 from app.models.user import User
+from app.models.user_preference import UserPreference
 from tests.config import AuthActions, TestBase
 
 
@@ -150,3 +155,104 @@ class TestCommunity(TestBase):
 
         # logout
         AuthActions(client).logout()
+
+    def test_join_leave_community(self, app: Flask, client: FlaskClient):
+        """Test joining and leaving a community updates the membership."""
+
+        user = None
+        community_id = None
+        with app.app_context():
+            user = User.query.first()
+            joined_ids = [
+                member.community_id
+                for member in CommunityMember.query.filter_by(user_id=user.id)
+            ]
+            community_id = (
+                Community.query.filter(Community.id.not_in(joined_ids)).first().id
+            )
+
+        # login
+        auth = AuthActions(client)
+        auth.login(email=user.email, password="Password@123")
+
+        url = f"/api/v1/communities/{community_id}"
+        with app.app_context():
+            members = communities_service(community_id=community_id).data[
+                "communities"
+            ][0]["members"]
+
+        # join, then join again
+        response = client.post(url + "/join", headers=auth.get_auth_headers())
+        self.assertEqual(response.status_code, HttpRequestEnum.SUCCESS_OK.value)
+        response = client.post(url + "/join", headers=auth.get_auth_headers())
+        self.assertEqual(response.status_code, HttpRequestEnum.BAD_REQUEST.value)
+
+        community = communities_service(community_id=community_id).data["communities"][
+            0
+        ]
+        self.assertTrue(community["joined"])
+        self.assertEqual(community["members"], members + 1)
+
+        # leave, then leave again
+        response = client.post(url + "/leave", headers=auth.get_auth_headers())
+        self.assertEqual(response.status_code, HttpRequestEnum.SUCCESS_OK.value)
+        response = client.post(url + "/leave", headers=auth.get_auth_headers())
+        self.assertEqual(response.status_code, HttpRequestEnum.BAD_REQUEST.value)
+
+        community = communities_service(community_id=community_id).data["communities"][
+            0
+        ]
+        self.assertFalse(community["joined"])
+        self.assertEqual(community["members"], members)
+
+        # logout
+        auth.logout()
+
+    def test_migrate_community_members(self, app: Flask, _):
+        """Test the legacy membership strings are migrated once, and only those."""
+
+        with app.app_context():
+            users = [user.id for user in User.query.limit(3)]
+            community_ids = [community.id for community in Community.query.all()][:2]
+            CommunityMember.query.filter(CommunityMember.user_id.in_(users)).delete()
+            preferences = {
+                preference.user_id: preference
+                for preference in UserPreference.query.filter(
+                    UserPreference.user_id.in_(users)
+                )
+            }
+            # the listed form, with a duplicate and a community that does not exist
+            preferences[users[0]].communities = str(
+                community_ids + [community_ids[0], 9999999]
+            )
+            # the bare form
+            preferences[users[1]].communities = ",".join(map(str, community_ids))
+            # neither form
+            preferences[users[2]].communities = "not ids"
+            db.session.commit()
+            preference_ids = [preferences[user_id].id for user_id in users]
+
+            self.assertEqual(migrate_community_members(), 2 * len(community_ids))
+            for user_id in users[:2]:
+                self.assertEqual(
+                    sorted(
+                        member.community_id
+                        for member in CommunityMember.query.filter_by(user_id=user_id)
+                    ),
+                    sorted(community_ids),
+                )
+            self.assertEqual(
+                CommunityMember.query.filter_by(user_id=users[2]).count(), 0
+            )
+
+            # only the migrated ids are cleared
+            self.assertEqual(
+                [
+                    db.session.get(UserPreference, preference_id).communities
+                    for preference_id in preference_ids
+                ],
+                ["[9999999]", "", "not ids"],
+            )
+
+            # nothing left to migrate
+            self.assertEqual(migrate_community_members(), 0)
@@ -1,8 +1,29 @@
 """Tests for the popular module."""
 
+from collections import Counter
+from datetime import timedelta
+
+from flask import Flask
 from flask.testing import FlaskClient
 
-from app.constants import HttpRequestEnum
+from app.cache import invalidate_cache
+from app.constants import (
+    TOP_COMMUNITY_NUM,
+    TOP_DATA_NUM,
+    TRENDING_PERIODS,
+    CacheNamespaceEnum,
+    HttpRequestEnum,
+)
+from app.extensions import db
+from app.models.reply import Reply
+from app.models.request import Request
+from app.models.trending import Trending
+from app.models.trending_bucket import TrendingBucket
+from app.models.user import User
+from app.models.user_record import UserRecord
+from app.popular.service import leaderboards_service
+from app.trending import bucket_start, refresh_trending
+from app.utils import generate_time
 from tests.config import AuthActions, TestBase
 
 
@@ -22,3 +43,88 @@ class TestPopular(TestBase):
 
         # logout
         AuthActions(client).logout()
+
+    def test_refresh_trending(self, app: Flask, _):
+        """Test the incremental trending refresh."""
+
+        with app.app_context():
+            user = User.query.first()
+            post = Request.query.order_by(Request.id.desc()).first()
+            start = bucket_start(generate_time())
+            seeded_views = TrendingBucket.query.filter_by(
+                request_id=post.id, bucket_start=start
+            ).first()
+            seeded_views = seeded_views.view_num if seeded_views else 0
+
+            # views are counted in the current bucket
+            for _ in range(3):
+                db.session.add(UserRecord(user_id=user.id, request_id=post.id))
+            db.session.commit()
+
+            bucket = db.session.get(TrendingBucket, (post.id, start))
+            self.assertEqual(bucket.view_num, seeded_views + 3)
+
+            # every period is ranked, one row per request, most viewed first
+            self.assertGreater(refresh_trending(), 0)
+            for period in TRENDING_PERIODS:
+                trendings = (
+                    Trending.query.filter_by(period=period)
+                    .order_by(Trending.score.desc())
+                    .all()
+                )
+                request_ids = [trending.request_id for trending in trendings]
+                self.assertIn(post.id, request_ids)
+                self.assertEqual(len(request_ids), len(set(request_ids)))
+                self.assertEqual(
+                    trendings[0].view_num,
+                    max(trending.view_num for trending in trendings),
+                )
+
+            # buckets outside the longest window are pruned
+            refresh_trending(generate_time() + timedelta(days=8))
+            self.assertEqual(TrendingBucket.query.count(), 0)
+            self.assertEqual(Trending.query.count(), 0)
+
+    def test_leaderboards(self, app: Flask, _):
+        """Test the batched leaderboards against per-row counts."""
+
+        with app.app_context():
+            invalidate_cache(CacheNamespaceEnum.LEADERBOARDS)
+            leaderboards = leaderboards_service()
+
+            def expected(counted, limit):
+                counts = Counter(counted)
+                ranked = sorted(counts, key=lambda key: (-counts[key], -key))
+                return ranked[:limit]
+
+            self.assertEqual(
+                [item["id"] for item in leaderboards["replied"]],
+                expected([reply.request_id for reply in Reply.query], TOP_DATA_NUM),
+            )
+            self.assertEqual(
+                [item["id"] for item in leaderboards["viewed"]],
+                expected(
+                    [record.request_id for record in UserRecord.query], TOP_DATA_NUM
+                ),
+            )
+            self.assertEqual(
+                [item["id"] for item in leaderboards["community"]],
+                expected(
+                    [post.community_id for post in Request.query], TOP_COMMUNITY_NUM
+                ),
+            )
+
+            top_post = db.session.get(Request, leaderboards["replied"][0]["id"])
+            self.assertEqual(
+                leaderboards["replied"][0],
+                {
+                    "id": top_post.id,
+                    "username": top_post.author.username,
+                    "title": top_post.title,
+                },
+            )
+
+            # cached until invalidated
+            self.assertIs(leaderboards_service(), leaderboards)
+            invalidate_cache(CacheNamespaceEnum.LEADERBOARDS)
+            self.assertIsNot(leaderboards_service(), leaderboards)
@@ -1,8 +1,23 @@
 """Tests for the post module."""
 
+from unittest.mock import patch
+
+from flask import Flask
 from flask.testing import FlaskClient
+from sqlalchemy.exc import SQLAlchemyError
 
 from app.constants import HttpRequestEnum
+from app.counter import reconcile_counters
+from app.extensions import db
+from app.models.reply import Reply
+from app.models.request import Request
+from app.models.search_document import SearchDocument, SearchEntityEnum
+from app.models.trending_bucket import TrendingBucket
+from app.models.user import User
+from app.models.user_like import UserLike
+from app.models.user_record import UserRecord
+from app.purge import hide_post, retry_post_purges, schedule_post_purge
+from app.view_buffer import ViewBuffer
 from tests.config import AuthActions, TestBase
 
 
@@ -68,3 +83,231 @@ class TestPost(TestBase):
 
         # logout
         AuthActions(client).logout()
+
+    def test_delete_post(self, app: Flask, client: FlaskClient):
+        """Test deleting a post removes its dependent rows in bulk."""
+
+        url = "/api/v1/posts/create/post"
+
+        email = None
+        post_id = None
+        with app.app_context():
+            email = User.query.first().email
+            post_id = Reply.query.first().request_id
+            reconcile_counters()
+
+        # login
+        auth = AuthActions(client)
+        auth.login(email=email, password="Password@123")
+
+        response = client.delete(
+            url, json={"post_id": post_id}, headers=auth.get_auth_headers()
+        )
+        self.assertEqual(response.status_code, HttpRequestEnum.SUCCESS_OK.value)
+
+        with app.app_context():
+            self.assertIsNone(db.session.get(Request, post_id))
+            for model in (Reply, UserRecord, UserLike):
+                self.assertEqual(model.query.filter_by(request_id=post_id).count(), 0)
+            self.assertEqual(
+                SearchDocument.query.filter_by(
+                    entity_type=SearchEntityEnum.REQUEST.value, entity_id=post_id
+                ).count(),
+                0,
+            )
+
+            # the counters were discounted along with the rows
+            self.assertEqual(reconcile_counters(), 0)
+
+        # test missing post
+        response = client.delete(
+            url, json={"post_id": post_id}, headers=auth.get_auth_headers()
+        )
+        self.assertEqual(response.json["code"], HttpRequestEnum.NOT_FOUND.value)
+
+        # logout
+        auth.logout()
+
+    def test_delete_comment_thread(self, app: Flask, client: FlaskClient):
+        """Test deleting a comment removes its replies at every depth."""
+
+        url = "/api/v1/posts/create/comment"
+
+        email = None
+        post_id = None
+        reply_id = None
+        with app.app_context():
+            user = User.query.first()
+            email = user.email
+            post = Request.query.first()
+            post_id = post.id
+            reconcile_counters()
+
+            # a thread three levels deep
+            parent_id = None
+            for _ in range(3):
+                reply = Reply(
+                    request_id=post_id,
+                    replier_id=user.id,
+                    reply_id=parent_id,
+                    content="thread",
+                    source="HUMAN",
+                    like_num=0,
+                    save_num=0,
+                )
+                db.session.add(reply)
+                db.session.flush()
+                parent_id = reply.id
+                reply_id = reply_id or reply.id
+            db.session.add(UserLike(user.id, post_id, parent_id))
+            post.reply_num += 3
+            db.session.commit()
+            reply_num = post.reply_num
+
+        # login
+        auth = AuthActions(client)
+        auth.login(email=email, password="Password@123")
+
+        response = client.delete(
+            url,
+            json={"post_id": post_id, "reply_id": reply_id},
+            headers=auth.get_auth_headers(),
+        )
+        self.assertEqual(response.status_code, HttpRequestEnum.SUCCESS_OK.value)
+
+        with app.app_context():
+            self.assertEqual(Reply.query.filter_by(content="thread").count(), 0)
+            self.assertEqual(UserLike.query.filter_by(reply_id=parent_id).count(), 0)
+            self.assertEqual(db.session.get(Request, post_id).reply_num, reply_num - 3)
+            self.assertEqual(reconcile_counters(), 0)
+
+        # logout
+        auth.logout()
+
+    def test_purge_post_in_background(self, app: Flask, _):
+        """Test a background purge hides a post once and deletes it in batches."""
+
+        app.config["PURGE_BATCH_SIZE"] = 1
+        with app.app_context():
+            post_id = UserRecord.query.first().request_id
+            reconcile_counters()
+
+            future = schedule_post_purge(app, post_id)
+
+            # a second delete of the hidden post schedules nothing
+            self.assertIsNone(schedule_post_purge(app, post_id))
+            future.result()
+
+        with app.app_context():
+            self.assertIsNone(db.session.get(Request, post_id))
+            self.assertEqual(UserRecord.query.filter_by(request_id=post_id).count(), 0)
+            self.assertEqual(reconcile_counters(), 0)
+
+    def test_retry_post_purges(self, app: Flask, _):
+        """Test a hidden post whose purge was lost is purged by the purge job."""
+
+        with app.app_context():
+            post_id = UserRecord.query.first().request_id
+            reconcile_counters()
+
+            # the purge of the hidden post never runs, e.g. after a restart
+            self.assertTrue(hide_post(post_id))
+            self.assertIsNone(db.session.get(Request, post_id))
+            self.assertEqual(
+                SearchDocument.query.filter_by(
+                    entity_type=SearchEntityEnum.REQUEST.value, entity_id=post_id
+                ).count(),
+                0,
+            )
+
+            # a recent purge may still be running, it is left alone
+            self.assertEqual(retry_post_purges(1), 0)
+            self.assertEqual(retry_post_purges(1, retry_seconds=0), 1)
+
+            self.assertEqual(
+                db.session.scalar(
+                    db.select(db.func.count())
+                    .select_from(Request)
+                    .where(Request.id == post_id)
+                    .execution_options(include_deleted=True)
+                ),
+                0,
+            )
+            self.assertEqual(UserRecord.query.filter_by(request_id=post_id).count(), 0)
+            self.assertEqual(reconcile_counters(), 0)
+
+    def test_view_buffer(self, app: Flask, client: FlaskClient):
+        """Test post views are buffered and written in one flush."""
+
+        with app.app_context():
+            users = [user.id for user in User.query.limit(2)]
+            email = db.session.get(User, users[0]).email
+            posts = [post.id for post in Request.query.limit(2)]
+            view_nums = {
+                post_id: db.session.get(Request, post_id).view_num or 0
+                for post_id in posts
+            }
+            record_num = UserRecord.query.count()
+            bucket_views = db.session.query(
+                db.func.coalesce(db.func.sum(TrendingBucket.view_num), 0)
+            ).scalar()
+            reconcile_counters()
+
+        buffer = ViewBuffer(flush_seconds=3600)
+        buffer.app = app
+        for user_id in users:
+            for post_id in posts:
+                buffer.add(user_id, post_id)
+        buffer.add(users[0], posts[0])
+
+        # the view of a post deleted since is dropped, the others are written
+        buffer.add(users[0], -1)
+
+        # nothing is written before the flush
+        with app.app_context():
+            self.assertEqual(UserRecord.query.count(), record_num)
+
+        self.assertEqual(buffer.flush(), 5)
+        self.assertEqual(buffer.flush(), 0)
+
+        with app.app_context():
+            self.assertEqual(UserRecord.query.count(), record_num + 5)
+            self.assertEqual(
+                db.session.get(Request, posts[0]).view_num, view_nums[posts[0]] + 3
+            )
+            self.assertEqual(
+                db.session.get(Request, posts[1]).view_num, view_nums[posts[1]] + 2
+            )
+            self.assertEqual(
+                db.session.query(db.func.sum(TrendingBucket.view_num)).scalar(),
+                bucket_views + 5,
+            )
+            self.assertEqual(reconcile_counters(), 0)
+
+        # a failed write is put back for the next flush, and dropped if it fails again
+        buffer.add(users[0], posts[0])
+        with patch(
+            "app.view_buffer.write_views", side_effect=SQLAlchemyError("unavailable")
+        ):
+            self.assertEqual(buffer.flush(), 0)
+            buffer.add(users[1], posts[0])
+            self.assertEqual(buffer.flush(), 0)
+        self.assertEqual(buffer.dropped, 1)
+        self.assertEqual(buffer.flush(), 1)
+
+        with app.app_context():
+            self.assertEqual(
+                db.session.get(Request, posts[0]).view_num, view_nums[posts[0]] + 4
+            )
+
+        # the post page records its view through the buffer
+        AuthActions(client).login(email=email, password="Password@123")
+        response = client.get(f"/posts/{posts[1]}")
+        self.assertEqual(response.status_code, HttpRequestEnum.SUCCESS_OK.value)
+
+        with app.app_context():
+            self.assertEqual(
+                db.session.get(Request, posts[1]).view_num, view_nums[posts[1]] + 3
+            )
+
+        AuthActions(client).logout()
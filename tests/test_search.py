@@ -1,8 +1,14 @@
 """Tests for the search module."""
 
+from flask import Flask
 from flask.testing import FlaskClient
 
 from app.constants import HttpRequestEnum
+from app.extensions import db
+from app.models.request import Request
+from app.models.search_document import SearchDocument
+from app.search.index import rebuild_search_index
+from app.search.service import search_service
 from tests.config import AuthActions, TestBase
 
 
@@ -38,3 +44,50 @@ class TestSearch(TestBase):
 
         # logout
         AuthActions(client).logout()
+
+    def test_search_service(self, app: Flask, _):
+        """Test the search service against the incremental search index."""
+
+        with app.app_context():
+            post = Request.query.first()
+            reply_ids = {reply.id for reply in post.replies}
+
+            # seeded posts are indexed
+            result = search_service(post.title)
+            self.assertIn(post.id, [item["id"] for item in result["request"]])
+
+            # title updates are re-indexed, for the post and its replies
+            post.title = "Quokkas prefer zebrafish"
+            db.session.commit()
+
+            result = search_service("quokka zebra")
+            self.assertEqual([item["id"] for item in result["request"]], [post.id])
+            self.assertEqual(result["request"][0]["highlight"], "title")
+            self.assertIn("<mark>Quokkas</mark>", result["request"][0]["title"])
+            self.assertEqual({item["id"] for item in result["reply"]}, reply_ids)
+
+            # all terms must match
+            result = search_service("quokka unmatchedterm")
+            self.assertEqual(result["total"]["request"], 0)
+
+            # a rebuilt index gives the same documents and the same answer, in
+            # batches smaller than every table
+            def documents():
+                return sorted(
+                    (
+                        document.entity_type,
+                        document.entity_id,
+                        document.parent_id,
+                        document.author_id,
+                        document.title,
+                        document.content,
+                        document.author,
+                    )
+                    for document in SearchDocument.query.all()
+                )
+
+            indexed = documents()
+            self.assertEqual(rebuild_search_index(batch_size=3), len(indexed))
+            self.assertEqual(documents(), indexed)
+            result = search_service("quokka zebra")
+            self.assertEqual([item["id"] for item in result["request"]], [post.id])